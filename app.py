@@ -1,7 +1,34 @@
-from flask import Flask, request, jsonify
+import time
+
+# Startup phase timings, reported by /ready (the clock starts before Flask is imported)
+startup = {'started_at': time.time(), 'phases': {}, 'phase': 'import', 'ready': False, 'error': None}
+_import_started = time.perf_counter()
+
+from flask import Flask, Response, g, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
-import pickle
+from collections import Counter
+import hmac
+import importlib
+import json
 import os
+import threading
+
+# numpy/scipy/scikit-learn are never imported at module level here: they are
+# pulled in by the background loader (or by unpickling), so the server can
+# bind its port before paying for them
+
+from classification_store import ClassificationStore
+from email_threads import THREAD_MODES, group_threads, latest_status, thread_fields
+from job_queue import JobRunner, JobStore
+from mailbox_pipeline import SNIPPET_CHARS, MailboxPipeline
+from metrics import BATCH_SIZE_BUCKETS, MetricsRegistry
+from micro_batcher import MicroBatcher
+from model_manager import ModelManager, list_backups
+from model_registry import ModelRegistry
+from prediction_cache import PredictionCache, cache_key
+from request_profiler import RequestProfiler
+from shadow_scorer import ShadowScorer
+from status_rules import DEFAULT_RULES_PATH, StatusRuleEngine
 
 app = Flask(__name__)
 # Enable CORS for Chrome Extension to call the API
@@ -10,48 +37,555 @@ CORS(app)
 # Load the trained model and vectorizer
 MODEL_PATH = 'model.pkl'
 VECTORIZER_PATH = 'vectorizer.pkl'
+# Pickle-free, memory-mapped export written by train_model.py
+MODEL_ARTIFACT_DIR = os.environ.get('MODEL_ARTIFACT_DIR', 'model_artifact')
+# 'auto' prefers the artifact when it matches the pickles, 'artifact'/'pickle' force one format
+MODEL_FORMAT = os.environ.get('MODEL_FORMAT', 'auto')
+# Model registry: trained models with metadata, and backups that /admin/reload can roll back to
+MODEL_BACKUP_DIR = os.environ.get('MODEL_BACKUP_DIR', 'model_backups')
+# Seconds between model file mtime checks (0 disables hot reload by polling)
+MODEL_WATCH_INTERVAL = float(os.environ.get('MODEL_WATCH_INTERVAL', '0'))
+# Required in the X-Admin-Token header by /admin/* endpoints (unset disables them)
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+
+# 'numpy' scores with the parity-checked ScoringEngine, 'sklearn' with the model/vectorizer pair
+SCORING_ENGINE = os.environ.get('SCORING_ENGINE', 'numpy')
+
+# Keyword rules for classify_email_status()
+STATUS_RULES_PATH = os.environ.get('STATUS_RULES_PATH', DEFAULT_RULES_PATH)
+
+# Upper bound on the number of emails accepted by one /batch_predict call
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', '1000'))
+# Emails scored per chunk by /stream_predict; bounds its memory regardless of input size
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', '256'))
+
+# Predictions keyed by normalized text + model version (size 0 disables, TTL 0 = no expiry)
+prediction_cache = PredictionCache(
+    max_size=int(os.environ.get('PREDICTION_CACHE_SIZE', '10000')),
+    ttl=float(os.environ.get('PREDICTION_CACHE_TTL', '0'))
+)
+
+# Opt-in: coalesce concurrent /predict calls into small batches
+MICRO_BATCH_ENABLED = os.environ.get('MICRO_BATCH_ENABLED', '0') == '1'
+MICRO_BATCH_MAX_WAIT_MS = float(os.environ.get('MICRO_BATCH_MAX_WAIT_MS', '5'))
+MICRO_BATCH_MAX_SIZE = int(os.environ.get('MICRO_BATCH_MAX_SIZE', '32'))
+MICRO_BATCH_TIMEOUT = float(os.environ.get('MICRO_BATCH_TIMEOUT', '10'))
+
+micro_batcher = None
+if MICRO_BATCH_ENABLED:
+    # The worker thread is started on first use, never at import time
+    micro_batcher = MicroBatcher(
+        lambda items: _score_queued(items),
+        max_wait_ms=MICRO_BATCH_MAX_WAIT_MS,
+        max_batch=MICRO_BATCH_MAX_SIZE
+    )
+
+# Opt-in cProfile of /predict and /batch_predict: per request with the
+# X-Profile header (+ admin token) or for a random sample of requests
+request_profiler = RequestProfiler(
+    directory=os.environ.get('PROFILE_DIR', 'profiles'),
+    max_profiles=int(os.environ.get('PROFILE_MAX_FILES', '50')),
+    sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+)
+PROFILED_ENDPOINTS = ('/predict', '/batch_predict')
+
+# Predictions of emails sent with a messageId, keyed by messageId + model version,
+# so rescans only score new mail (empty disables)
+CLASSIFICATION_STORE_PATH = os.environ.get('CLASSIFICATION_STORE_PATH', 'classifications.sqlite3')
+
+# Background classification jobs (POST /jobs), persisted in SQLite so they survive restarts
+JOB_DB_PATH = os.environ.get('JOB_DB_PATH', 'jobs.sqlite3')
+# Job worker threads per process (each gunicorn worker runs its own)
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '1'))
+JOB_CHUNK_SIZE = int(os.environ.get('JOB_CHUNK_SIZE', '256'))
+# Admission limits: queued + running jobs, and emails per submitted job
+JOB_MAX_ACTIVE = int(os.environ.get('JOB_MAX_ACTIVE', '20'))
+JOB_MAX_EMAILS = int(os.environ.get('JOB_MAX_EMAILS', '100000'))
+# Longest pause of a job worker before each chunk while interactive requests are being served
+JOB_YIELD_MS = float(os.environ.get('JOB_YIELD_MS', '100'))
+# A running job not heard from for this long (its process died) is resumed by another worker
+JOB_LEASE_SECONDS = float(os.environ.get('JOB_LEASE_SECONDS', '60'))
+# CSV jobs may only read files under this directory
+JOB_INPUT_DIR = os.environ.get('JOB_INPUT_DIR', 'backend/export')
+# Requests that job workers yield to
+INTERACTIVE_ENDPOINTS = ('/predict', '/batch_predict', '/stream_predict', '/thread_predict', '/api/emails/analyze')
 
-model = None
-vectorizer = None
+# Local mailbox analyzed by /api/emails/analyze: Gmail export CSVs and/or mbox files
+MAILBOX_DIR = os.environ.get('MAILBOX_DIR', 'backend/export')
+ANALYZE_PAGE_SIZE = int(os.environ.get('ANALYZE_PAGE_SIZE', '50'))
+ANALYZE_MAX_PAGE_SIZE = int(os.environ.get('ANALYZE_MAX_PAGE_SIZE', '500'))
+# Parsed mailbox messages kept so repeated pages are not parsed again (0 disables)
+ANALYZE_CACHE_SIZE = int(os.environ.get('ANALYZE_CACHE_SIZE', '10000'))
+
+# Registry entry (name, version or 'latest') shadow-scored next to the active model; empty disables
+SHADOW_MODEL = os.environ.get('SHADOW_MODEL', '')
+SHADOW_SAMPLE_RATE = float(os.environ.get('SHADOW_SAMPLE_RATE', '1'))
+# Requests waiting for the shadow model before new ones are dropped from the comparison
+SHADOW_QUEUE_SIZE = int(os.environ.get('SHADOW_QUEUE_SIZE', '1000'))
+
+status_rules = StatusRuleEngine.from_file(STATUS_RULES_PATH)
+mailbox = MailboxPipeline(MAILBOX_DIR, status_rules, cache_size=ANALYZE_CACHE_SIZE)
+
+model_manager = ModelManager(
+    MODEL_PATH, VECTORIZER_PATH, MODEL_ARTIFACT_DIR,
+    model_format=MODEL_FORMAT,
+    backup_root=MODEL_BACKUP_DIR,
+    on_swap=lambda loaded: _on_model_swap(loaded),
+    scoring_engine=SCORING_ENGINE == 'numpy'
+)
+model_registry = ModelRegistry(MODEL_BACKUP_DIR)
+job_store = JobStore(JOB_DB_PATH)
+classification_store = ClassificationStore(CLASSIFICATION_STORE_PATH) if CLASSIFICATION_STORE_PATH else None
+# Worker threads are started by start_job_workers(), never at import time
+job_runner = JobRunner(
+    job_store,
+    lambda texts: _score_job_chunk(texts),
+    workers=JOB_WORKERS,
+    lease_seconds=JOB_LEASE_SECONDS,
+    max_yield_ms=JOB_YIELD_MS,
+    ready=lambda: model_manager.active is not None
+)
+# Active ShadowScorer, replaced as a whole by start_shadow()/stop_shadow()
+shadow = None
+
+# Texts scored once after loading, before /ready reports ready
+WARMUP_TEXTS = [
+    "Interview Invitation We would like to schedule an interview with you",
+    "Thank you for applying Unfortunately we have decided to move forward with other candidates",
+    "Job Offer We are pleased to offer you the position",
+    "New jobs for you: Software Engineer, Data Analyst and more",
+]
+
+# --- Metrics (served by /metrics in Prometheus text format) ---
+
+metrics_registry = MetricsRegistry('jobtrack')
+REQUESTS = metrics_registry.counter('http_requests_total', 'HTTP requests by endpoint and status', ('endpoint', 'method', 'status'))
+REQUEST_ERRORS = metrics_registry.counter('http_request_errors_total', 'HTTP responses with status >= 400', ('endpoint', 'status'))
+REQUEST_SECONDS = metrics_registry.histogram('http_request_duration_seconds', 'Time from request start to response', ('endpoint',))
+# json_parse / transform / predict_proba / serialize, to tell TF-IDF cost from Flask cost
+STAGE_SECONDS = metrics_registry.histogram('inference_stage_seconds', 'Time spent in each inference stage', ('stage',))
+REQUEST_BATCH_SIZE = metrics_registry.histogram('request_batch_size', 'Emails per request (per chunk for /stream_predict)',
+                                       ('endpoint',), BATCH_SIZE_BUCKETS)
+MODEL_BATCH_SIZE = metrics_registry.histogram('model_batch_size', 'Uncached texts per vectorize/predict_proba call',
+                                     buckets=BATCH_SIZE_BUCKETS)
+PREDICTIONS = metrics_registry.counter('predictions_total', 'Predictions returned, by label', ('label',))
+STORE_LOOKUPS = metrics_registry.counter('classification_store_lookups_total',
+                                         'Emails with a messageId looked up in the classification store', ('result',))
+metrics_registry.gauge('model_info', 'Active model version', ('version', 'source'),
+              callback=lambda: {(model_manager.active.version, model_manager.active.source): 1} if model_manager.active else {})
+metrics_registry.gauge('jobs', 'Background jobs in the job store, by status', ('status',),
+              callback=lambda: {(status,): n for status, n in job_store.counts().items()})
+metrics_registry.gauge('shadow_texts', 'Texts compared with the shadow model since it started', ('version', 'outcome'),
+              callback=lambda: _shadow_samples())
+
+def _parse_json(silent=False):
+    start = time.perf_counter()
+    data = request.get_json(silent=silent)
+    STAGE_SECONDS.observe(time.perf_counter() - start, 'json_parse')
+    return data
+
+def _json_response(payload):
+    start = time.perf_counter()
+    response = jsonify(payload)
+    STAGE_SECONDS.observe(time.perf_counter() - start, 'serialize')
+    return response
+
+def _count_labels(results):
+    for label, count in Counter(result['label'] for result in results).items():
+        PREDICTIONS.inc(label, amount=count)
 
 def load_model():
     """Load the trained model and vectorizer"""
-    global model, vectorizer
+    return model_manager.reload()
+
+# --- Startup ---
+
+def _record_phase(name, start):
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    startup['phases'][name] = round(elapsed_ms, 1)
+    print(f"⏱  Startup phase {name}: {elapsed_ms:.1f} ms")
+
+def warmup(loaded):
+    """
+    Score a small batch end to end (vectorize, predict_proba, argmax) so the
+    first real request does not pay for lazy imports and cold code paths.
+    Bypasses the prediction cache and the metrics.
+    """
+    vectorizer, model = _scorer(loaded)
+    probabilities = model.predict_proba(vectorizer.transform(WARMUP_TEXTS))
+    probabilities.argsort(axis=1)
+
+def warm_start():
+    """
+    Import the numeric stack, load the model and warm it up, timing each
+    phase. /ready turns 200 once this finishes with a model.
     
-    if not os.path.exists(MODEL_PATH):
-        # Just print warning, don't crash if model missing for now
-        print(f"Warning: Model file not found: {MODEL_PATH}")
-        return
+    Returns:
+        True if the model is loaded and warmed
+    """
+    try:
+        startup['phase'] = 'imports'
+        start = time.perf_counter()
+        for module in ('numpy', 'scipy.sparse'):
+            importlib.import_module(module)
+        _record_phase('imports', start)
+        
+        startup['phase'] = 'load_model'
+        start = time.perf_counter()
+        loaded = load_model()
+        _record_phase('load_model', start)
+        if loaded is None:
+            raise FileNotFoundError('No model files found')
+        
+        startup['phase'] = 'warmup'
+        start = time.perf_counter()
+        warmup(loaded)
+        _record_phase('warmup', start)
+        
+        if SHADOW_MODEL:
+            startup['phase'] = 'load_shadow'
+            start = time.perf_counter()
+            try:
+                start_shadow(SHADOW_MODEL)
+            except Exception as e:
+                # Serving the primary does not depend on the shadow
+                print(f"⚠ Warning: Shadow model {SHADOW_MODEL} not started: {e}")
+            _record_phase('load_shadow', start)
+    except Exception as e:
+        startup['error'] = f"{type(e).__name__}: {e}"
+        startup['phase'] = 'failed'
+        print(f"⚠ Warning: {e}")
+        return False
     
-    if not os.path.exists(VECTORIZER_PATH):
-        print(f"Warning: Vectorizer file not found: {VECTORIZER_PATH}")
-        return
+    startup['phase'] = 'ready'
+    startup['error'] = None
+    startup['ready'] = True
+    total_ms = (time.time() - startup['started_at']) * 1000
+    print(f"✓ Ready to serve predictions {total_ms:.0f} ms after start")
+    return True
+
+def start_background_load():
+    """Run warm_start() on a daemon thread so the server can bind its port right away"""
+    thread = threading.Thread(target=warm_start, name='model-loader', daemon=True)
+    thread.start()
+    return thread
+
+def _on_model_swap(loaded):
+    # Entries are keyed by version already; clearing just frees the old model's results
+    prediction_cache.clear()
+    current = shadow
+    if current is not None:
+        if current.candidate.version == loaded.version:
+            # The shadow model was promoted
+            stop_shadow()
+        else:
+            # Statistics compare against one primary at a time
+            start_shadow(current.name, current.candidate)
+    # A model that appears later (e.g. via the file watcher after a failed start) also makes us ready
+    if not startup['ready'] and startup['phase'] == 'failed':
+        warmup(loaded)
+        startup.update(ready=True, phase='ready', error=None)
+
+# --- Status rules ---
+def classify_email_status(subject, snippet):
+    """Keyword-rule status (Rejected/Offer/Interviewing/Applied) from config/status_rules.json"""
+    return status_rules.classify(subject, snippet)
+
+# --- Inference ---
+
+def _scorer(loaded):
+    """(vectorizer, model) to score with: the NumPy engine when one was built, else the loaded pair"""
+    if loaded.engine is not None:
+        return loaded.engine, loaded.engine
+    return loaded.vectorizer, loaded.model
+
+def _text_key(text, loaded):
+    return cache_key(text, loaded.version, getattr(loaded.vectorizer, 'lowercase', True))
+
+def score_uncached(texts, loaded, cache_results=True):
+    """
+    Classify texts with a single vectorize/predict_proba pass, bypassing
+    cache lookups. Identical texts are scored once; every result is stored
+    in the prediction cache unless cache_results is False.
+    """
+    if not texts:
+        return []
     
-    print("Loading model and vectorizer...")
-    with open(MODEL_PATH, 'rb') as f:
-        model = pickle.load(f)
+    unique_index = {}
+    for text in texts:
+        unique_index.setdefault(text, len(unique_index))
     
-    with open(VECTORIZER_PATH, 'rb') as f:
-        vectorizer = pickle.load(f)
+    unique_texts = list(unique_index)
+    vectorizer, model = _scorer(loaded)
+    MODEL_BATCH_SIZE.observe(len(unique_texts))
+    start = time.perf_counter()
+    features = vectorizer.transform(unique_texts)
+    transformed = time.perf_counter()
+    probabilities = model.predict_proba(features)
+    STAGE_SECONDS.observe(transformed - start, 'transform')
+    STAGE_SECONDS.observe(time.perf_counter() - transformed, 'predict_proba')
+    # One ranking per text gives the label (argmax, first class on ties) and top-k
+    ranking = (-probabilities).argsort(axis=1, kind='stable')
+    classes = [str(c) for c in model.classes_]
     
-    print(f"✓ Model loaded successfully. Can predict classes: {list(model.classes_)}")
+    unique_results = []
+    for text, order, row in zip(unique_texts, ranking, probabilities):
+        best = order[0]
+        result = {
+            'label': classes[best],
+            'confidence': float(row[best]),
+            # Most likely first, so top-k is a prefix
+            'probabilities': {classes[i]: float(row[i]) for i in order}
+        }
+        if cache_results:
+            prediction_cache.put(_text_key(text, loaded), result)
+        unique_results.append(result)
+    
+    return [unique_results[unique_index[text]] for text in texts]
 
-# --- Helper for Mock Data ---
-def classify_email_status(subject, snippet):
-    subject_lower = subject.lower()
-    snippet_lower = snippet.lower()
-    
-    if "reject" in snippet_lower or "unfortunately" in snippet_lower or "regret" in snippet_lower:
-        return "Rejected"
-    elif "offer" in subject_lower or "congratulations" in snippet_lower or "offer letter" in snippet_lower:
-        return "Offer"
-    elif "interview" in subject_lower or "schedule" in snippet_lower or "availability" in snippet_lower:
-        return "Interviewing"
+def score_texts(texts, loaded, cache_results=True):
+    """
+    Classify a list of texts, serving what we can from the prediction cache
+    and scoring the rest in one batch. Returns one dict per input with
+    'label', 'confidence' and 'probabilities'.
+    """
+    results = {}
+    pending = []
+    for text in texts:
+        if text in results:
+            continue
+        cached = prediction_cache.get(_text_key(text, loaded))
+        if cached is not None:
+            results[text] = cached
+        else:
+            results[text] = None
+            pending.append(text)
+    
+    for text, result in zip(pending, score_uncached(pending, loaded, cache_results)):
+        results[text] = result
+    
+    return [results[text] for text in texts]
+
+def _score_queued(items):
+    """Score (loaded, text) pairs from the micro-batcher, each on the model its request started with"""
+    groups = {}
+    for loaded, text in items:
+        groups.setdefault(id(loaded), (loaded, []))[1].append(text)
+    
+    scored = {}
+    for loaded, texts in groups.values():
+        for text, result in zip(texts, score_uncached(texts, loaded)):
+            scored[(id(loaded), text)] = result
+    return [scored[(id(loaded), text)] for loaded, text in items]
+
+def predict_one(text, loaded):
+    """Classify a single text, coalescing with concurrent callers when micro-batching is on"""
+    # A profiled request scores on its own thread so the profile sees the model
+    if micro_batcher is None or g.get('profile') is not None:
+        return score_texts([text], loaded)[0]
+    
+    cached = prediction_cache.get(_text_key(text, loaded))
+    if cached is not None:
+        return cached
+    return micro_batcher.start().submit((loaded, text)).result(timeout=MICRO_BATCH_TIMEOUT)
+
+# --- Background jobs ---
+
+def _score_job_chunk(texts):
+    """(model version, results) for one job chunk; job results are not added to the prediction cache"""
+    loaded = model_manager.active
+    if loaded is None:
+        raise RuntimeError('Model not loaded')
+    return loaded.version, score_texts(texts, loaded, cache_results=False)
+
+def start_job_workers():
+    """Start this process's job workers; they resume jobs left unfinished by a restart"""
+    return job_runner.start()
+
+def _job_source(path):
+    """Real path of a CSV under JOB_INPUT_DIR; raises ValueError for anything else"""
+    root = os.path.realpath(JOB_INPUT_DIR)
+    full_path = os.path.realpath(path)
+    if os.path.commonpath([root, full_path]) != root:
+        raise ValueError(f'path must be inside {JOB_INPUT_DIR}')
+    if not full_path.endswith('.csv') or not os.path.isfile(full_path):
+        raise ValueError(f'CSV file not found: {path}')
+    return full_path
+
+def _job_response(job):
+    return {
+        **job,
+        'job_id': job['id'],
+        'status_url': f"/jobs/{job['id']}",
+        'results_url': f"/jobs/{job['id']}/results"
+    }
+
+# --- Shadow scoring ---
+
+def start_shadow(ref, candidate=None):
+    """Shadow-score the registry entry ref (name, version or 'latest'), replacing any running shadow"""
+    global shadow
+    name = model_registry.resolve(ref)
+    if candidate is None:
+        candidate = model_manager.load_backup(name)
+        warmup(candidate)
+    previous = shadow
+    shadow = ShadowScorer(candidate, *_scorer(candidate), name=name,
+                          sample_rate=SHADOW_SAMPLE_RATE, max_queue=SHADOW_QUEUE_SIZE)
+    if previous is not None:
+        previous.stop()
+    print(f"👥 Shadow scoring {name} (model {candidate.version})")
+    return shadow
+
+def stop_shadow():
+    global shadow
+    previous, shadow = shadow, None
+    if previous is not None:
+        previous.stop()
+    return previous
+
+def _shadow(texts, results, seconds):
+    """Hand texts the primary just scored to the shadow model (enqueue only)"""
+    current = shadow
+    if current is not None:
+        current.submit(texts, results, seconds)
+
+def _shadow_samples():
+    current = shadow
+    if current is None:
+        return {}
+    stats = current.stats()
+    return {
+        (stats['version'], 'agree'): stats['agreed'],
+        (stats['version'], 'disagree'): stats['texts'] - stats['agreed'],
+        (stats['version'], 'dropped_requests'): stats['dropped']
+    }
+
+def score_emails(emails, loaded):
+    """
+    Classify (messageId, text) pairs. Emails whose messageId this model
+    version already classified come from the classification store without
+    inference; the rest are scored (cache, then model) and recorded.
+    
+    Returns:
+        (results, number of emails answered from the store)
+    """
+    known = {}
+    if classification_store is not None:
+        message_ids = [message_id for message_id, _ in emails if message_id]
+        if message_ids:
+            known = classification_store.lookup(message_ids, loaded.version)
+            hits = sum(message_id in known for message_id in message_ids)
+            STORE_LOOKUPS.inc('hit', amount=hits)
+            STORE_LOOKUPS.inc('miss', amount=len(message_ids) - hits)
+    
+    pending = [(message_id, text) for message_id, text in emails if message_id not in known]
+    if len(pending) == 1:
+        scored = [predict_one(pending[0][1], loaded)]
     else:
-        return "Applied"
+        scored = score_texts([text for _, text in pending], loaded)
+    
+    new = {message_id: result for (message_id, _), result in zip(pending, scored) if message_id}
+    if new and classification_store is not None:
+        classification_store.put_many(new, loaded.version)
+    
+    scored = iter(scored)
+    results = [known[message_id] if message_id in known else next(scored) for message_id, _ in emails]
+    return results, len(emails) - len(pending)
+
+def _message_id(email):
+    """messageId of a request email as a string, or None"""
+    message_id = email.get('messageId')
+    return str(message_id) if message_id not in (None, '') else None
+
+def with_top_k(result, k):
+    """Copy of a prediction with its k most likely classes as 'top_k' (cached results stay untouched)"""
+    top = list(result['probabilities'].items())[:k]
+    return {**result, 'top_k': [{'label': label, 'probability': prob} for label, prob in top]}
+
+def _parse_top_k(data):
+    """Optional positive int 'top_k' from a request body; raises ValueError on bad input"""
+    top_k = data.get('top_k')
+    if top_k is None:
+        return None
+    if isinstance(top_k, bool) or not isinstance(top_k, int) or top_k < 1:
+        raise ValueError('top_k must be a positive integer')
+    return top_k
+
+def _admin_authorized():
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
 
 # --- Endpoints ---
 
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Count and time every request (streamed bodies are timed until their headers are sent)"""
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUESTS.inc(endpoint, request.method, str(response.status_code))
+    if response.status_code >= 400:
+        REQUEST_ERRORS.inc(endpoint, str(response.status_code))
+    start = g.get('request_start')
+    if start is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint)
+    return response
+
+@app.before_request
+def track_interactive():
+    """Count in-flight interactive requests so background jobs yield to them"""
+    if request.path in INTERACTIVE_ENDPOINTS:
+        job_runner.enter_interactive()
+        g.interactive = True
+
+@app.teardown_request
+def untrack_interactive(exc):
+    # Runs after the whole response, streamed bodies included
+    if g.pop('interactive', False):
+        job_runner.exit_interactive()
+
+@app.before_request
+def start_profile():
+    """Profile this request if asked to (X-Profile: 1 with a valid admin token) or sampled"""
+    if request.path not in PROFILED_ENDPOINTS:
+        return
+    if request.headers.get('X-Profile') == '1' and _admin_authorized():
+        reason = 'requested'
+    elif request_profiler.should_sample():
+        reason = 'sampled'
+    else:
+        return
+    g.profile = request_profiler.start()
+    g.profile_reason = reason
+
+@app.after_request
+def finish_profile(response):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+    loaded = model_manager.active
+    profile_id = request_profiler.stop(profile, {
+        'endpoint': request.path,
+        'reason': g.profile_reason,
+        'status': response.status_code,
+        'duration_s': round(time.perf_counter() - g.request_start, 6),
+        'model_version': loaded.version if loaded else None,
+        'timestamp': time.time()
+    })
+    response.headers['X-Profile-Id'] = profile_id
+    return response
+
+@app.after_request
+def add_model_version_header(response):
+    """Tag every response with the model version that was active when it was sent"""
+    loaded = model_manager.active
+    if loaded is not None:
+        response.headers['X-Model-Version'] = loaded.version
+    return response
+
 @app.route('/auth/status', methods=['GET'])
 def auth_status():
     """Mock auth status for frontend compatibility"""
@@ -77,160 +611,594 @@ def get_labels():
 @app.route('/api/emails/analyze', methods=['GET'])
 def analyze_emails():
     """
-    Endpoint to fetch and analyze emails.
-    Currently returns mock data as requested.
-    """
-    mock_real_data = [
-        {
-            "id": "real_1",
-            "company": "Anthropic",
-            "role": "AI Research Engineer",
-            "salary": "$250k",
-            "status": classify_email_status("Interview Invitation", "We would like to schedule a coding interview."),
-            "description": "Research role focusing on alignment.",
-            "date": "2023-11-01",
-            "emailSnippet": "We would like to schedule a coding interview with you next week."
-        },
-        {
-            "id": "real_2",
-            "company": "OpenAI",
-            "role": "Member of Technical Staff",
-            "salary": "$300k",
-            "status": classify_email_status("Application Update", "Thank you for applying. Unfortunately we will not move forward."),
-            "description": "Core infrastructure team.",
-            "date": "2023-10-28",
-            "emailSnippet": "Thank you for applying. Unfortunately we will not move forward at this time."
-        },
-        {
-            "id": "real_3",
-            "company": "DeepMind",
-            "role": "Research Scientist",
-            "salary": "Unknown",
-            "status": classify_email_status("Application Received", "We have received your application for Research Scientist."),
-            "description": "AGI research.",
-            "date": "2023-11-05",
-            "emailSnippet": "We have received your application for Research Scientist. Our team will review it shortly."
-        },
-        {
-            "id": "real_4",
-            "company": "Meta",
-            "role": "Frontend Engineer",
-            "salary": "$190k",
-            "status": "Offer",
-            "description": "React core team.",
-            "date": "2023-11-10",
-            "emailSnippet": "We are pleased to offer you the position of Frontend Engineer at Meta."
-        }
-    ]
+    One page of analyzed emails from the local mailbox (MAILBOX_DIR):
+    company, role, salary, keyword status and model label
+    (?cursor=<next_cursor of the previous page>&limit=50)
+    """
+    try:
+        limit = min(max(request.args.get('limit', ANALYZE_PAGE_SIZE, type=int), 1), ANALYZE_MAX_PAGE_SIZE)
+        loaded = model_manager.active
+        # Without a model the page still carries the keyword status
+        classify = (lambda emails: score_emails(emails, loaded)[0]) if loaded is not None else None
+        try:
+            messages, next_cursor = mailbox.page(request.args.get('cursor'), limit, classify, STREAM_CHUNK_SIZE)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        emails = [{
+            'id': message['id'],
+            'threadId': message['threadId'],
+            'company': message['company'],
+            'role': message['role'],
+            'salary': message['salary'],
+            'status': message['status'],
+            'label': message.get('label'),
+            'confidence': message.get('confidence'),
+            'description': message['subject'],
+            'from': message['from'],
+            'date': message['date'],
+            'emailSnippet': message['body'][:SNIPPET_CHARS]
+        } for message in messages]
+        if loaded is not None:
+            _count_labels(emails)
+        return _json_response({
+            'emails': emails,
+            'count': len(emails),
+            'next_cursor': next_cursor,
+            'model_version': loaded.version if loaded is not None else None
+        })
     
-    return jsonify(mock_real_data)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Liveness check: 200 as soon as the process serves HTTP, even while the model is loading"""
+    loaded = model_manager.active
     return jsonify({
         'status': 'healthy',
-        'model_loaded': model is not None,
-        'vectorizer_loaded': vectorizer is not None
+        # Each worker process holds its own reference to the model
+        'pid': os.getpid(),
+        'ready': startup['ready'],
+        'model_loaded': loaded is not None,
+        'vectorizer_loaded': loaded is not None,
+        'model_version': loaded.version if loaded else None,
+        'model': model_manager.status(),
+        'cache': prediction_cache.stats(),
+        'micro_batch': micro_batcher.stats() if micro_batcher else None,
+        'jobs': job_runner.stats(),
+        'mailbox': mailbox.stats(),
+        'shadow': shadow.name if shadow else None
     })
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness check: 200 only once the model is loaded and warmed up, 503 before"""
+    loaded = model_manager.active
+    ready = startup['ready'] and loaded is not None
+    return jsonify({
+        'ready': ready,
+        'phase': startup['phase'],
+        'error': startup['error'],
+        'model_version': loaded.version if loaded else None,
+        'startup_ms': startup['phases']
+    }), 200 if ready else 503
+
 @app.route('/predict', methods=['POST'])
 def predict():
-    """Predict email category"""
+    """Predict email category (with an optional messageId, known messages skip inference)"""
     try:
-        data = request.get_json()
+        data = _parse_json()
         if not data: return jsonify({'error': 'No JSON data provided'}), 400
         
         subject = data.get('subject', '')
         body = data.get('body', '')
         
         if not subject and not body: return jsonify({'error': 'Both subject and body are empty'}), 400
+        try:
+            top_k = _parse_top_k(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        if not model or not vectorizer:
+        loaded = model_manager.active
+        if loaded is None:
             return jsonify({'error': 'Model not loaded'}), 503
 
+        REQUEST_BATCH_SIZE.observe(1, '/predict')
         text = f"{subject} {body}"
-        text_vectorized = vectorizer.transform([text])
-        prediction = model.predict(text_vectorized)[0]
-        probabilities = model.predict_proba(text_vectorized)[0]
-        
-        prob_dict = {label: float(prob) for label, prob in zip(model.classes_, probabilities)}
-        confidence = float(max(probabilities))
-        
-        return jsonify({
-            'label': prediction,
-            'confidence': confidence,
-            'probabilities': prob_dict
-        })
+        message_id = _message_id(data)
+        start = time.perf_counter()
+        if message_id:
+            [result], stored = score_emails([(message_id, text)], loaded)
+        else:
+            result, stored = predict_one(text, loaded), 0
+        _shadow([text], [result], time.perf_counter() - start)
+        _count_labels([result])
+        if top_k:
+            result = with_top_k(result, top_k)
+        if message_id:
+            result = {**result, 'messageId': message_id, 'stored': bool(stored)}
+        return _json_response({**result, 'model_version': loaded.version})
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/batch_predict', methods=['POST'])
 def batch_predict():
-    """Predict multiple emails at once"""
+    """Predict multiple emails at once (emails with a known messageId skip inference)"""
     try:
-        data = request.get_json()
+        data = _parse_json()
         if not data or 'emails' not in data: return jsonify({'error': 'No emails provided'}), 400
         
         emails = data['emails']
         if not isinstance(emails, list): return jsonify({'error': 'emails must be a list'}), 400
+        if len(emails) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'Too many emails: {len(emails)} (max {MAX_BATCH_SIZE})'}), 413
+        if not all(isinstance(email, dict) for email in emails):
+            return jsonify({'error': 'Each email must be an object'}), 400
+        try:
+            top_k = _parse_top_k(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        if not model or not vectorizer:
+        loaded = model_manager.active
+        if loaded is None:
              return jsonify({'error': 'Model not loaded'}), 503
 
+        REQUEST_BATCH_SIZE.observe(len(emails), '/batch_predict')
+        texts = [f"{email.get('subject', '')} {email.get('body', '')}" for email in emails]
+        message_ids = [_message_id(email) for email in emails]
+        start = time.perf_counter()
+        if any(message_ids):
+            predictions, stored = score_emails(list(zip(message_ids, texts)), loaded)
+        else:
+            predictions, stored = score_texts(texts, loaded), 0
+        _shadow(texts, predictions, time.perf_counter() - start)
+        _count_labels(predictions)
+        if top_k:
+            predictions = [with_top_k(prediction, top_k) for prediction in predictions]
+        if any(message_ids):
+            predictions = [{**prediction, 'messageId': message_id} if message_id else prediction
+                           for prediction, message_id in zip(predictions, message_ids)]
+        return _json_response({'predictions': predictions, 'model_version': loaded.version, 'stored': stored})
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/thread_predict', methods=['POST'])
+def thread_predict():
+    """
+    Classify a batch of emails per Gmail thread: one inference per thread.
+    
+    Body: {"emails": [{"threadId", "messageId", "subject", "body",
+    "internalDate"?}, ...], "mode": "latest" | "combined",
+    "include_messages": false, "top_k"?}. "latest" scores each thread's
+    newest message, "combined" all of its messages as one text. The
+    thread's 'status' comes from the status rules: the newest message
+    with a non-default status. With include_messages, every message is
+    also classified and returned under its thread.
+    """
+    try:
+        data = _parse_json()
+        if not data or 'emails' not in data: return jsonify({'error': 'No emails provided'}), 400
+        
+        emails = data['emails']
+        if not isinstance(emails, list): return jsonify({'error': 'emails must be a list'}), 400
+        if len(emails) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'Too many emails: {len(emails)} (max {MAX_BATCH_SIZE})'}), 413
+        if not all(isinstance(email, dict) for email in emails):
+            return jsonify({'error': 'Each email must be an object'}), 400
+        mode = data.get('mode', 'latest')
+        if mode not in THREAD_MODES:
+            return jsonify({'error': f"mode must be one of {', '.join(THREAD_MODES)}"}), 400
+        include_messages = bool(data.get('include_messages'))
+        try:
+            top_k = _parse_top_k(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        loaded = model_manager.active
+        if loaded is None:
+            return jsonify({'error': 'Model not loaded'}), 503
+        
+        REQUEST_BATCH_SIZE.observe(len(emails), '/thread_predict')
+        threads = group_threads(emails)
+        message_results = {}
+        if include_messages:
+            messages = [message for _, thread in threads for message in thread]
+            scored, _ = score_emails(
+                [(_message_id(m), f"{m.get('subject', '')} {m.get('body', '')}") for m in messages], loaded
+            )
+            message_results = {id(message): result for message, result in zip(messages, scored)}
+        
+        # One model input per thread; 'latest' reuses the newest message's result (and its stored one)
+        pending = []
+        for thread_id, thread in threads:
+            newest = thread[-1]
+            if mode == 'latest' and id(newest) in message_results:
+                continue
+            subject, body = thread_fields(thread, mode)
+            message_id = _message_id(newest) if mode == 'latest' else None
+            pending.append((id(thread), message_id, f"{subject} {body}"))
+        scored, _ = score_emails([(message_id, text) for _, message_id, text in pending], loaded)
+        thread_results = {key: result for (key, _, _), result in zip(pending, scored)}
+        
         results = []
-        for email in emails:
-            subject = email.get('subject', '')
-            body = email.get('body', '')
-            text = f"{subject} {body}"
-            
-            text_vectorized = vectorizer.transform([text])
-            prediction = model.predict(text_vectorized)[0]
-            probabilities = model.predict_proba(text_vectorized)[0]
-            confidence = float(max(probabilities))
-            
-            results.append({
-                'label': prediction,
-                'confidence': confidence
-            })
+        thread_predictions = []
+        for thread_id, thread in threads:
+            newest = thread[-1]
+            result = thread_results.get(id(thread)) or message_results[id(newest)]
+            thread_predictions.append(result)
+            if top_k:
+                result = with_top_k(result, top_k)
+            statuses = status_rules.classify_many((m.get('subject'), m.get('body')) for m in thread)
+            entry = {
+                'threadId': thread_id,
+                'messageId': _message_id(newest),
+                'messages': len(thread),
+                **result,
+                'status': latest_status(statuses, status_rules.default)
+            }
+            if include_messages:
+                entry['message_results'] = [
+                    {'messageId': _message_id(m), 'status': status,
+                     **(with_top_k(message_results[id(m)], top_k) if top_k else message_results[id(m)])}
+                    for m, status in zip(thread, statuses)
+                ]
+            results.append(entry)
         
-        return jsonify({'predictions': results})
+        _count_labels(thread_predictions)
+        return _json_response({
+            'threads': results,
+            'emails': len(emails),
+            'model_version': loaded.version
+        })
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/stream_predict', methods=['POST'])
+def stream_predict():
+    """
+    Classify a mailbox backfill as NDJSON in, NDJSON out.
+    
+    Each input line is {"messageId": ..., "subject": ..., "body": ...}. Lines
+    are read incrementally and scored in chunks of STREAM_CHUNK_SIZE; each
+    chunk's results are streamed back as soon as it is done, one JSON object
+    per line, echoing messageId (and the input line number) for correlation.
+    Lines that cannot be scored get an error object in the same position, so
+    the output stays in input order.
+    """
+    loaded = model_manager.active
+    if loaded is None:
+        return jsonify({'error': 'Model not loaded'}), 503
+    
+    stream = request.stream
+    
+    def result_line(record):
+        return json.dumps(record, ensure_ascii=False) + '\n'
+    
+    def flush(chunk):
+        # chunk holds (line_no, message_id, text) for emails and ready error records, in input order
+        emails = [item for item in chunk if isinstance(item, tuple)]
+        results = []
+        if emails:
+            REQUEST_BATCH_SIZE.observe(len(emails), '/stream_predict')
+            texts = [text for _, _, text in emails]
+            start = time.perf_counter()
+            results, _ = score_emails([(message_id, text) for _, message_id, text in emails], loaded)
+            _shadow(texts, results, time.perf_counter() - start)
+            _count_labels(results)
+        start = time.perf_counter()
+        results = iter(results)
+        lines = ''.join(
+            result_line(item if isinstance(item, dict) else
+                        {'line': item[0], 'messageId': item[1], **next(results), 'model_version': loaded.version})
+            for item in chunk
+        )
+        STAGE_SECONDS.observe(time.perf_counter() - start, 'serialize')
+        return lines
+    
+    def parse_line(line_no, line):
+        """(line_no, message_id, text) for a scorable email, else its error record"""
+        try:
+            email = json.loads(line)
+        except ValueError as e:
+            return {'line': line_no, 'error': f'Invalid JSON: {e}'}
+        if not isinstance(email, dict):
+            return {'line': line_no, 'error': 'Each line must be a JSON object'}
+        
+        subject = email.get('subject') or ''
+        body = email.get('body') or ''
+        if not subject and not body:
+            return {'line': line_no, 'messageId': email.get('messageId'), 'error': 'Both subject and body are empty'}
+        return line_no, _message_id(email), f"{subject} {body}"
+    
+    def generate():
+        chunk = []
+        for line_no, raw in enumerate(stream, 1):
+            line = raw.strip()
+            if not line:
+                continue
+            
+            chunk.append(parse_line(line_no, line))
+            if len(chunk) >= STREAM_CHUNK_SIZE:
+                yield flush(chunk)
+                chunk = []
+        
+        if chunk:
+            yield flush(chunk)
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queue a background classification job and return its id (202).
+    
+    Body: {"emails": [{"messageId", "subject", "body"}, ...]} or
+    {"path": "<export or training CSV under JOB_INPUT_DIR>"}. Poll
+    GET /jobs/<id> for progress and page through GET /jobs/<id>/results.
+    """
+    data = request.get_json(silent=True)
+    if not data or ('emails' in data) == ('path' in data):
+        return jsonify({'error': 'Provide either emails or path'}), 400
+    
+    if 'path' in data:
+        try:
+            source = _job_source(str(data['path']))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        emails = None
+    else:
+        source = None
+        emails = data['emails']
+        if not isinstance(emails, list) or not emails:
+            return jsonify({'error': 'emails must be a non-empty list'}), 400
+        if len(emails) > JOB_MAX_EMAILS:
+            return jsonify({'error': f'Too many emails: {len(emails)} (max {JOB_MAX_EMAILS})'}), 413
+        if not all(isinstance(email, dict) for email in emails):
+            return jsonify({'error': 'Each email must be an object'}), 400
+        emails = [
+            (email.get('messageId'), f"{email.get('subject') or ''} {email.get('body') or ''}"
+             if email.get('subject') or email.get('body') else '')
+            for email in emails
+        ]
+    
+    if job_store.count_active() >= JOB_MAX_ACTIVE:
+        return jsonify({'error': f'Too many active jobs (max {JOB_MAX_ACTIVE}), try again later'}), 429
+    
+    job_id = job_store.create(emails, source, JOB_CHUNK_SIZE)
+    start_job_workers()
+    job_runner.notify()
+    return jsonify(_job_response(job_store.get(job_id))), 202
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """Most recent jobs first, optionally filtered with ?status="""
+    return jsonify({'jobs': job_store.list(request.args.get('status'), request.args.get('limit', 50, type=int))})
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status and progress of a job"""
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    return jsonify(_job_response(job))
+
+@app.route('/jobs/<job_id>/results', methods=['GET'])
+def get_job_results(job_id):
+    """One page of a job's results in input order (?offset=0&limit=100, available while it runs)"""
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+    results = job_store.results(job_id, offset, limit)
+    next_offset = offset + len(results)
+    more = next_offset < job['processed'] or job['status'] in ('queued', 'running')
+    return _json_response({
+        'job_id': job_id,
+        'status': job['status'],
+        'offset': offset,
+        'results': results,
+        'next_offset': next_offset if more else None
+    })
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def delete_job(job_id):
+    """Cancel a queued/running job, or delete a finished one with its results"""
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    if job['status'] in ('queued', 'running'):
+        job_store.cancel(job_id)
+        return jsonify({'success': True, 'job_id': job_id, 'status': 'cancelled'})
+    job_store.delete(job_id)
+    return jsonify({'success': True, 'job_id': job_id, 'deleted': True})
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus scrape endpoint (metrics of the worker process that answers)"""
+    return Response(metrics_registry.render(), mimetype=None, content_type=MetricsRegistry.CONTENT_TYPE)
+
 @app.route('/categories', methods=['GET'])
 def get_categories():
     """Get all available categories"""
-    if model is None:
+    loaded = model_manager.active
+    if loaded is None:
         return jsonify({'error': 'Model not loaded'}), 500
     
     return jsonify({
-        'categories': list(model.classes_)
+        'categories': list(loaded.model.classes_)
     })
 
-if __name__ == '__main__':
-    # Load model on startup
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """Reload the model from disk, or roll back to a backup with {"backup": "<name>"}"""
+    if not _admin_authorized():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    previous = model_manager.active
     try:
-        load_model()
+        if data.get('backup'):
+            loaded = model_manager.rollback(data['backup'])
+        else:
+            loaded = model_manager.reload()
     except Exception as e:
-        print(f"⚠ Warning: {e}")
+        return jsonify({'error': f'Reload failed: {e}', 'model_version': previous.version if previous else None}), 500
+    
+    if loaded is None:
+        return jsonify({'error': 'Model files not found'}), 404
+    
+    return jsonify({
+        'success': True,
+        'previous_version': previous.version if previous else None,
+        'model_version': loaded.version,
+        'source': loaded.source
+    })
+
+@app.route('/admin/profiles', methods=['GET'])
+def admin_profiles():
+    """List stored request profiles, newest first"""
+    if not _admin_authorized():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    return jsonify({'profiles': request_profiler.list(), **request_profiler.stats()})
+
+@app.route('/admin/profiles/<profile_id>', methods=['GET'])
+def admin_profile(profile_id):
+    """Top-function summary of a profile as JSON, or the raw pstats dump with ?format=pstats"""
+    if not _admin_authorized():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    raw = request.args.get('format') == 'pstats'
+    path = request_profiler.path(profile_id, '.prof' if raw else '.json')
+    if path is None or not os.path.exists(path):
+        return jsonify({'error': f'Unknown profile: {profile_id}'}), 404
+    if raw:
+        return send_file(os.path.abspath(path), mimetype='application/octet-stream',
+                         as_attachment=True, download_name=f"{profile_id}.prof")
+    with open(path, 'r', encoding='utf-8') as f:
+        return jsonify(json.load(f))
+
+@app.route('/admin/backups', methods=['GET'])
+def admin_backups():
+    """List model backups that /admin/reload can roll back to"""
+    if not _admin_authorized():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    return jsonify({'backups': list_backups(MODEL_BACKUP_DIR)})
+
+@app.route('/admin/models', methods=['GET'])
+def admin_models():
+    """Registered models with their training metadata, newest first"""
+    if not _admin_authorized():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    loaded = model_manager.active
+    return jsonify({
+        'active_version': loaded.version if loaded else None,
+        'shadow': shadow.name if shadow else None,
+        'models': model_registry.entries()
+    })
+
+@app.route('/admin/shadow', methods=['GET', 'POST', 'DELETE'])
+def admin_shadow():
+    """
+    GET: shadow statistics; POST {"model": "<name|version|latest>"}: start
+    shadow-scoring a registered model; DELETE: stop
+    """
+    if not _admin_authorized():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    if request.method == 'DELETE':
+        previous = stop_shadow()
+        return jsonify({'success': True, 'stopped': previous.stats() if previous else None})
+    
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        if not data.get('model'):
+            return jsonify({'error': 'No model provided'}), 400
+        try:
+            start_shadow(data['model'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 404
+        except Exception as e:
+            return jsonify({'error': f'Shadow model failed to load: {e}'}), 500
+    
+    current = shadow
+    loaded = model_manager.active
+    return jsonify({
+        'primary_version': loaded.version if loaded else None,
+        'shadow': current.stats() if current else None
+    })
+
+@app.route('/admin/shadow/promote', methods=['POST'])
+def admin_shadow_promote():
+    """Record the shadow statistics in the registry and make the shadow model the active one"""
+    if not _admin_authorized():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    current = shadow
+    if current is None:
+        return jsonify({'error': 'No shadow model running'}), 404
+    
+    stats = current.stats()
+    previous = model_manager.active
+    try:
+        model_registry.update(current.name, shadow={
+            **stats, 'primary_version': previous.version if previous else None, 'promoted_at': time.time()
+        })
+        loaded = model_manager.rollback(current.name)
+    except Exception as e:
+        return jsonify({'error': f'Promotion failed: {e}', 'model_version': previous.version if previous else None}), 500
+    
+    return jsonify({
+        'success': True,
+        'previous_version': previous.version if previous else None,
+        'model_version': loaded.version,
+        'shadow': stats
+    })
+
+_record_phase('import_app', _import_started)
+
+if __name__ == '__main__':
+    # Load and warm the model in the background; the port is bound immediately
+    # and /ready reports when predictions can be served
+    start_background_load()
+    model_manager.start_watcher(MODEL_WATCH_INTERVAL)
+    start_job_workers()
     
-    # Run Flask app on port 5001
+    # Development server; use serve.py for the multi-worker production server
+    port = int(os.environ.get('PORT', '5001'))
     print("\n" + "="*50)
-    print("🚀 Email Classification API Server")
+    print("🚀 Email Classification API Server (development)")
     print("="*50)
-    print("Server running on: http://localhost:5001")
+    print(f"Server running on: http://localhost:{port}")
     print("\nAvailable endpoints:")
-    print("  GET  /health          - Health check")
+    print("  GET  /health          - Liveness check")
+    print("  GET  /ready           - Readiness check (model loaded and warmed up)")
+    print("  GET  /metrics         - Prometheus metrics")
     print("  GET  /auth/status     - Mock Auth Status")
     print("  GET  /api/labels      - Mock Labels")
-    print("  GET  /api/emails/analyze - Analyze emails (Mock)")
+    print("  GET  /api/emails/analyze - Analyze local mailbox emails (paged, ?cursor=)")
     print("  GET  /categories      - Get all categories")
     print("  POST /predict         - Predict single email")
     print("  POST /batch_predict   - Predict multiple emails")
-    print("\nPress CTRL+C to stop the server")
+    print("  POST /stream_predict  - Stream NDJSON emails in, NDJSON predictions out")
+    print("  POST /thread_predict  - Classify emails per Gmail thread (one inference per thread)")
+    print("  POST /jobs            - Queue a background job (emails or export CSV path)")
+    print("  GET  /jobs/<id>[/results] - Job progress / paged results")
+    print("  POST /admin/reload    - Hot reload / roll back model (X-Admin-Token)")
+    print("  GET  /admin/backups   - List model backups (X-Admin-Token)")
+    print("  GET  /admin/models    - Model registry with training metadata (X-Admin-Token)")
+    print("  *    /admin/shadow    - Shadow-score a registered model; /admin/shadow/promote (X-Admin-Token)")
+    print("  GET  /admin/profiles  - Request profiles (X-Profile: 1 + X-Admin-Token to record)")
+    print("\nFor production use: python serve.py")
+    print("Press CTRL+C to stop the server")
     print("="*50 + "\n")
     
-    app.run(host='0.0.0.0', port=5001, debug=True)
+    app.run(host='0.0.0.0', port=port, debug=os.environ.get('FLASK_DEBUG') == '1')
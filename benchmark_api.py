@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Load-testing and latency benchmark for the classification API.
+
+Starts the API locally (or targets a running one with --url), then drives
+/predict and /batch_predict with a configurable number of concurrent
+clients and batch sizes. Payloads are sampled from the real training data
+(emails_real.csv, falling back to emails.csv). Each scenario reports
+throughput and p50/p95/p99 latency plus a latency histogram, and the run
+is saved as JSON so it can be compared against a stored baseline.
+
+Usage:
+    python benchmark_api.py
+    python benchmark_api.py --clients 1 8 32 --batch-sizes 10 100 --duration 10
+    python benchmark_api.py --server serve --save-baseline
+    python benchmark_api.py --url http://localhost:5001 --baseline benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import requests
+
+DEFAULT_PORT = 5001
+RESULTS_DIR = 'benchmarks'
+BASELINE_PATH = os.path.join(RESULTS_DIR, 'baseline.json')
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+SERVER_SCRIPTS = {'app': 'app.py', 'serve': 'serve.py'}
+
+
+def load_payloads(data_file=None, limit=5000, seed=42):
+    """Sample (subject, body) pairs from the training data"""
+    candidates = [data_file] if data_file else ['emails_real.csv', 'emails.csv']
+    for path in candidates:
+        if path and os.path.exists(path):
+            df = pd.read_csv(path, usecols=['subject', 'body'], dtype=str, keep_default_na=False)
+            if len(df) > limit:
+                df = df.sample(limit, random_state=seed)
+            print(f"📁 Sampling payloads from {path} ({len(df)} emails)")
+            return list(zip(df['subject'], df['body']))
+    raise FileNotFoundError(f"No payload data found (tried {', '.join(p for p in candidates if p)})")
+
+
+class LocalServer:
+    """Runs app.py or serve.py in a subprocess for the duration of the benchmark"""
+
+    def __init__(self, script, port, log_path):
+        self.script = script
+        self.port = port
+        self.log_path = log_path
+        self.process = None
+
+    def start(self, timeout=60):
+        env = {**os.environ, 'PORT': str(self.port), 'FLASK_DEBUG': '0', 'MODEL_WATCH_INTERVAL': '0'}
+        self._log = open(self.log_path, 'w', encoding='utf-8')
+        self.process = subprocess.Popen(
+            [sys.executable, self.script], env=env, stdout=self._log, stderr=subprocess.STDOUT
+        )
+        url = f"http://127.0.0.1:{self.port}"
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.script} exited with code {self.process.returncode}, see {self.log_path}")
+            try:
+                if requests.get(f"{url}/ready", timeout=1).status_code == 200:
+                    return url
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f"{self.script} did not become ready within {timeout}s, see {self.log_path}")
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self.process:
+            self._log.close()
+
+
+def _make_body(endpoint, emails, cache_bust):
+    """JSON body for one request; cache_bust makes every text unique so the prediction cache never hits"""
+    def email(subject, body):
+        return {'subject': subject, 'body': f"{body} {uuid.uuid4().hex}" if cache_bust else body}
+
+    if endpoint == '/predict':
+        return email(*emails[0])
+    return {'emails': [email(subject, body) for subject, body in emails]}
+
+
+def _client(url, endpoint, batch_size, payloads, cache_bust, deadline, seed, latencies, errors):
+    """One client: send requests back-to-back until the deadline, recording latency in ms"""
+    rng = random.Random(seed)
+    session = requests.Session()
+    while time.perf_counter() < deadline:
+        body = _make_body(endpoint, rng.sample(payloads, min(batch_size, len(payloads))), cache_bust)
+        start = time.perf_counter()
+        try:
+            response = session.post(f"{url}{endpoint}", json=body, timeout=30)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if ok:
+            latencies.append(elapsed_ms)
+        else:
+            errors.append(elapsed_ms)
+    session.close()
+
+
+def histogram(latencies_ms):
+    """Counts per latency bucket, keyed by the bucket's upper bound"""
+    edges = HISTOGRAM_BUCKETS_MS + [float('inf')]
+    counts = np.histogram(latencies_ms, bins=[0] + edges)[0] if len(latencies_ms) else [0] * len(edges)
+    return {('+Inf' if edge == float('inf') else f"{edge}ms"): int(count) for edge, count in zip(edges, counts)}
+
+
+def run_scenario(url, endpoint, clients, batch_size, payloads, duration, warmup, cache_bust):
+    """Run one (endpoint, clients, batch_size) combination and summarize it"""
+    name = f"{endpoint.strip('/')}-c{clients}-b{batch_size}"
+    # Warm up connections and the model without recording anything
+    if warmup > 0:
+        _run_clients(url, endpoint, clients, batch_size, payloads, warmup, cache_bust)
+
+    latencies, errors, elapsed = _run_clients(url, endpoint, clients, batch_size, payloads, duration, cache_bust)
+    samples = np.array(latencies)
+    completed = len(samples)
+    result = {
+        'name': name,
+        'endpoint': endpoint,
+        'clients': clients,
+        'batch_size': batch_size,
+        'requests': completed,
+        'errors': len(errors),
+        'duration_s': round(elapsed, 3),
+        'throughput_rps': round(completed / elapsed, 2),
+        'emails_per_s': round(completed * batch_size / elapsed, 2),
+        'latency_ms': {
+            'p50': round(float(np.percentile(samples, 50)), 3) if completed else None,
+            'p95': round(float(np.percentile(samples, 95)), 3) if completed else None,
+            'p99': round(float(np.percentile(samples, 99)), 3) if completed else None,
+            'mean': round(float(samples.mean()), 3) if completed else None,
+            'max': round(float(samples.max()), 3) if completed else None,
+        },
+        'histogram': histogram(samples)
+    }
+    latency = result['latency_ms']
+    print(f"   {name:<28} {result['throughput_rps']:>9.1f} req/s {result['emails_per_s']:>10.1f} emails/s   "
+          f"p50 {latency['p50']}ms  p95 {latency['p95']}ms  p99 {latency['p99']}ms  errors {result['errors']}")
+    return result
+
+
+def _run_clients(url, endpoint, clients, batch_size, payloads, duration, cache_bust):
+    latencies, errors = [], []
+    start = time.perf_counter()
+    deadline = start + duration
+    threads = [
+        threading.Thread(
+            target=_client,
+            args=(url, endpoint, batch_size, payloads, cache_bust, deadline, seed, latencies, errors),
+            daemon=True
+        )
+        for seed in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - start
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    Flag scenarios whose p95 latency rose or throughput fell by more than tolerance
+
+    Returns:
+        List of regression messages (empty when nothing regressed)
+    """
+    previous = {scenario['name']: scenario for scenario in baseline.get('scenarios', [])}
+    regressions = []
+    print(f"\n📊 Compared with baseline ({baseline.get('meta', {}).get('timestamp', 'unknown')}):")
+    for scenario in results['scenarios']:
+        old = previous.get(scenario['name'])
+        if old is None:
+            print(f"   {scenario['name']:<28} (not in baseline)")
+            continue
+
+        old_p95, new_p95 = old['latency_ms']['p95'], scenario['latency_ms']['p95']
+        old_rps, new_rps = old['throughput_rps'], scenario['throughput_rps']
+        p95_change = (new_p95 - old_p95) / old_p95 if old_p95 and new_p95 is not None else 0.0
+        rps_change = (new_rps - old_rps) / old_rps if old_rps else 0.0
+
+        flags = []
+        if p95_change > tolerance:
+            flags.append(f"p95 +{p95_change:.0%}")
+        if rps_change < -tolerance:
+            flags.append(f"throughput {rps_change:.0%}")
+        if scenario['errors'] > old.get('errors', 0):
+            flags.append(f"errors {old.get('errors', 0)} -> {scenario['errors']}")
+
+        status = f"⚠️  REGRESSION ({', '.join(flags)})" if flags else "✓"
+        print(f"   {scenario['name']:<28} p95 {p95_change:+.1%}  throughput {rps_change:+.1%}  {status}")
+        if flags:
+            regressions.append(f"{scenario['name']}: {', '.join(flags)}")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def save_results(results, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results saved to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分类API的压测与延迟基准测试')
+    parser.add_argument('--url', default=None, help='压测已运行的服务 (默认: 在本地启动服务)')
+    parser.add_argument('--server', choices=sorted(SERVER_SCRIPTS), default='app',
+                        help='本地启动的服务: app (Flask开发服务器) 或 serve (gunicorn) (默认: app)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'本地服务端口 (默认: {DEFAULT_PORT})')
+    parser.add_argument('--data', default=None, help='采样请求内容的CSV (默认: emails_real.csv，不存在时用emails.csv)')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16], help='并发客户端数 (默认: 1 4 16)')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[10, 100],
+                        help='/batch_predict 每个请求的邮件数 (默认: 10 100)')
+    parser.add_argument('--endpoints', nargs='+', choices=['/predict', '/batch_predict'],
+                        default=['/predict', '/batch_predict'], help='要压测的接口')
+    parser.add_argument('--duration', type=float, default=5.0, help='每个场景的测量时长/秒 (默认: 5)')
+    parser.add_argument('--warmup', type=float, default=1.0, help='每个场景的预热时长/秒，不计入结果 (默认: 1)')
+    parser.add_argument('--allow-cache', action='store_true',
+                        help='允许命中预测缓存 (默认给每封邮件加随机后缀，测量真实推理开销)')
+    parser.add_argument('--output', default=None, help='结果JSON路径 (默认: benchmarks/results-<时间>.json)')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help=f'用于对比的基线JSON (默认: {BASELINE_PATH})')
+    parser.add_argument('--save-baseline', action='store_true', help='把本次结果保存为新的基线')
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='p95上升或吞吐下降超过该比例即判定为退化 (默认: 0.15)')
+    args = parser.parse_args()
+
+    payloads = load_payloads(args.data)
+
+    server = None
+    url = args.url
+    if url is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        server = LocalServer(SERVER_SCRIPTS[args.server], args.port, os.path.join(RESULTS_DIR, 'server.log'))
+        print(f"🚀 Starting {server.script} on port {args.port}...")
+        url = server.start()
+
+    try:
+        health = requests.get(f"{url}/health", timeout=5).json()
+        timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        results = {
+            'meta': {
+                'timestamp': timestamp,
+                'url': url,
+                'server': args.server if server else 'external',
+                'git_commit': _git_commit(),
+                'model_version': health.get('model_version'),
+                'python': platform.python_version(),
+                'cpu_count': os.cpu_count(),
+                'duration_s': args.duration,
+                'cache_bust': not args.allow_cache
+            },
+            'scenarios': []
+        }
+
+        print(f"\n⏱️  Benchmarking {url} (model {results['meta']['model_version']}, {args.duration}s per scenario)")
+        for endpoint in args.endpoints:
+            batch_sizes = [1] if endpoint == '/predict' else args.batch_sizes
+            for batch_size in batch_sizes:
+                for clients in args.clients:
+                    results['scenarios'].append(run_scenario(
+                        url, endpoint, clients, batch_size, payloads,
+                        args.duration, args.warmup, not args.allow_cache
+                    ))
+    finally:
+        if server:
+            server.stop()
+
+    print()
+    save_results(results, args.output or os.path.join(RESULTS_DIR, f"results-{timestamp}.json"))
+
+    regressions = []
+    if args.save_baseline:
+        save_results(results, args.baseline)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare_with_baseline(results, json.load(f), args.tolerance)
+    else:
+        print(f"💡 No baseline at {args.baseline}; run with --save-baseline to create one")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} scenario(s) regressed beyond {args.tolerance:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
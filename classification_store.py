@@ -0,0 +1,113 @@
+"""
+Persistent classification results keyed by Gmail messageId.
+
+A Gmail message never changes once received, so (messageId, model version)
+identifies a prediction for good. The API records every prediction made
+for a request that carries a messageId. When a mailbox is rescanned, the
+messages it already classified with the active model are answered from
+here without vectorizing or scoring them. Only new messages, and messages
+last classified by an older model, reach the model, so recurring scans
+cost time in proportion to the new mail rather than the inbox size.
+
+Results live in one SQLite table whose primary key is (message_id,
+model_version); lookups are batched ``IN`` queries on that index.
+
+Usage (rows per model version, optionally dropping other versions):
+    python classification_store.py [--prune-except <model_version>]
+"""
+
+import json
+import time
+
+from sqlite_utils import init_database, transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS classifications (
+    message_id TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    label TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    probabilities TEXT NOT NULL,
+    classified_at REAL NOT NULL,
+    PRIMARY KEY (message_id, model_version)
+) WITHOUT ROWID;
+"""
+
+# Bound parameters per IN query (SQLite allows 999 in older builds)
+LOOKUP_BATCH = 500
+
+
+class ClassificationStore:
+    """
+    Args:
+        path: SQLite database file
+    """
+
+    def __init__(self, path='classifications.sqlite3'):
+        self.path = path
+        init_database(path, SCHEMA)
+
+    def _transaction(self):
+        return transaction(self.path)
+
+    def lookup(self, message_ids, model_version):
+        """{messageId: result} for the given ids already classified by model_version"""
+        unique_ids = list(dict.fromkeys(message_ids))
+        found = {}
+        with self._transaction() as conn:
+            for start in range(0, len(unique_ids), LOOKUP_BATCH):
+                batch = unique_ids[start:start + LOOKUP_BATCH]
+                rows = conn.execute(
+                    'SELECT message_id, label, confidence, probabilities FROM classifications '
+                    f'WHERE model_version = ? AND message_id IN ({",".join("?" * len(batch))})',
+                    (model_version, *batch)
+                )
+                for message_id, label, confidence, probabilities in rows:
+                    found[message_id] = {
+                        'label': label,
+                        'confidence': confidence,
+                        'probabilities': json.loads(probabilities)
+                    }
+        return found
+
+    def put_many(self, results, model_version):
+        """Record {messageId: result} predicted by model_version"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO classifications VALUES (?, ?, ?, ?, ?, ?)',
+                ((message_id, model_version, result['label'], result['confidence'],
+                  json.dumps(result['probabilities']), now)
+                 for message_id, result in results.items())
+            )
+
+    def counts(self):
+        """Stored results per model version"""
+        with self._transaction() as conn:
+            return dict(conn.execute(
+                'SELECT model_version, COUNT(*) FROM classifications GROUP BY model_version'
+            ).fetchall())
+
+    def prune(self, keep_version):
+        """Delete results of every other model version; returns the number of rows removed"""
+        with self._transaction() as conn:
+            cursor = conn.execute('DELETE FROM classifications WHERE model_version != ?', (keep_version,))
+        return cursor.rowcount
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='查看/清理按messageId保存的分类结果')
+    parser.add_argument('--db', default='classifications.sqlite3', help='数据库文件 (默认: classifications.sqlite3)')
+    parser.add_argument('--prune-except', metavar='MODEL_VERSION', help='删除除该模型版本外的所有结果')
+    args = parser.parse_args()
+
+    store = ClassificationStore(args.db)
+    if args.prune_except:
+        print(f"🧹 Removed {store.prune(args.prune_except)} results of other model versions")
+    counts = store.counts()
+    if not counts:
+        print(f"📭 No stored classifications in {args.db}")
+    for version, count in sorted(counts.items(), key=lambda item: -item[1]):
+        print(f"   {version}: {count} messages")
@@ -0,0 +1,78 @@
+"""
+Grouping of Gmail messages into threads.
+
+Follow-ups, confirmations and replies of one application share a threadId.
+Classifying each of them independently costs one inference per message and
+lets the label flip back and forth within a thread. These helpers group
+messages by thread (oldest first) and build one model input per thread:
+
+    latest     the newest message only (the thread's current stage)
+    combined   every message, subjects then bodies, oldest first
+
+Messages are ordered by ``internalDate`` (epoch ms) when present and then by
+messageId: Gmail ids are hexadecimal and grow over time. Messages without a
+threadId form a thread of their own.
+
+Shared by the API (/thread_predict) and prepare_training_data.py --by-thread.
+"""
+
+THREAD_MODES = ('latest', 'combined')
+
+
+def message_age(message_id):
+    """Sort key of a Gmail messageId (hex, increasing over time); unknown ids sort first"""
+    try:
+        return int(message_id, 16)
+    except (TypeError, ValueError):
+        return -1
+
+
+def _message_key(indexed):
+    index, message = indexed
+    try:
+        date = int(message.get('internalDate') or 0)
+    except (TypeError, ValueError):
+        date = 0
+    return date, message_age(message.get('messageId')), index
+
+
+def group_threads(messages):
+    """
+    Group message dicts (threadId, messageId, subject, body, optional
+    internalDate) by thread
+
+    Returns:
+        [(threadId or None, [messages oldest first])] in order of each
+        thread's first message in the input
+    """
+    threads = {}
+    for index, message in enumerate(messages):
+        thread_id = message.get('threadId') or None
+        key = thread_id if thread_id is not None else ('\0', index)
+        threads.setdefault(key, (thread_id, []))[1].append((index, message))
+
+    return [
+        (thread_id, [message for _, message in sorted(indexed, key=_message_key)])
+        for thread_id, indexed in threads.values()
+    ]
+
+
+def thread_fields(messages, mode='latest'):
+    """(subject, body) representing a thread (messages oldest first) for mode"""
+    if mode == 'latest':
+        newest = messages[-1]
+        return newest.get('subject') or '', newest.get('body') or ''
+    if mode == 'combined':
+        return (
+            ' '.join(message.get('subject') or '' for message in messages),
+            ' '.join(message.get('body') or '' for message in messages)
+        )
+    raise ValueError(f"mode must be one of {', '.join(THREAD_MODES)}")
+
+
+def latest_status(statuses, default):
+    """Status of a thread from its messages' rule statuses (oldest first): the newest one that is not the default"""
+    for status in reversed(statuses):
+        if status != default:
+            return status
+    return default
@@ -0,0 +1,387 @@
+"""
+Persistent background classification jobs.
+
+Classification runs too large for one /batch_predict call (e.g. re-labelling
+a whole exported inbox) are submitted as jobs: a list of emails, or the path
+of a Gmail export / training CSV. Jobs, their inputs and their results live
+in a SQLite file, so they survive restarts:
+
+    jobs          one row per job: status, progress, timestamps, error
+    job_inputs    submitted emails, in order (CSV jobs read their file instead)
+    job_results   one row per email, in input order, written chunk by chunk
+
+A small pool of worker threads claims queued jobs and scores them chunk by
+chunk, committing each chunk's results together with the progress. A job is
+claimed with a lease that every chunk renews; jobs whose lease ran out (the
+process died mid-job) are claimed again and resume after the last committed
+chunk. Several processes can share one database.
+
+Background work must not starve interactive /predict traffic. Scoring holds
+the GIL, so while interactive requests are in flight or were seen within the
+last second, a worker pauses before each chunk for as long as the previous
+chunk took (at most max_yield_ms). Under interactive load, jobs therefore get
+at most about half of the interpreter, and they run at full speed otherwise.
+Chunks are small, which keeps each scoring call short.
+"""
+
+import csv
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+from sqlite_utils import init_database, transaction
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+# Seconds after the last interactive request during which job workers keep yielding
+INTERACTIVE_WINDOW = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    source TEXT,
+    total INTEGER,
+    processed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    chunk_size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS job_inputs (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    message_id TEXT,
+    text TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS job_results (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    message_id TEXT,
+    label TEXT,
+    confidence REAL,
+    probabilities TEXT,
+    model_version TEXT,
+    error TEXT,
+    PRIMARY KEY (job_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+def _job_dict(row):
+    job = dict(row)
+    job.pop('heartbeat_at', None)
+    job['progress'] = job['processed'] / job['total'] if job['total'] else (1.0 if job['status'] == 'done' else 0.0)
+    return job
+
+
+def read_export_rows(path):
+    """
+    (messageId, text) for every row of a Gmail export (subject + snippet) or
+    training CSV (subject + body), labeled or not
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            body = row.get('body') if 'body' in row else row.get('snippet')
+            subject, body = row.get('subject') or '', body or ''
+            yield row.get('messageId') or None, f"{subject} {body}" if subject or body else ''
+
+
+class JobStore:
+    """
+    Args:
+        path: SQLite database file
+    """
+
+    def __init__(self, path='jobs.sqlite3'):
+        self.path = path
+        init_database(path, SCHEMA)
+
+    def _transaction(self, immediate=False):
+        return transaction(self.path, immediate=immediate, row_factory=sqlite3.Row)
+
+    def create(self, emails=None, source=None, chunk_size=256):
+        """
+        Queue a job over emails (list of (messageId, text)) or a CSV file at source
+
+        Returns:
+            The job id
+        """
+        job_id = uuid.uuid4().hex
+        with self._transaction() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, status, source, total, chunk_size, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, 'queued', source, None if source else len(emails), chunk_size, time.time())
+            )
+            if not source:
+                conn.executemany(
+                    'INSERT INTO job_inputs (job_id, seq, message_id, text) VALUES (?, ?, ?, ?)',
+                    ((job_id, seq, message_id, text) for seq, (message_id, text) in enumerate(emails))
+                )
+        return job_id
+
+    def get(self, job_id):
+        with self._transaction() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return _job_dict(row) if row else None
+
+    def list(self, status=None, limit=50):
+        """Most recent jobs first"""
+        query = 'SELECT * FROM jobs' + (' WHERE status = ?' if status else '') + ' ORDER BY created_at DESC LIMIT ?'
+        with self._transaction() as conn:
+            rows = conn.execute(query, (status, limit) if status else (limit,)).fetchall()
+        return [_job_dict(row) for row in rows]
+
+    def counts(self):
+        with self._transaction() as conn:
+            return dict(conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+
+    def count_active(self):
+        counts = self.counts()
+        return sum(counts.get(status, 0) for status in ACTIVE_STATUSES)
+
+    def results(self, job_id, offset=0, limit=100):
+        """One page of results in input order"""
+        with self._transaction() as conn:
+            rows = conn.execute(
+                'SELECT seq, message_id, label, confidence, probabilities, model_version, error FROM job_results '
+                'WHERE job_id = ? AND seq >= ? ORDER BY seq LIMIT ?',
+                (job_id, offset, limit)
+            ).fetchall()
+
+        page = []
+        for row in rows:
+            result = {'index': row['seq'], 'messageId': row['message_id']}
+            if row['error']:
+                result['error'] = row['error']
+            else:
+                result.update(label=row['label'], confidence=row['confidence'],
+                              probabilities=json.loads(row['probabilities']), model_version=row['model_version'])
+            page.append(result)
+        return page
+
+    def inputs(self, job_id, offset, limit):
+        with self._transaction() as conn:
+            rows = conn.execute(
+                'SELECT message_id, text FROM job_inputs WHERE job_id = ? AND seq >= ? ORDER BY seq LIMIT ?',
+                (job_id, offset, limit)
+            ).fetchall()
+        return [(row['message_id'], row['text']) for row in rows]
+
+    def claim(self, lease_seconds):
+        """Take the oldest queued job, or a running one whose lease expired; None if there is none"""
+        now = time.time()
+        with self._transaction(immediate=True) as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' OR (status = 'running' AND heartbeat_at < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now - lease_seconds,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = COALESCE(started_at, ?), heartbeat_at = ? WHERE id = ?",
+                (now, now, row['id'])
+            )
+        return {**dict(row), 'status': 'running'}
+
+    def set_total(self, job_id, total):
+        with self._transaction() as conn:
+            conn.execute('UPDATE jobs SET total = ? WHERE id = ?', (total, job_id))
+
+    def save_chunk(self, job_id, start, results, model_version):
+        """
+        Store one chunk's results (in input order from start) and advance the
+        job's progress in the same transaction
+
+        Returns:
+            The job's status afterwards ('cancelled' tells the worker to stop)
+        """
+        rows = []
+        failed = 0
+        for seq, (message_id, result) in enumerate(results, start):
+            if 'error' in result:
+                failed += 1
+                rows.append((job_id, seq, message_id, None, None, None, None, result['error']))
+            else:
+                rows.append((job_id, seq, message_id, result['label'], result['confidence'],
+                             json.dumps(result['probabilities']), model_version, None))
+
+        with self._transaction(immediate=True) as conn:
+            status = conn.execute('SELECT status FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if status is None or status['status'] != 'running':
+                return status['status'] if status else None
+            # OR REPLACE: a resumed job may redo the chunk that was in flight when its worker died
+            conn.executemany('INSERT OR REPLACE INTO job_results VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            conn.execute(
+                'UPDATE jobs SET processed = ?, failed = failed + ?, heartbeat_at = ? WHERE id = ?',
+                (start + len(results), failed, time.time(), job_id)
+            )
+        return 'running'
+
+    def finish(self, job_id, status, error=None):
+        """Mark a running job done/failed (a job cancelled meanwhile stays cancelled)"""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND status = 'running'",
+                (status, error, time.time(), job_id)
+            )
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; True if it was active"""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+                (time.time(), job_id)
+            )
+        return cursor.rowcount > 0
+
+    def delete(self, job_id):
+        """Remove a finished job with its inputs and results"""
+        with self._transaction() as conn:
+            for table, column in (('job_results', 'job_id'), ('job_inputs', 'job_id'), ('jobs', 'id')):
+                conn.execute(f'DELETE FROM {table} WHERE {column} = ?', (job_id,))
+
+
+class JobRunner:
+    """
+    Worker pool scoring stored jobs chunk by chunk.
+
+    Args:
+        store: JobStore
+        score_fn: Callable taking a list of texts and returning (model_version, results)
+        workers: Worker threads (jobs processed concurrently)
+        lease_seconds: A running job not heard from for this long is picked up again
+        max_yield_ms: Longest pause before a chunk while interactive requests are being served
+        ready: Callable telling whether jobs can be scored (e.g. the model is loaded)
+    """
+
+    def __init__(self, store, score_fn, workers=1, lease_seconds=60, max_yield_ms=100, ready=None, idle_poll=1.0):
+        self.store = store
+        self.score_fn = score_fn
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.max_yield = max_yield_ms / 1000.0
+        self.ready = ready or (lambda: True)
+        self.idle_poll = idle_poll
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._interactive = 0
+        self._last_interactive = 0.0
+        self.chunks = 0
+        self.yields = 0
+
+    def start(self):
+        """Start the worker threads (idempotent)"""
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, name=f'job-worker-{len(self._threads)}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    def notify(self):
+        """Wake idle workers (a job was submitted)"""
+        self._wakeup.set()
+
+    # --- Interactive admission ---
+
+    def enter_interactive(self):
+        with self._lock:
+            self._interactive += 1
+
+    def exit_interactive(self):
+        with self._lock:
+            self._interactive -= 1
+            self._last_interactive = time.monotonic()
+
+    def _yield_to_interactive(self, last_chunk_seconds):
+        if self._interactive == 0 and time.monotonic() - self._last_interactive > INTERACTIVE_WINDOW:
+            return
+        self.yields += 1
+        time.sleep(min(last_chunk_seconds, self.max_yield))
+
+    # --- Workers ---
+
+    def _run(self):
+        while True:
+            try:
+                job = self.store.claim(self.lease_seconds) if self.ready() else None
+            except sqlite3.Error as e:
+                print(f"⚠ Job store unavailable: {e}")
+                job = None
+            if job is None:
+                self._wakeup.wait(self.idle_poll)
+                self._wakeup.clear()
+                continue
+            try:
+                self._process(job)
+            except Exception as e:
+                self.store.finish(job['id'], 'failed', f"{type(e).__name__}: {e}")
+                print(f"⚠ Job {job['id']} failed: {e}")
+
+    def _chunks(self, job):
+        """Lists of (messageId, text) from the job's first unprocessed email on"""
+        size = job['chunk_size']
+        offset = job['processed']
+        if not job['source']:
+            while True:
+                chunk = self.store.inputs(job['id'], offset, size)
+                if not chunk:
+                    return
+                yield chunk
+                offset += len(chunk)
+
+        if job['total'] is None:
+            self.store.set_total(job['id'], sum(1 for _ in read_export_rows(job['source'])))
+        chunk = []
+        for index, row in enumerate(read_export_rows(job['source'])):
+            if index < offset:
+                continue
+            chunk.append(row)
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _process(self, job):
+        processed = job['processed']
+        last_chunk_seconds = 0.0
+        for chunk in self._chunks(job):
+            self._yield_to_interactive(last_chunk_seconds)
+            start = time.perf_counter()
+
+            texts = [text for _, text in chunk if text]
+            model_version, scored = self.score_fn(texts) if texts else (None, [])
+            scored = iter(scored)
+            results = [
+                (message_id, next(scored) if text else {'error': 'Both subject and body are empty'})
+                for message_id, text in chunk
+            ]
+
+            status = self.store.save_chunk(job['id'], processed, results, model_version)
+            last_chunk_seconds = time.perf_counter() - start
+            processed += len(chunk)
+            self.chunks += 1
+            if status != 'running':
+                return
+        self.store.finish(job['id'], 'done')
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'alive': sum(t.is_alive() for t in self._threads),
+            'interactive_in_flight': self._interactive,
+            'chunks': self.chunks,
+            'yields': self.yields
+        }
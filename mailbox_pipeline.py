@@ -0,0 +1,343 @@
+"""
+Streaming analysis of local mailbox files for /api/emails/analyze.
+
+The mailbox is a directory of Gmail export CSVs (threadId, messageId,
+subject, from, snippet) and/or mbox files (e.g. a Google Takeout). It is
+read as a chain of generators, one page at a time:
+
+    records     raw bytes of one CSV row / mbox message, read line by line
+    parse       subject, sender, date and body of each record
+    extract     company, role and salary via precompiled patterns, and the
+                keyword-rule status
+    classify    the model label, scored in chunks of (messageId, text) pairs
+
+Nothing holds more than one page of messages. A cursor is the position of
+the next message: ``<file index>:<byte offset>`` into the sorted list of
+mailbox files. A page resumes with a seek instead of re-reading the files
+before it. Parsed and extracted messages are kept in a bounded LRU keyed by
+file, modification time and offset, so repeated pages are not parsed
+again. Labels come from the classification store and prediction cache.
+Cursors stay valid while no mailbox file is added or removed. A changed
+file is parsed again.
+"""
+
+import csv
+import email
+import html
+import os
+import re
+from datetime import datetime, timezone
+from email.policy import default as default_policy
+from email.utils import parseaddr, parsedate_to_datetime
+from itertools import islice
+
+from prediction_cache import PredictionCache
+
+MAILBOX_SUFFIXES = ('.csv', '.mbox')
+
+# Body characters kept per message (mbox bodies can be arbitrarily long)
+MAX_BODY_CHARS = 2000
+SNIPPET_CHARS = 200
+UNKNOWN = 'Unknown'
+
+# Role and company patterns, tried in order on the subject and then the body.
+# A role is up to four capitalized words ending in a job title noun; a company
+# is a run of capitalized words (joined by of/and/&), so prose is not matched.
+_TITLES = (
+    'designer|engineer|developer|programmer|manager|director|lead|intern|internship|analyst|scientist|'
+    'researcher|specialist|associate|assistant|coordinator|consultant|strategist|artist|illustrator|'
+    'animator|photographer|writer|copywriter|editor|producer|architect|administrator|technician|'
+    'representative|ambassador|officer|recruiter'
+)
+_ROLE = rf"(?=[A-Z0-9])(?:[A-Z0-9][\w&'’+/.-]*[ \t]+){{0,4}}(?i:{_TITLES})s?\b"
+_COMPANY = r"[A-Z0-9][\w&'’.+-]*(?:[ \t]+(?:(?:of|and|the|de|&)[ \t]+[A-Z]|[A-Z0-9])[\w&'’.+-]*)*"
+ROLE_COMPANY_PATTERNS = [re.compile(pattern) for pattern in (
+    # LinkedIn alerts: “Graphic Designer”: Wiraa - Web & Graphic Designer and more
+    rf"[“\"](?P<role>[^”\"\n]+)[”\"]:\s*(?P<company>{_COMPANY}?)\s+(?:-|is hiring)",
+    rf"(?P<role>{_ROLE})(?:[ \t]+(?i:opening|position|role|job))?[ \t]+(?:at|@|with)[ \t]+(?P<company>{_COMPANY})",
+)]
+COMPANY_PATTERNS = [re.compile(pattern) for pattern in (
+    rf"(?i:application was (?:sent|viewed) (?:to|by)) (?P<company>{_COMPANY})",
+    rf"(?i:thanks? (?:you )?for (?:applying|your application|your interest)) (?i:to|at|in|with) (?P<company>{_COMPANY})",
+    r"(?i:your) (?P<company>[A-Z][\w&.-]*) (?i:application)",
+    rf"(?P<company>{_COMPANY}) (?:is hiring|has an open position|has new|and others are hiring)",
+    rf"(?i:welcome to|interview with|offer from|on behalf of) (?P<company>{_COMPANY})",
+)]
+ROLE_PATTERNS = [re.compile(pattern) for pattern in (
+    rf"(?P<role>{_ROLE})(?:[ \t]+(?i:jobs?|roles?|positions?|openings?))",
+    rf"(?i:position|role) (?i:of|as) (?:an? )?(?P<role>{_ROLE})",
+    rf"(?P<role>{_ROLE})",
+)]
+# Sender display names such as "Acme Careers" or "Acme Talent Acquisition"
+SENDER_COMPANY_PATTERN = re.compile(
+    r"^(?P<company>.+?)\s+(?i:careers|recruiting|recruitment|talent(?: acquisition)?|hiring(?: team)?|jobs|hr)\b"
+)
+
+_AMOUNT = r"\$\s?\d+(?:,\d{3})*(?:\.\d+)?\s?[kK]?"
+_PERIOD = r"\s?(?:/|per |an |a )\s?(?:hour|hr|year|yr|annum|month|mo)\b"
+SALARY_PATTERN = re.compile(rf"{_AMOUNT}(?:\s?(?:-|–|to)\s?{_AMOUNT})?(?:{_PERIOD})?")
+# "$20 and under" or "$1.5B" are prices, not pay: a salary needs thousands, a range or a period
+_SALARY_HINT = re.compile(rf"[kK,]|\d\s?(?:-|–|to)\s?\$|{_PERIOD}")
+
+_HTML_TAG = re.compile(r"<(?:script|style)\b.*?</(?:script|style)>|<[^>]+>", re.S | re.I)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def list_sources(root):
+    """Mailbox files under root (recursively), in a stable order"""
+    sources = []
+    for directory, _, names in os.walk(root):
+        sources.extend(os.path.join(directory, name) for name in names if name.endswith(MAILBOX_SUFFIXES))
+    return sorted(sources)
+
+
+def encode_cursor(file_index, offset):
+    return f"{file_index}:{offset}"
+
+
+def decode_cursor(cursor):
+    """(file index, byte offset) of a cursor; raises ValueError for malformed ones"""
+    if not cursor:
+        return 0, 0
+    file_index, sep, offset = str(cursor).partition(':')
+    if not sep or not file_index.isdigit() or not offset.isdigit():
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return int(file_index), int(offset)
+
+
+def _csv_records(f):
+    """(start, end, bytes) of each CSV record; quoted fields may span lines"""
+    while True:
+        start = f.tell()
+        record = f.readline()
+        if not record:
+            return
+        quotes = record.count(b'"')
+        while quotes % 2:
+            line = f.readline()
+            if not line:
+                break
+            record += line
+            quotes += line.count(b'"')
+        yield start, f.tell(), record
+
+
+def _mbox_records(f):
+    """(start, end, bytes) of each mbox message, from its "From " line to the next"""
+    start, lines = None, []
+    while True:
+        position = f.tell()
+        line = f.readline()
+        if not line or line.startswith(b'From '):
+            if start is not None:
+                yield start, position, b''.join(lines)
+            if not line:
+                return
+            start, lines = position, []
+        elif start is not None:
+            # Body lines starting with "From " are stored as ">From " (mboxrd)
+            lines.append(line[1:] if line.startswith(b'>') and line.lstrip(b'>').startswith(b'From ') else line)
+
+
+def _clean(text, limit=MAX_BODY_CHARS):
+    return _WHITESPACE.sub(' ', text).strip()[:limit]
+
+
+def _message_date(message_id):
+    """ISO date of a Gmail messageId: its high bits are the receive time in epoch ms"""
+    try:
+        return datetime.fromtimestamp((int(message_id, 16) >> 20) / 1000, timezone.utc).date().isoformat()
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+
+
+def parse_csv_row(row):
+    """Message fields of a Gmail export (snippet) or training CSV (body) row"""
+    message_id = row.get('messageId') or None
+    return {
+        'id': message_id,
+        'threadId': row.get('threadId') or None,
+        'subject': _clean(row.get('subject') or ''),
+        'from': row.get('from') or '',
+        'date': _message_date(message_id),
+        'body': _clean(row.get('body') or row.get('snippet') or '')
+    }
+
+
+def parse_mbox_message(raw):
+    """Message fields of one mbox message (the text/plain part, else the stripped text/html one)"""
+    message = email.message_from_bytes(raw, policy=default_policy)
+    body = ''
+    try:
+        part = message.get_body(preferencelist=('plain', 'html'))
+        if part is not None:
+            body = part.get_content()
+            if part.get_content_type() == 'text/html':
+                body = html.unescape(_HTML_TAG.sub(' ', body))
+    except (LookupError, ValueError):
+        pass
+
+    try:
+        date = parsedate_to_datetime(message['date']).date().isoformat() if message['date'] else None
+    except (TypeError, ValueError):
+        date = None
+    thread_id = message.get('X-GM-THRID')
+    return {
+        'id': (message.get('Message-ID') or '').strip('<> ') or None,
+        # Takeout writes the Gmail thread id in decimal; the API uses hex
+        'threadId': format(int(thread_id), 'x') if thread_id and thread_id.isdigit() else thread_id,
+        'subject': _clean(str(message.get('subject') or '')),
+        'from': str(message.get('from') or ''),
+        'date': date,
+        'body': _clean(body)
+    }
+
+
+def _first(patterns, texts, *groups):
+    for text in texts:
+        for pattern in patterns:
+            match = pattern.search(text)
+            if match:
+                return tuple(match.group(group).strip(' -–,.\'’‘') for group in groups)
+    return None
+
+
+def extract_salary(texts):
+    for text in texts:
+        for match in SALARY_PATTERN.finditer(text):
+            if _SALARY_HINT.search(match.group()):
+                return match.group().strip()
+    return UNKNOWN
+
+
+def extract_fields(message):
+    """Company, role and salary of a parsed message ('Unknown' where nothing matches)"""
+    texts = (message['subject'], message['body'])
+    company = role = None
+    found = _first(ROLE_COMPANY_PATTERNS, texts, 'role', 'company')
+    if found:
+        role, company = found
+    if not company:
+        found = _first(COMPANY_PATTERNS, texts, 'company')
+        company = found[0] if found else None
+    if not role:
+        found = _first(ROLE_PATTERNS, texts, 'role')
+        role = found[0] if found else None
+    if not company:
+        name, _ = parseaddr(message['from'])
+        match = SENDER_COMPANY_PATTERN.match(name)
+        company = match.group('company') if match else None
+    return {
+        'company': company or UNKNOWN,
+        'role': role or UNKNOWN,
+        'salary': extract_salary(texts)
+    }
+
+
+class MailboxPipeline:
+    """
+    Args:
+        root: Directory of mailbox files (.csv Gmail exports, .mbox)
+        status_rules: StatusRuleEngine for the keyword status
+        cache_size: Parsed messages kept for repeated pages (0 disables)
+    """
+
+    def __init__(self, root, status_rules, cache_size=10000):
+        self.root = root
+        self.status_rules = status_rules
+        self._parsed = PredictionCache(max_size=cache_size)
+        self.parsed = 0
+
+    def _analyze(self, message):
+        message.update(extract_fields(message))
+        message['status'] = self.status_rules.classify(message['subject'], message['body'])
+        return message
+
+    def _file_messages(self, path, offset):
+        """(message, end offset) from offset on; cached messages skip parsing"""
+        stat = os.stat(path)
+        identity = f"{path}:{stat.st_mtime_ns}:{stat.st_size}"
+        is_csv = path.endswith('.csv')
+
+        with open(path, 'rb') as f:
+            header = None
+            if is_csv:
+                # The header row names the columns of every later record
+                header_record = next(_csv_records(f), None)
+                if header_record is None:
+                    return
+                header = next(csv.reader([header_record[2].decode('utf-8-sig')]))
+                offset = max(offset, header_record[1])
+
+            while True:
+                cached = self._parsed.get(f"{identity}:{offset}")
+                if cached is not None:
+                    # Blank records are cached as None too, so a rescan skips them without reading
+                    message, offset = cached
+                    if message is not None:
+                        yield dict(message), offset
+                    continue
+
+                f.seek(offset)
+                record = next(_csv_records(f) if is_csv else _mbox_records(f), None)
+                if record is None:
+                    return
+                start, end, raw = record
+                if is_csv:
+                    values = next(csv.reader([raw.decode('utf-8', errors='replace')]), [])
+                    message = parse_csv_row(dict(zip(header, values))) if values else None
+                else:
+                    message = parse_mbox_message(raw)
+                if message is not None:
+                    message = self._analyze(message)
+                    self.parsed += 1
+                self._parsed.put(f"{identity}:{start}", (message, end))
+                offset = end
+                if message is not None:
+                    yield dict(message), offset
+
+    def messages(self, cursor=None):
+        """
+        Lazily yield (message, cursor of the next message) from cursor on
+
+        Raises:
+            ValueError: For malformed cursors
+        """
+        file_index, offset = decode_cursor(cursor)
+        sources = list_sources(self.root)
+        for index in range(file_index, len(sources)):
+            for message, end in self._file_messages(sources[index], offset if index == file_index else 0):
+                yield message, encode_cursor(index, end)
+
+    def page(self, cursor=None, limit=50, classify=None, chunk_size=256):
+        """
+        One page of analyzed messages
+
+        Args:
+            classify: Optional callable scoring [(messageId, text)] -> [result]
+                      (called once per chunk)
+
+        Returns:
+            (messages, next cursor or None at the end of the mailbox)
+        """
+        stream = islice(self.messages(cursor), limit + 1)
+        messages, next_cursor = [], None
+        for message, end in stream:
+            if len(messages) == limit:
+                # One message more than asked for tells us whether there is a next page
+                break
+            messages.append(message)
+            next_cursor = end
+        else:
+            next_cursor = None
+
+        if classify is not None:
+            for start in range(0, len(messages), chunk_size):
+                chunk = messages[start:start + chunk_size]
+                results = classify([(m['id'], f"{m['subject']} {m['body']}") for m in chunk])
+                for message, result in zip(chunk, results):
+                    message.update(label=result['label'], confidence=result['confidence'])
+        return messages, next_cursor
+
+    def stats(self):
+        return {'root': self.root, 'parsed': self.parsed, 'cache': self._parsed.stats()}
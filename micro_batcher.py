@@ -0,0 +1,98 @@
+"""
+Micro-batching request coalescer.
+
+Single-item requests are held in a queue for at most ``max_wait_ms`` (or
+until ``max_batch`` items have arrived) and then scored together in one
+call, so concurrent callers share the fixed per-call model overhead.
+"""
+
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent single-item calls into batched calls of score_fn.
+
+    Args:
+        score_fn: Callable taking a list of items and returning a list of
+            results in the same order
+        max_wait_ms: Longest time the first queued item waits for company
+        max_batch: Largest number of items scored in one call
+    """
+
+    def __init__(self, score_fn, max_wait_ms=5, max_batch=32):
+        self.score_fn = score_fn
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.batch_sizes = Counter()
+
+    def start(self):
+        """Start the background worker (idempotent)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._thread.start()
+        return self
+
+    def submit(self, item):
+        """Queue an item and return a Future resolving to its result"""
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def _collect(self):
+        """Block for the first item, then gather more until full or the deadline passes"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            futures = [future for _, future in batch]
+
+            with self._lock:
+                self.batches += 1
+                self.items += len(batch)
+                self.batch_sizes[len(batch)] += 1
+
+            try:
+                results = self.score_fn(items)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_wait_ms': self.max_wait * 1000.0,
+                'max_batch': self.max_batch,
+                'batches': self.batches,
+                'items': self.items,
+                'avg_batch_size': self.items / self.batches if self.batches else 0.0,
+                'batch_size_counts': {str(size): count for size, count in sorted(self.batch_sizes.items())}
+            }
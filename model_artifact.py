@@ -0,0 +1,339 @@
+"""
+Pickle-free model artifact.
+
+A trained TfidfVectorizer + linear classifier is exported as a directory of
+plain ``.npy`` arrays plus a small ``meta.json``:
+
+    model_artifact/
+        meta.json        vectorizer settings, model version
+        classes.npy      class labels
+        coef.npy         (n_classes, n_weighted) weights, float64 or float32
+        intercept.npy    (n_classes,) biases
+        idf.npy          (n_features,) inverse document frequencies
+        vocabulary.npy   UTF-8 terms sorted bytewise (fixed-width bytes)
+        feature_index.npy  column of each sorted term
+        stop_words.npy   sorted stop words (fixed-width unicode)
+
+With pruning, features whose weights are near zero for every class are
+dropped from the vocabulary, idf and coef together, so the artifact (and
+the lookup work per text) shrinks with them. Row norms are then computed
+without those terms, which shifts probabilities slightly; the compact
+report in train_model.py measures the effect on accuracy. Artifacts from
+older versions may keep pruned terms after column ``n_weighted`` for the
+norm only; they still load.
+
+The arrays are opened with ``np.load(mmap_mode='r')`` so every worker
+process shares one page-cache copy and nothing is unpickled at startup.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+
+# 2: stop words moved from meta.json to stop_words.npy; format 1 artifacts still load
+ARTIFACT_FORMAT = 2
+META_FILE = 'meta.json'
+
+
+def compute_model_version(*paths):
+    """Short content hash identifying a model/vectorizer pair"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def artifact_exists(artifact_dir):
+    return os.path.exists(os.path.join(artifact_dir, META_FILE))
+
+
+def read_artifact_meta(artifact_dir):
+    with open(os.path.join(artifact_dir, META_FILE), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def artifact_version(meta):
+    """
+    Version of the model an artifact serves: its source pair's version,
+    tagged with the export settings that change predictions (float32
+    weights, pruning), e.g. ``99092c445c79-f32-p0.05``. None if the source
+    version is unknown.
+    """
+    version = meta.get('source_version')
+    if not version:
+        return None
+    if meta.get('coef_dtype', 'float64') != 'float64':
+        version += '-' + meta['coef_dtype'].replace('float', 'f')
+    if meta.get('prune_threshold'):
+        version += f"-p{meta['prune_threshold']:g}"
+    return version
+
+
+def _proba_kind(model):
+    """How predict_proba turns decision scores into probabilities"""
+    if len(model.classes_) == 2:
+        return 'binary'
+    if type(model).__name__ in ('LogisticRegression', 'LogisticRegressionCV'):
+        if getattr(model, 'multi_class', 'auto') == 'ovr' or model.solver == 'liblinear':
+            return 'ovr'
+        return 'softmax'
+    # SGDClassifier(loss='log_loss') and other linear models score one-vs-rest
+    return 'ovr'
+
+
+def export_artifact(model, vectorizer, artifact_dir='model_artifact', source_version=None,
+                    coef_dtype='float64', prune_threshold=0.0):
+    """
+    Export a fitted TfidfVectorizer + LogisticRegression as a pickle-free artifact
+
+    Args:
+        model: Fitted linear classifier with coef_, intercept_ and classes_
+        vectorizer: Fitted TfidfVectorizer using the built-in word analyzer
+        artifact_dir: Output directory (created if missing)
+        source_version: Version of the model.pkl/vectorizer.pkl pair this was exported from
+        coef_dtype: 'float64' (exact) or 'float32' (half the weight memory)
+        prune_threshold: Drop the weights of features whose largest |coef| across classes is below this
+    """
+    import numpy as np
+
+    if not hasattr(vectorizer, 'vocabulary_') or not hasattr(vectorizer, 'idf_'):
+        raise ValueError("Only a fitted TfidfVectorizer can be exported")
+    if vectorizer.analyzer != 'word' or vectorizer.tokenizer is not None or vectorizer.preprocessor is not None:
+        raise ValueError("Only the built-in word analyzer can be exported")
+    if vectorizer.strip_accents is not None:
+        raise ValueError("strip_accents is not supported by the artifact format")
+    if vectorizer.norm not in ('l1', 'l2', None):
+        raise ValueError(f"Unsupported norm: {vectorizer.norm}")
+
+    # Build next to the target and swap it in, so readers never see a half-written artifact
+    final_dir = artifact_dir
+    artifact_dir = f"{final_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(artifact_dir, ignore_errors=True)
+    os.makedirs(artifact_dir)
+
+    stop_words = vectorizer.get_stop_words()
+    coef = np.asarray(model.coef_)
+    idf = vectorizer.idf_ if vectorizer.use_idf else np.ones(coef.shape[1])
+
+    # Kept features keep their relative order; pruned ones leave vocabulary, idf and coef alike
+    weighted = np.abs(coef).max(axis=0) >= prune_threshold if prune_threshold > 0 else np.ones(coef.shape[1], dtype=bool)
+    kept = np.flatnonzero(weighted)
+    new_column = np.full(coef.shape[1], -1, dtype=np.int64)
+    new_column[kept] = np.arange(len(kept))
+
+    # Bytewise order of UTF-8 equals code point order, so this is also sorted(terms)
+    terms = sorted(
+        term.encode('utf-8') for term, column in vectorizer.vocabulary_.items() if new_column[column] >= 0
+    )
+    arrays = {
+        'classes': np.asarray([str(c) for c in model.classes_]),
+        'coef': np.ascontiguousarray(coef[:, kept], dtype=coef_dtype),
+        'intercept': np.ascontiguousarray(model.intercept_, dtype=np.float64),
+        'idf': np.ascontiguousarray(idf[kept], dtype=np.float64),
+        'vocabulary': np.asarray(terms, dtype=bytes),
+        'feature_index': np.asarray([new_column[vectorizer.vocabulary_[t.decode('utf-8')]] for t in terms], dtype=np.int32),
+        'stop_words': np.asarray(sorted(stop_words or ()), dtype=str),
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(artifact_dir, f'{name}.npy'), array, allow_pickle=False)
+
+    meta = {
+        'format': ARTIFACT_FORMAT,
+        'source_version': source_version,
+        'n_features': len(terms),
+        'n_weighted': len(kept),
+        'n_pruned': int(coef.shape[1] - len(kept)),
+        'coef_dtype': str(np.dtype(coef_dtype)),
+        'prune_threshold': prune_threshold,
+        'proba': _proba_kind(model),
+        'lowercase': vectorizer.lowercase,
+        'token_pattern': vectorizer.token_pattern,
+        'ngram_range': list(vectorizer.ngram_range),
+        'binary': vectorizer.binary,
+        'sublinear_tf': vectorizer.sublinear_tf,
+        'norm': vectorizer.norm,
+    }
+    # meta.json goes last: its presence marks a complete artifact
+    with open(os.path.join(artifact_dir, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    old_dir = f"{final_dir}.old-{os.getpid()}"
+    if os.path.exists(final_dir):
+        os.replace(final_dir, old_dir)
+    os.replace(artifact_dir, final_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    return meta
+
+
+class ArtifactVectorizer:
+    """TF-IDF transform backed by memory-mapped vocabulary and idf arrays"""
+
+    def __init__(self, meta, vocabulary, feature_index, idf, stop_words=None):
+        import numpy as np
+
+        self.lowercase = meta['lowercase']
+        self.ngram_range = tuple(meta['ngram_range'])
+        # Sorted and memory-mapped like the vocabulary; format 1 artifacts list them in meta.json
+        if stop_words is None:
+            stop_words = np.asarray(sorted(meta.get('stop_words') or ()), dtype=str)
+        self.stop_words = stop_words
+        self.binary = meta['binary']
+        self.sublinear_tf = meta['sublinear_tf']
+        self.norm = meta['norm']
+        self._token_re = re.compile(meta['token_pattern'])
+        # Older artifacts store the vocabulary as fixed-width unicode
+        self._bytes_vocabulary = vocabulary.dtype.kind == 'S'
+        self.vocabulary = vocabulary
+        self.feature_index = feature_index
+        self.idf_ = idf
+
+    def analyze(self, doc):
+        """Same token and n-gram sequence as sklearn's word analyzer"""
+        return self.analyze_many([doc])[0]
+
+    def analyze_many(self, docs):
+        """analyze() for each doc, with one stop-word search for the whole batch"""
+        import numpy as np
+
+        docs = [self._token_re.findall(doc.lower() if self.lowercase else doc) for doc in docs]
+        if len(self.stop_words):
+            tokens = np.asarray([t for doc in docs for t in doc], dtype=str)
+            if len(tokens):
+                pos = np.searchsorted(self.stop_words, tokens)
+                np.minimum(pos, len(self.stop_words) - 1, out=pos)
+                keep = iter((self.stop_words[pos] != tokens).tolist())
+                docs = [[t for t in doc if next(keep)] for doc in docs]
+        return [self._ngrams(tokens) for tokens in docs]
+
+    def _ngrams(self, tokens):
+        min_n, max_n = self.ngram_range
+        if max_n == 1:
+            return tokens
+
+        original = tokens
+        if min_n == 1:
+            tokens = list(original)
+            min_n += 1
+        else:
+            tokens = []
+        for n in range(min_n, min(max_n + 1, len(original) + 1)):
+            for i in range(len(original) - n + 1):
+                tokens.append(' '.join(original[i:i + n]))
+        return tokens
+
+    def lookup(self, terms):
+        """Feature column of each term (-1 if unknown), searched in the sorted mapped vocabulary"""
+        import numpy as np
+
+        if not len(terms) or not len(self.vocabulary):
+            return np.full(len(terms), -1, dtype=np.int64)
+        if self._bytes_vocabulary:
+            terms = np.asarray([t.encode('utf-8') for t in terms], dtype=bytes)
+        else:
+            terms = np.asarray(terms, dtype=str)
+        pos = np.searchsorted(self.vocabulary, terms)
+        np.minimum(pos, len(self.vocabulary) - 1, out=pos)
+        columns = self.feature_index[pos].astype(np.int64)
+        columns[self.vocabulary[pos] != terms] = -1
+        return columns
+
+    def transform(self, texts):
+        import numpy as np
+        import scipy.sparse as sp
+
+        rows = []
+        terms = []
+        for row, tokens in enumerate(self.analyze_many(texts)):
+            rows.extend([row] * len(tokens))
+            terms.extend(tokens)
+
+        shape = (len(texts), len(self.idf_))
+        if not terms:
+            return sp.csr_matrix(shape, dtype=np.float64)
+
+        # Vectorized vocabulary lookup against the sorted term array
+        cols = self.lookup(terms)
+        known = cols >= 0
+        cols = cols[known]
+        rows = np.asarray(rows, dtype=np.int32)[known]
+        X = sp.csr_matrix((np.ones(len(cols)), (rows, cols)), shape=shape, dtype=np.float64)
+        X.sum_duplicates()
+
+        if self.binary:
+            X.data[:] = 1.0
+        elif self.sublinear_tf:
+            np.log(X.data, X.data)
+            X.data += 1.0
+        X.data *= self.idf_[X.indices]
+
+        if self.norm:
+            row_ids = np.repeat(np.arange(shape[0]), np.diff(X.indptr))
+            weights = X.data ** 2 if self.norm == 'l2' else np.abs(X.data)
+            norms = np.bincount(row_ids, weights=weights, minlength=shape[0])
+            if self.norm == 'l2':
+                norms = np.sqrt(norms)
+            X.data /= norms[row_ids]
+        return X
+
+
+class ArtifactClassifier:
+    """Linear classifier scoring from memory-mapped coef_/intercept_ arrays"""
+
+    def __init__(self, meta, classes, coef, intercept):
+        self.proba = meta['proba']
+        self.classes_ = classes
+        self.coef_ = coef
+        self.intercept_ = intercept
+        self.n_weighted = coef.shape[1]
+
+    def decision_function(self, X):
+        # Pruned features sit after the weighted columns and only counted towards the row norm
+        if X.shape[1] != self.n_weighted:
+            X = X[:, :self.n_weighted]
+        return X @ self.coef_.T + self.intercept_
+
+    def predict_proba(self, X):
+        import numpy as np
+
+        scores = self.decision_function(X)
+        if self.proba == 'binary':
+            positive = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+        if self.proba == 'ovr':
+            proba = 1.0 / (1.0 + np.exp(-scores))
+        else:
+            proba = np.exp(scores - scores.max(axis=1, keepdims=True))
+        return proba / proba.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def load_artifact(artifact_dir='model_artifact'):
+    """
+    Load an exported artifact without unpickling anything
+
+    Returns:
+        (classifier, vectorizer, meta) where classifier and vectorizer expose
+        the predict_proba/transform methods used by the API
+    """
+    import numpy as np
+
+    meta = read_artifact_meta(artifact_dir)
+    if meta.get('format') not in (1, ARTIFACT_FORMAT):
+        raise ValueError(f"Unsupported artifact format: {meta.get('format')}")
+
+    def load(name):
+        return np.load(os.path.join(artifact_dir, f'{name}.npy'), mmap_mode='r', allow_pickle=False)
+
+    # Labels are tiny; keep them as plain str so they serialize like sklearn's
+    classes = np.array(load('classes').tolist(), dtype=object)
+    classifier = ArtifactClassifier(meta, classes, load('coef'), load('intercept'))
+    stop_words = load('stop_words') if meta['format'] >= 2 else None
+    vectorizer = ArtifactVectorizer(meta, load('vocabulary'), load('feature_index'), load('idf'), stop_words)
+    return classifier, vectorizer, meta
@@ -0,0 +1,296 @@
+"""
+Model loading, validation and hot reload for the classification API.
+
+The active model is held in a single ``LoadedModel`` tuple that is replaced
+atomically. Request handlers read ``manager.active`` once and use that
+snapshot for the whole request, so in-flight requests finish on the model
+they started with while new requests see the new one.
+"""
+
+import os
+import pickle
+import shutil
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from model_artifact import artifact_exists, artifact_version, compute_model_version, load_artifact, read_artifact_meta
+from scoring_engine import ScoringEngine, check_parity
+
+# engine: NumPy ScoringEngine equivalent to model/vectorizer, or None to score with them directly
+LoadedModel = namedtuple('LoadedModel', ['model', 'vectorizer', 'version', 'source', 'loaded_at', 'engine'],
+                         defaults=(None,))
+
+SMOKE_TEXTS = ["Interview Invitation We would like to schedule an interview with you"]
+
+
+def backup_model_files(paths, backup_root='model_backups'):
+    """
+    Copy the current model files into a timestamped directory under backup_root
+
+    Returns:
+        The backup directory, or None if none of the files exist
+    """
+    existing = [p for p in paths if os.path.exists(p)]
+    if not existing:
+        return None
+
+    pickles = [p for p in existing if p.endswith('.pkl')]
+    version = compute_model_version(*pickles) if len(pickles) == 2 else 'partial'
+    backup_dir = os.path.join(backup_root, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{version}")
+    os.makedirs(backup_dir, exist_ok=True)
+
+    for path in existing:
+        target = os.path.join(backup_dir, os.path.basename(path.rstrip('/\\')))
+        if os.path.isdir(path):
+            shutil.copytree(path, target)
+        else:
+            shutil.copy2(path, target)
+    return backup_dir
+
+
+def list_backups(backup_root='model_backups'):
+    """Backups that contain a loadable model, newest first"""
+    if not os.path.isdir(backup_root):
+        return []
+
+    backups = []
+    for name in sorted(os.listdir(backup_root), reverse=True):
+        path = os.path.join(backup_root, name)
+        has_pickles = os.path.exists(os.path.join(path, 'model.pkl')) and os.path.exists(os.path.join(path, 'vectorizer.pkl'))
+        if os.path.isdir(path) and (has_pickles or artifact_exists(os.path.join(path, 'model_artifact'))):
+            backups.append(name)
+    return backups
+
+
+class ModelManager:
+    """
+    Owns the active model and swaps in replacements after validating them.
+
+    Args:
+        model_path: Pickled classifier
+        vectorizer_path: Pickled vectorizer
+        artifact_dir: Pickle-free artifact directory
+        model_format: 'auto', 'artifact' or 'pickle'
+        backup_root: Directory holding rollback candidates
+        on_swap: Called with the new LoadedModel after every swap
+        scoring_engine: Build a parity-checked NumPy ScoringEngine for each loaded model
+    """
+
+    def __init__(self, model_path='model.pkl', vectorizer_path='vectorizer.pkl', artifact_dir='model_artifact',
+                 model_format='auto', backup_root='model_backups', on_swap=None, scoring_engine=True):
+        self.model_path = model_path
+        self.vectorizer_path = vectorizer_path
+        self.artifact_dir = artifact_dir
+        self.model_format = model_format
+        self.backup_root = backup_root
+        self.on_swap = on_swap
+        self.scoring_engine = scoring_engine
+        self.active = None
+        self.last_error = None
+        self.reload_count = 0
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+
+    # --- Loading ---
+
+    def _use_artifact(self, model_path, vectorizer_path, artifact_dir):
+        """Decide whether to read the memory-mapped artifact instead of the pickles"""
+        if self.model_format == 'pickle' or not artifact_exists(artifact_dir):
+            return False
+        if self.model_format == 'artifact':
+            return True
+
+        if not (os.path.exists(model_path) and os.path.exists(vectorizer_path)):
+            return True
+        # Only trust the artifact if it was exported from the pickles next to it
+        source_version = read_artifact_meta(artifact_dir).get('source_version')
+        if source_version == compute_model_version(model_path, vectorizer_path):
+            return True
+        print(f"Warning: {artifact_dir} does not match {model_path}, loading pickles instead")
+        return False
+
+    def _build_engine(self, model, vectorizer):
+        """NumPy engine for the pair, or None if disabled, unsupported or not in parity"""
+        if not self.scoring_engine:
+            return None
+        try:
+            engine = ScoringEngine.from_pair(model, vectorizer)
+            check_parity(engine, model, vectorizer)
+        except ValueError as e:
+            print(f"Warning: NumPy scoring engine disabled for this model: {e}")
+            return None
+        return engine
+
+    def load(self, model_path=None, vectorizer_path=None, artifact_dir=None):
+        """Load a model from disk without activating it; returns None if files are missing"""
+        model_path = model_path or self.model_path
+        vectorizer_path = vectorizer_path or self.vectorizer_path
+        artifact_dir = artifact_dir or self.artifact_dir
+
+        if self._use_artifact(model_path, vectorizer_path, artifact_dir):
+            print(f"Loading model artifact from {artifact_dir}...")
+            model, vectorizer, meta = load_artifact(artifact_dir)
+            # Lossy exports (float32, pruned) serve different probabilities than their pickles
+            version = artifact_version(meta) or compute_model_version(
+                os.path.join(artifact_dir, 'meta.json'),
+                os.path.join(artifact_dir, 'coef.npy')
+            )
+            return LoadedModel(model, vectorizer, version, artifact_dir, time.time(), self._build_engine(model, vectorizer))
+
+        if self.model_format == 'artifact':
+            print(f"Warning: Model artifact not found: {artifact_dir}")
+            return None
+
+        if not os.path.exists(model_path):
+            # Just print warning, don't crash if model missing for now
+            print(f"Warning: Model file not found: {model_path}")
+            return None
+
+        if not os.path.exists(vectorizer_path):
+            print(f"Warning: Vectorizer file not found: {vectorizer_path}")
+            return None
+
+        print("Loading model and vectorizer...")
+        with open(model_path, 'rb') as f:
+            model = pickle.load(f)
+
+        with open(vectorizer_path, 'rb') as f:
+            vectorizer = pickle.load(f)
+
+        version = compute_model_version(model_path, vectorizer_path)
+        return LoadedModel(model, vectorizer, version, model_path, time.time(), self._build_engine(model, vectorizer))
+
+    @staticmethod
+    def validate(candidate):
+        """Smoke prediction: the pair must produce one finite probability row per class"""
+        probabilities = candidate.model.predict_proba(candidate.vectorizer.transform(SMOKE_TEXTS))
+        if probabilities.shape != (len(SMOKE_TEXTS), len(candidate.model.classes_)):
+            raise ValueError(f"Smoke prediction returned shape {probabilities.shape}")
+        if not (probabilities >= 0).all() or abs(probabilities.sum() - len(SMOKE_TEXTS)) > 1e-6:
+            raise ValueError("Smoke prediction returned invalid probabilities")
+
+    def reload(self, model_path=None, vectorizer_path=None, artifact_dir=None):
+        """
+        Load, validate and atomically activate a model
+
+        Returns:
+            The activated LoadedModel, or None if the files were missing.
+            Validation errors are raised and leave the active model untouched.
+        """
+        with self._reload_lock:
+            try:
+                candidate = self.load(model_path, vectorizer_path, artifact_dir)
+                if candidate is None:
+                    return None
+                self.validate(candidate)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                raise
+
+            previous = self.active
+            self.active = candidate
+            self.last_error = None
+            self.reload_count += 1
+
+        if self.on_swap:
+            self.on_swap(candidate)
+        if previous is None or previous.version != candidate.version:
+            print(f"✓ Model {candidate.version} loaded successfully. Can predict classes: {[str(c) for c in candidate.model.classes_]}")
+        return candidate
+
+    def load_backup(self, backup_name):
+        """Load and validate a backup from backup_root without activating it (e.g. to shadow-score it)"""
+        if backup_name not in list_backups(self.backup_root):
+            raise ValueError(f"Unknown backup: {backup_name}")
+
+        backup_dir = os.path.join(self.backup_root, backup_name)
+        candidate = self.load(
+            os.path.join(backup_dir, 'model.pkl'),
+            os.path.join(backup_dir, 'vectorizer.pkl'),
+            os.path.join(backup_dir, 'model_artifact')
+        )
+        if candidate is None:
+            raise ValueError(f"Backup {backup_name} has no loadable model")
+        self.validate(candidate)
+        return candidate
+
+    def _is_backed_up(self):
+        """True if the live pickles' version already has a backup (backups are named <timestamp>-<version>)"""
+        if not (os.path.exists(self.model_path) and os.path.exists(self.vectorizer_path)):
+            return False
+        version = compute_model_version(self.model_path, self.vectorizer_path)
+        return any(name.endswith(f"-{version}") for name in list_backups(self.backup_root))
+
+    def rollback(self, backup_name):
+        """
+        Validate a backup from backup_root, restore its files over the live
+        ones (backing those up first) and activate it
+        """
+        self.load_backup(backup_name)
+
+        backup_dir = os.path.join(self.backup_root, backup_name)
+        backup_artifact = os.path.join(backup_dir, 'model_artifact')
+        backup_model = os.path.join(backup_dir, 'model.pkl')
+        backup_vectorizer = os.path.join(backup_dir, 'vectorizer.pkl')
+
+        with self._reload_lock:
+            # Registered models already have an entry; only unknown live files need a backup
+            if not self._is_backed_up():
+                backup_model_files([self.model_path, self.vectorizer_path, self.artifact_dir], self.backup_root)
+            for source, target in ((backup_model, self.model_path), (backup_vectorizer, self.vectorizer_path)):
+                if os.path.exists(source):
+                    tmp = f"{target}.tmp"
+                    shutil.copy2(source, tmp)
+                    os.replace(tmp, target)
+            if artifact_exists(backup_artifact):
+                shutil.rmtree(self.artifact_dir, ignore_errors=True)
+                shutil.copytree(backup_artifact, self.artifact_dir)
+
+        return self.reload()
+
+    # --- File watching ---
+
+    def _snapshot(self):
+        paths = (self.model_path, self.vectorizer_path, os.path.join(self.artifact_dir, 'meta.json'))
+        return tuple(os.path.getmtime(p) if os.path.exists(p) else None for p in paths)
+
+    def _watch(self, interval):
+        seen = self._snapshot()
+        while True:
+            time.sleep(interval)
+            current = self._snapshot()
+            if current == seen:
+                continue
+
+            # Wait one more interval so a pair being rewritten is never loaded half-updated
+            time.sleep(interval)
+            if self._snapshot() != current:
+                continue
+
+            seen = current
+            print("🔄 Model files changed, reloading...")
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"⚠ Reload failed, keeping model {self.active.version if self.active else None}: {e}")
+
+    def start_watcher(self, interval):
+        """Poll the model files every interval seconds and reload on change (idempotent)"""
+        if interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name='model-watcher', daemon=True)
+        self._watcher.start()
+
+    def status(self):
+        active = self.active
+        return {
+            'version': active.version if active else None,
+            'source': active.source if active else None,
+            'loaded_at': active.loaded_at if active else None,
+            'scoring_engine': 'numpy' if active and active.engine else 'sklearn',
+            'reload_count': self.reload_count,
+            'last_error': self.last_error,
+            'watching': self._watcher is not None and self._watcher.is_alive()
+        }
@@ -0,0 +1,162 @@
+"""
+Local registry of trained models.
+
+Every training run registers the model it just wrote as a versioned entry
+in model_backups/, the directory the API already rolls back from:
+
+    model_backups/<timestamp>-<version>/
+        model.pkl, vectorizer.pkl, model_artifact/   copies of the served files
+        metadata.json                               how the model was trained and how it performed
+
+metadata.json holds the training data hash, evaluation scores, training time
+and an inference latency benchmark. When the API shadow-scores or promotes
+an entry, it adds the observed agreement and latency under 'shadow'. Plain
+backups without metadata.json are still listed, with only their name and
+version.
+
+Usage (list entries with their key numbers):
+    python model_registry.py
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from model_artifact import artifact_exists, artifact_version, compute_model_version, read_artifact_meta
+from model_manager import backup_model_files, list_backups
+
+METADATA_FILE = 'metadata.json'
+
+
+def data_fingerprint(path):
+    """SHA-256 of a training file, or of every file in a dataset directory (sorted by relative path)"""
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        files = sorted(
+            os.path.relpath(os.path.join(root, name), path)
+            for root, _, names in os.walk(path) for name in names
+        )
+    else:
+        files = ['']
+
+    for relative in files:
+        full_path = os.path.join(path, relative) if relative else path
+        digest.update(relative.replace(os.sep, '/').encode('utf-8') + b'\0')
+        with open(full_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """
+    Args:
+        root: Registry directory (shared with model backups)
+    """
+
+    def __init__(self, root='model_backups'):
+        self.root = root
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def register(self, model_path='model.pkl', vectorizer_path='vectorizer.pkl', artifact_dir=None, metadata=None):
+        """
+        Copy the model files into a new entry and write its metadata
+
+        Returns:
+            The entry name
+        """
+        paths = [model_path, vectorizer_path] + ([artifact_dir] if artifact_dir else [])
+        entry_dir = backup_model_files(paths, self.root)
+        if entry_dir is None:
+            raise FileNotFoundError(f"No model files to register: {paths}")
+
+        name = os.path.basename(entry_dir)
+        version = compute_model_version(model_path, vectorizer_path)
+        # What the API reports when it serves the entry's artifact (differs for float32/pruned exports)
+        served = artifact_version(read_artifact_meta(artifact_dir)) if artifact_dir and artifact_exists(artifact_dir) else None
+        self._write(name, {
+            'name': name,
+            'version': version,
+            'artifact_version': served or version,
+            'registered_at': time.time(),
+            **(metadata or {})
+        })
+        return name
+
+    def get(self, name):
+        """Metadata of an entry ({'name', 'version'} for plain backups); raises ValueError for unknown names"""
+        if name not in list_backups(self.root):
+            raise ValueError(f"Unknown model: {name}")
+
+        metadata_path = os.path.join(self.path(name), METADATA_FILE)
+        if os.path.exists(metadata_path):
+            with open(metadata_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        # Backups are named <timestamp>-<version>
+        return {'name': name, 'version': name.rsplit('-', 1)[-1]}
+
+    def entries(self):
+        """Metadata of every entry, newest first"""
+        return [self.get(name) for name in list_backups(self.root)]
+
+    def resolve(self, ref):
+        """
+        Entry name for ref: an entry name, a model version (newest entry
+        with it as its pickle or artifact version) or 'latest'
+
+        Raises:
+            ValueError: If nothing matches
+        """
+        names = list_backups(self.root)
+        if ref == 'latest' and names:
+            return names[0]
+        if ref in names:
+            return ref
+        for entry in self.entries():
+            if ref in (entry.get('version'), entry.get('artifact_version')):
+                return entry['name']
+        raise ValueError(f"Unknown model: {ref}")
+
+    def has_version(self, version):
+        return any(entry.get('version') == version for entry in self.entries())
+
+    def update(self, name, **fields):
+        """Merge fields into an entry's metadata"""
+        metadata = self.get(name)
+        metadata.update(fields)
+        self._write(name, metadata)
+        return metadata
+
+    def _write(self, name, metadata):
+        path = os.path.join(self.path(name), METADATA_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='列出模型注册表中的模型及其指标')
+    parser.add_argument('--root', default='model_backups', help='注册表目录 (默认: model_backups)')
+    args = parser.parse_args()
+
+    entries = ModelRegistry(args.root).entries()
+    if not entries:
+        print(f"📭 No models registered in {args.root}/")
+        raise SystemExit(0)
+
+    def number(value, fmt):
+        return format(value, fmt) if isinstance(value, (int, float)) else '-'
+
+    print(f"{'name':<32} {'accuracy':>8} {'macro_f1':>8} {'train_s':>8} {'p50_ms':>7} {'p95_ms':>7} {'shadow':>7}")
+    for entry in entries:
+        inference = entry.get('inference') or {}
+        shadow = entry.get('shadow') or {}
+        print(f"{entry['name']:<32} {number(entry.get('accuracy'), '.4f'):>8} {number(entry.get('macro_f1'), '.4f'):>8} "
+              f"{number(entry.get('train_seconds'), '.2f'):>8} {number(inference.get('single_p50_ms'), '.3f'):>7} "
+              f"{number(inference.get('single_p95_ms'), '.3f'):>7} {number(shadow.get('agreement'), '.1%'):>7}")
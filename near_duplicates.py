@@ -0,0 +1,196 @@
+"""
+Near-duplicate detection for training emails with MinHash + LSH banding.
+
+Recruiter templates that differ only by a name or job title produce many
+almost identical rows. Each text is reduced to a MinHash signature over
+its word shingles; signatures are split into bands and hashed into
+buckets, so only texts sharing a bucket are ever compared. Candidate
+pairs are confirmed by their estimated Jaccard similarity, and clusters
+are formed with union-find, all in roughly linear time.
+
+``NearDuplicateIndex`` keeps the band buckets of the rows kept so far, so a
+dataset can be filtered chunk by chunk: each new row is compared with the
+kept rows sharing one of its buckets and is kept only if none is similar.
+"""
+
+import re
+import zlib
+
+import numpy as np
+
+NUM_PERM = 128
+SHINGLE_SIZE = 3
+SEED = 1
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def shingles(text, k=SHINGLE_SIZE):
+    """Set of word k-grams (the whole text for texts shorter than k words)"""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < k:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+def minhash_signatures(texts, num_perm=NUM_PERM, seed=SEED):
+    """
+    MinHash signature per text, shape (len(texts), num_perm), dtype uint32
+
+    Uses multiply-shift hashing ((a*x + b) mod 2**64) >> 32 as the permutation
+    family. Texts without any words get an all-max signature and never match.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+    signatures = np.full((len(texts), num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+    with np.errstate(over='ignore'):
+        for i, text in enumerate(texts):
+            grams = shingles(text)
+            if not grams:
+                continue
+            x = np.fromiter((zlib.crc32(g.encode('utf-8')) for g in grams), dtype=np.uint64, count=len(grams))
+            hashed = (np.outer(a, x) + b[:, None]) >> np.uint64(32)
+            signatures[i] = hashed.min(axis=1)
+    return signatures
+
+
+def choose_bands(num_perm, threshold):
+    """
+    (bands, rows) with bands * rows == num_perm whose LSH threshold (1/b)^(1/r)
+    is the highest one not above threshold. Erring low favours recall; the
+    extra candidates are filtered out by the exact signature comparison.
+    """
+    options = [(num_perm // r, r) for r in range(1, num_perm + 1) if num_perm % r == 0]
+    below = [br for br in options if (1.0 / br[0]) ** (1.0 / br[1]) <= threshold]
+    if not below:
+        return options[0]
+    return max(below, key=lambda br: (1.0 / br[0]) ** (1.0 / br[1]))
+
+
+def cluster_near_duplicates(signatures, threshold=0.8, groups=None):
+    """
+    Cluster rows whose estimated Jaccard similarity reaches threshold
+
+    Args:
+        signatures: Output of minhash_signatures
+        threshold: Minimum estimated Jaccard similarity for two rows to be near-duplicates
+        groups: Optional per-row keys (e.g. labels); rows in different groups never cluster
+
+    Returns:
+        Array with the representative (lowest) row index of each row's cluster
+    """
+    n, num_perm = signatures.shape
+    bands, rows = choose_bands(num_perm, threshold)
+    parent = np.arange(n)
+    empty = (signatures == np.iinfo(np.uint32).max).all(axis=1)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(bands):
+        band_bytes = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        buckets = {}
+        for i in range(n):
+            if empty[i]:
+                continue
+            key = (groups[i] if groups is not None else None, band_bytes[i].tobytes())
+            first = buckets.setdefault(key, i)
+            if first == i:
+                continue
+
+            root_first, root_i = find(first), find(i)
+            if root_first == root_i:
+                continue
+            # Confirm the candidate pair before merging to keep false positives out
+            if np.mean(signatures[first] == signatures[i]) >= threshold:
+                low, high = min(root_first, root_i), max(root_first, root_i)
+                parent[high] = low
+
+    return np.array([find(i) for i in range(n)])
+
+
+class NearDuplicateIndex:
+    """
+    Incremental near-duplicate filter over the rows kept so far
+
+    Args:
+        threshold: Minimum estimated Jaccard similarity for two rows to be near-duplicates
+        num_perm: Signature length (see minhash_signatures)
+    """
+
+    def __init__(self, threshold=0.8, num_perm=NUM_PERM):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+        self._signatures = []
+        self._groups = []
+        self._buckets = {}
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _band_keys(self, signature, group):
+        for band in range(self.bands):
+            yield (group, band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+
+    def _insert(self, signature, group):
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        self._groups.append(group)
+        if not (signature == np.iinfo(np.uint32).max).all():
+            for key in self._band_keys(signature, group):
+                self._buckets.setdefault(key, []).append(index)
+        return index
+
+    def extend(self, signatures, groups=None):
+        """Index rows as kept without checking them (e.g. rows kept by an earlier run)"""
+        for i, signature in enumerate(signatures):
+            self._insert(np.array(signature, dtype=np.uint32), groups[i] if groups is not None else None)
+
+    def add(self, signatures, groups=None):
+        """
+        Check rows against the kept rows (and each other, in order) and index the ones kept
+
+        Returns:
+            Array with, for each row, the index of the kept row it duplicates, or -1 if it was kept
+        """
+        duplicate_of = np.full(len(signatures), -1, dtype=np.int64)
+        for i, signature in enumerate(signatures):
+            group = groups[i] if groups is not None else None
+            if not (signature == np.iinfo(np.uint32).max).all():
+                candidates = {c for key in self._band_keys(signature, group) for c in self._buckets.get(key, ())}
+                # Confirm candidates by estimated similarity; the earliest kept row wins
+                for candidate in sorted(candidates):
+                    if np.mean(self._signatures[candidate] == signature) >= self.threshold:
+                        duplicate_of[i] = candidate
+                        break
+            if duplicate_of[i] < 0:
+                self._insert(np.array(signature, dtype=np.uint32), group)
+        return duplicate_of
+
+    def signatures(self):
+        """Signatures of the kept rows, shape (len(self), num_perm)"""
+        if not self._signatures:
+            return np.zeros((0, self.num_perm), dtype=np.uint32)
+        return np.vstack(self._signatures)
+
+    def groups(self):
+        return list(self._groups)
+
+
+def cluster_stats(representatives):
+    """Summary of a clustering: clusters with more than one row, their sizes, rows removed"""
+    _, sizes = np.unique(representatives, return_counts=True)
+    duplicate_sizes = sizes[sizes > 1]
+    return {
+        'rows': int(len(representatives)),
+        'clusters': int(len(duplicate_sizes)),
+        'rows_removed': int(duplicate_sizes.sum() - len(duplicate_sizes)),
+        'largest_cluster': int(duplicate_sizes.max()) if len(duplicate_sizes) else 1,
+        'mean_cluster_size': float(duplicate_sizes.mean()) if len(duplicate_sizes) else 1.0,
+    }
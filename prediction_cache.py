@@ -0,0 +1,99 @@
+"""
+Bounded in-process cache for email predictions.
+
+Entries are keyed by a hash of the normalized email text plus the model
+version, so a newly loaded model can never be served a stale label.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_text(text, lowercase=True):
+    """Collapse whitespace (and optionally case) so trivially different copies share a key"""
+    text = ' '.join(text.split())
+    return text.lower() if lowercase else text
+
+
+def cache_key(text, model_version, lowercase=True):
+    """Content-addressed key for a text scored by a given model version"""
+    digest = hashlib.sha1(normalize_text(text, lowercase).encode('utf-8')).hexdigest()
+    return f"{model_version}:{digest}"
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache with an optional TTL and hit/miss counters.
+
+    Args:
+        max_size: Maximum number of entries (0 disables the cache)
+        ttl: Seconds an entry stays valid (0 means no expiry)
+    """
+
+    def __init__(self, max_size=10000, ttl=0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if self.ttl and time.monotonic() - stored_at > self.ttl:
+                    del self._entries[key]
+                    entry = None
+                else:
+                    self._entries.move_to_end(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entries"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
@@ -4,23 +4,510 @@
 将从Gmail API导出的真实数据转换为模型训练格式
 """
 
+import numpy as np
 import pandas as pd
+import argparse
+import hashlib
+import json
 import os
 import glob
+import multiprocessing
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-def merge_gmail_exports(export_dir='backend/export', output_file='emails_real.csv'):
+from email_threads import THREAD_MODES, message_age
+from near_duplicates import NearDuplicateIndex, minhash_signatures
+
+MANIFEST_VERSION = 2
+
+# 导出文件中训练需要的列（messageId/threadId用于列式数据集的溯源）
+EXPORT_COLUMNS = ['threadId', 'messageId', 'label', 'skipped', 'subject', 'snippet']
+# CSV训练数据的列
+TRAINING_COLUMNS = ['subject', 'body', 'label']
+# 列式数据集的列: 溯源ID、原始字段、预先拼接好的text、类别型label
+DATASET_COLUMNS = ['messageId', 'threadId', 'subject', 'body', 'text', 'label']
+# 每块读取的行数
+CHUNK_SIZE = 50000
+# 每个文件在进程间队列中最多缓存的块数
+QUEUE_CHUNKS = 2
+# 近似去重的估计Jaccard相似度阈值
+NEAR_DUP_THRESHOLD = 0.8
+
+def export_to_training_format(df):
+    """
+    把Gmail导出格式的DataFrame转换为训练格式
+    只保留有标签且未被跳过的邮件，snippet作为body
+    
+    输入格式: threadId,messageId,label,skipped,subject,from,snippet
+    输出格式: subject,body,label (有messageId/threadId列时一并保留)
+    """
+    df = df[df['label'].notna() & (df['label'] != '')]
+    if 'skipped' in df.columns:
+        df = df[df['skipped'].isna() | (df['skipped'] == '')]
+    
+    result = pd.DataFrame({
+        'subject': df['subject'].fillna(''),
+        'body': df['snippet'].fillna(''),  # 使用snippet作为body
+        'label': df['label']
+    })
+    for column in ('messageId', 'threadId'):
+        if column in df.columns:
+            result[column] = df[column].fillna('')
+    return result
+
+def combine_text(df):
+    """模型输入: subject和body用空格拼接（训练和列式数据集共用）"""
+    return df['subject'].fillna('').astype(str) + ' ' + df['body'].fillna('').astype(str)
+
+def manifest_path_for(output_file):
+    """清单文件与输出文件放在一起: emails_real.csv -> emails_real.manifest.json"""
+    return os.path.splitext(output_file)[0] + '.manifest.json'
+
+def dataset_path_for(output_file):
+    """列式数据集目录: emails_real.csv -> emails_real.parquet/"""
+    return os.path.splitext(output_file)[0] + '.parquet'
+
+def empty_manifest(by_thread=None):
+    # files: 每个导出文件的指纹及其贡献的行（见 merge_gmail_exports）
+    # threads: 按线程合并时每个线程的输出行 {threadId: {key, kept, near_dup_of}}
+    # dataset: 列式数据集是否包含输出CSV的全部行
+    return {'version': MANIFEST_VERSION, 'files': {}, 'threads': {}, 'label_counts': {}, 'by_thread': by_thread,
+            'dataset': False}
+
+def load_manifest(manifest_file):
+    if not os.path.exists(manifest_file):
+        return empty_manifest()
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_manifest(manifest, manifest_file):
+    """原子写入，避免中途失败留下损坏的清单"""
+    tmp_file = f"{manifest_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_file, manifest_file)
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def dedup_key(subject, body):
+    """基于subject和body的去重键（持久化在清单中）"""
+    return hashlib.sha1(f"{subject}\x1f{body}".encode('utf-8')).hexdigest()[:16]
+
+def find_changed_exports(csv_files, manifest):
+    """
+    返回需要重新解析的文件及其指纹
+    大小和修改时间都没变的文件直接跳过；否则再比较内容哈希
+    """
+    changed = []
+    for csv_file in csv_files:
+        stat = os.stat(csv_file)
+        entry = manifest['files'].get(csv_file)
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            continue
+        
+        sha256 = file_sha256(csv_file)
+        fingerprint = {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': sha256}
+        if entry and entry['sha256'] == sha256:
+            # 只是被touch过，内容没变
+            entry.update(fingerprint)
+            continue
+        changed.append((csv_file, fingerprint))
+    return changed
+
+def _iter_export_chunks(csv_file, chunk_size):
+    """
+    按块读取导出文件，只读取需要的列
+    安装了pyarrow时使用其多线程流式CSV解析器，否则使用pandas的C引擎
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+    except ImportError:
+        pacsv = None
+    
+    if pacsv is not None:
+        reader = pacsv.open_csv(
+            csv_file,
+            # 按平均每行约256字节估算块大小
+            read_options=pacsv.ReadOptions(block_size=max(1 << 20, chunk_size * 256)),
+            convert_options=pacsv.ConvertOptions(
+                include_columns=EXPORT_COLUMNS,
+                include_missing_columns=True,
+                column_types={column: pa.string() for column in EXPORT_COLUMNS}
+            )
+        )
+        for batch in reader:
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(
+            csv_file,
+            usecols=lambda column: column in EXPORT_COLUMNS,
+            dtype=str,
+            chunksize=chunk_size
+        )
+
+def read_export_chunks(csv_file, chunk_size=CHUNK_SIZE):
+    """
+    逐块读取单个导出文件并转换为训练格式
+    每块先过滤标签/跳过的邮件再交给调用方，内存占用以块大小为上限
+    
+    Yields:
+        (该块训练格式的行（索引为在文件中的行号）, 该块原始行数, 该块原始标签分布)
+    """
+    offset = 0
+    for chunk in _iter_export_chunks(csv_file, chunk_size):
+        chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+        offset += len(chunk)
+        label_counts = {label: int(count) for label, count in chunk['label'].value_counts().items()}
+        yield export_to_training_format(chunk), len(chunk), label_counts
+
+def _stream_export(csv_file, chunk_size, queue):
+    """子进程: 把文件逐块转换的结果放入队列（队列满时等待主进程消费），最后放入None或异常"""
+    try:
+        for chunk in read_export_chunks(csv_file, chunk_size):
+            queue.put(chunk)
+    except Exception as e:
+        queue.put(e)
+        return
+    queue.put(None)
+
+def _drain(queue):
+    while True:
+        item = queue.get()
+        if item is None:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+def read_exports_parallel(csv_files, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    用进程池并行读取多个导出文件，按输入顺序产出 (文件, 块迭代器)
+    
+    每个文件的块经由各自的有界队列按顺序传回，主进程处理完一块才取下一块，
+    所以峰值内存约为 块大小 x 进程数 x QUEUE_CHUNKS，与文件总大小无关。
+    读取失败时，块迭代器在出错的位置抛出异常
+    """
+    workers = workers or min(len(csv_files), os.cpu_count() or 1)
+    if workers <= 1 or len(csv_files) <= 1:
+        for csv_file in csv_files:
+            yield csv_file, read_export_chunks(csv_file, chunk_size)
+        return
+    
+    # Manager先关闭: 主进程提前退出时，阻塞在put上的子进程会因队列断开而结束
+    with ProcessPoolExecutor(max_workers=workers) as pool, multiprocessing.Manager() as manager:
+        queues = [manager.Queue(maxsize=QUEUE_CHUNKS) for _ in csv_files]
+        for csv_file, queue in zip(csv_files, queues):
+            pool.submit(_stream_export, csv_file, chunk_size, queue)
+        for csv_file, queue in zip(csv_files, queues):
+            yield csv_file, _drain(queue)
+
+def thread_ids(df, source=''):
+    """
+    每行邮件所属线程的ID: threadId；没有threadId的邮件各自成一个线程，
+    记为 '\\0' + messageId（也没有messageId时用来源文件和行号）
+    """
+    def column(name):
+        return df[name].fillna('').astype(str) if name in df.columns else pd.Series('', index=df.index)
+    
+    threads, messages = column('threadId'), column('messageId')
+    own = '\0' + messages.where(messages != '', pd.Series(source + '#' + df.index.astype(str), index=df.index))
+    return threads.where(threads != '', own)
+
+def collapse_threads(training_df, mode='latest'):
+    """
+    按threadId把邮件合并为每个线程一行（没有threadId的邮件各自成一行）
+    
+    latest: 只保留线程中最新的一封；combined: 线程内所有邮件按时间顺序拼接
+    (subject拼subject，body拼body，与API的 /thread_predict 一致)。
+    标签取最新一封的标签，即线程当前所处的阶段。最新按messageId判断
+    (Gmail的messageId是随时间递增的十六进制数)
+    
+    线程ID取自 _thread 列（没有时由 thread_ids 计算），并保留在返回的行中
+    """
+    if not len(training_df):
+        return training_df
+    
+    df = training_df.reset_index(drop=True)
+    ages = df['messageId'].map(message_age) if 'messageId' in df.columns else pd.Series([-1] * len(df))
+    df = df.assign(
+        _thread=df['_thread'] if '_thread' in df.columns else thread_ids(df),
+        _age=ages,
+        _row=df.index
+    ).sort_values(['_thread', '_age', '_row'], kind='stable')
+    
+    grouped = df.groupby('_thread', sort=False)
+    threads = grouped.tail(1).set_index('_thread')
+    if mode == 'combined':
+        threads['subject'] = grouped['subject'].agg(lambda values: ' '.join(values.fillna('').astype(str)))
+        threads['body'] = grouped['body'].agg(lambda values: ' '.join(values.fillna('').astype(str)))
+    
+    # 保持原来的行顺序（按每个线程最新一封的位置）
+    return threads.sort_values('_row').drop(columns=['_age', '_row']).reset_index()
+
+class NearDuplicateFilter:
+    """
+    用MinHash + LSH分桶逐块去除近似重复的邮件（如只改了姓名/职位的招聘模板）
+    
+    已保留行的签名和去重键保存在 emails_real.minhash.npz 中，新行会与它们以及
+    本次已保留的行比较，所以增量运行时只需计算新行的签名。同一标签下只保留
+    每组相似邮件中最早的一封
+    
+    Args:
+        output_file: 训练数据输出文件，用于定位签名文件
+        threshold: 估计Jaccard相似度阈值
+        append: 是否与之前保存的签名比较（False表示重新开始）
+        retracted: 已从输出中撤回的行的去重键，它们的签名不再参与比较
+    """
+    
+    def __init__(self, output_file, threshold=NEAR_DUP_THRESHOLD, append=True, retracted=()):
+        self.signature_file = os.path.splitext(output_file)[0] + '.minhash.npz'
+        self.threshold = threshold
+        self.index = NearDuplicateIndex(threshold)
+        # 与index中已保留的行一一对应
+        self.keys = []
+        if append and os.path.exists(self.signature_file):
+            saved = np.load(self.signature_file, allow_pickle=False)
+            keys = saved['keys'].astype(str)
+            keep = ~np.isin(keys, list(retracted))
+            self.index.extend(saved['signatures'][keep], saved['labels'].astype(str)[keep].tolist())
+            self.keys = keys[keep].tolist()
+        self.removed = 0
+        # 代表行 -> [簇大小, 示例文本（簇中第一封被移除的邮件）]
+        self.clusters = {}
+    
+    def filter(self, training_df, keys):
+        """
+        把training_df中不与已保留行近似重复的行加入比较范围
+        
+        Returns:
+            每行近似重复的已保留行的去重键，保留的行为None
+        """
+        texts = (training_df['subject'].astype(str) + ' ' + training_df['body'].astype(str)).tolist()
+        duplicate_of = self.index.add(minhash_signatures(texts), training_df['label'].astype(str).tolist())
+        representatives = []
+        for text, key, representative in zip(texts, keys, duplicate_of):
+            if representative >= 0:
+                self.clusters.setdefault(int(representative), [1, text])[0] += 1
+                self.removed += 1
+                representatives.append(self.keys[representative])
+            else:
+                self.keys.append(key)
+                representatives.append(None)
+        return representatives
+    
+    def report(self):
+        sizes = [size for size, _ in self.clusters.values()]
+        print(f"\n🧬 近似去重 (MinHash LSH, 阈值 {self.threshold}):")
+        print(f"   移除近似重复: {self.removed} 行")
+        mean = sum(sizes) / len(sizes) if sizes else 1.0
+        print(f"   相似簇: {len(sizes)} 个，最大簇 {max(sizes, default=1)} 行，平均 {mean:.1f} 行")
+        # 显示最大的几个簇
+        for size, sample in sorted(self.clusters.values(), key=lambda cluster: -cluster[0])[:3]:
+            print(f"   - {size} 行: {sample[:60]}")
+    
+    def save(self):
+        np.savez(self.signature_file, signatures=self.index.signatures(),
+                 labels=np.asarray(self.index.groups(), dtype=str), keys=np.asarray(self.keys, dtype=str))
+
+class DatasetPartWriter:
+    """
+    把本次新增的行逐块写成列式数据集（Parquet目录）中的一个新分片
+    
+    label为字典编码（读入pandas后是category），text为预先拼接好的模型输入，
+    messageId/threadId保留每行的来源。每次运行新增一个 part-NNNNN.parquet，
+    每块是其中的一个row group；非追加模式会先清空目录
+    """
+    
+    def __init__(self, dataset_dir, append=True):
+        if not append:
+            shutil.rmtree(dataset_dir, ignore_errors=True)
+        os.makedirs(dataset_dir, exist_ok=True)
+        parts = glob.glob(os.path.join(dataset_dir, 'part-*.parquet'))
+        # 撤回行时分片可能被删除，编号接着最大的往下排
+        part = max((int(os.path.basename(p)[5:10]) for p in parts), default=-1) + 1
+        self.part_file = os.path.join(dataset_dir, f'part-{part:05d}.parquet')
+        # 先写临时文件再改名，读取方不会看到写了一半的分片
+        self.tmp_file = f"{self.part_file}.tmp"
+        self._writer = None
+    
+    @staticmethod
+    def table(training_df):
+        import pyarrow as pa
+        
+        def column(name):
+            values = training_df[name] if name in training_df.columns else pd.Series([''] * len(training_df))
+            return pa.array(values.fillna('').astype(str).tolist(), type=pa.string())
+        
+        return pa.table({
+            'messageId': column('messageId'),
+            'threadId': column('threadId'),
+            'subject': column('subject'),
+            'body': column('body'),
+            'text': pa.array(combine_text(training_df).tolist(), type=pa.string()),
+            'label': column('label').dictionary_encode()
+        })
+    
+    def write(self, training_df):
+        import pyarrow.parquet as pq
+        
+        table = self.table(training_df)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.tmp_file, table.schema)
+        self._writer.write_table(table)
+    
+    def close(self):
+        """完成分片并返回其路径（没有写入任何行时返回None）"""
+        if self._writer is None:
+            return None
+        self._writer.close()
+        os.replace(self.tmp_file, self.part_file)
+        return self.part_file
+
+class TrainingDataWriter:
+    """
+    逐块追加训练数据到输出CSV（以及可选的列式数据集），并统计写入的行
+    
+    Args:
+        output_file: 训练数据输出文件
+        append: 追加到已有文件（False表示新建并写表头）
+        dataset_dir: 同时写入的列式数据集目录 (None表示只写CSV)
+    """
+    
+    def __init__(self, output_file, append, dataset_dir=None):
+        self._csv = open(output_file, 'a' if append else 'w', newline='', encoding='utf-8')
+        if not append:
+            pd.DataFrame(columns=TRAINING_COLUMNS).to_csv(self._csv, index=False)
+        self._dataset = DatasetPartWriter(dataset_dir, append) if dataset_dir else None
+        self.rows = 0
+        self.label_counts = {}
+    
+    def write(self, training_df):
+        if not len(training_df):
+            return
+        training_df[TRAINING_COLUMNS].to_csv(self._csv, header=False, index=False)
+        if self._dataset is not None:
+            self._dataset.write(training_df)
+        self.rows += len(training_df)
+        for label, count in training_df['label'].value_counts().items():
+            self.label_counts[label] = self.label_counts.get(label, 0) + int(count)
+    
+    def close(self):
+        """关闭输出，返回新写入的数据集分片（没有则为None）"""
+        self._csv.close()
+        return self._dataset.close() if self._dataset is not None else None
+
+def retract_rows(output_file, keys, dataset_dir=None):
+    """
+    从输出CSV（以及列式数据集）中删除去重键在keys中的行
+    
+    CSV逐块重写到临时文件后替换；数据集只重写包含这些行的分片，删空的分片直接删除
+    
+    Returns:
+        被删除的行的标签分布
+    """
+    label_counts = {}
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
+        pd.DataFrame(columns=TRAINING_COLUMNS).to_csv(f, index=False)
+        for chunk in pd.read_csv(output_file, dtype=str, keep_default_na=False, chunksize=CHUNK_SIZE):
+            drop = np.array([dedup_key(subject, body) in keys
+                             for subject, body in zip(chunk['subject'], chunk['body'])], dtype=bool)
+            for label, count in chunk['label'][drop].value_counts().items():
+                label_counts[label] = label_counts.get(label, 0) + int(count)
+            chunk[~drop].to_csv(f, header=False, index=False)
+    os.replace(tmp_file, output_file)
+    
+    if dataset_dir and os.path.isdir(dataset_dir):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        for part_file in sorted(glob.glob(os.path.join(dataset_dir, 'part-*.parquet'))):
+            parquet = pq.ParquetFile(part_file)
+            drop = np.array([dedup_key(subject, body) in keys
+                             for batch in parquet.iter_batches(columns=['subject', 'body'])
+                             for subject, body in zip(batch.column(0).to_pylist(), batch.column(1).to_pylist())],
+                            dtype=bool)
+            if not drop.any():
+                continue
+            if drop.all():
+                os.remove(part_file)
+                continue
+            
+            tmp_file = f"{part_file}.tmp"
+            with pq.ParquetWriter(tmp_file, parquet.schema_arrow) as writer:
+                start = 0
+                for batch in parquet.iter_batches():
+                    kept = batch.filter(pa.array(~drop[start:start + batch.num_rows]))
+                    start += batch.num_rows
+                    if kept.num_rows:
+                        writer.write_table(pa.Table.from_batches([kept]))
+            os.replace(tmp_file, part_file)
+    return label_counts
+
+def dependent_units(units, retracted):
+    """
+    撤回retracted中的单元（导出文件或线程）时需要一起重新计算的单元
+    
+    单元记录的 kept/dropped 是它写入的/因近似重复丢弃的行的去重键，depends 是
+    导致它的行被丢弃的其他行的去重键。这些行被撤回后，依赖它们的单元要重新
+    去重，它写入的行也随之撤回，所以一直扩展到不再变化为止
+    
+    Returns:
+        包含retracted在内的所有需要撤回的单元
+    """
+    retracted = set(retracted)
+    pending = retracted
+    released = set()
+    while pending:
+        for name in pending:
+            entry = units.get(name, {})
+            released.update(entry.get('kept', ()))
+            released.update(entry.get('dropped', ()))
+        pending = {name for name, entry in units.items()
+                   if name not in retracted and not released.isdisjoint(entry.get('depends', ()))}
+        retracted |= pending
+    return retracted
+
+def merge_gmail_exports(export_dir='backend/export', output_file='emails_real.csv', full=False,
+                        workers=None, chunk_size=CHUNK_SIZE, near_dup_threshold=NEAR_DUP_THRESHOLD,
+                        dataset_dir=None, by_thread=None):
     """
     合并所有从Gmail导出的CSV文件，并转换为训练格式
     
+    增量模式：清单文件记录已处理的导出文件（路径、大小、修改时间、内容哈希）
+    以及每个文件（按线程合并时为每个线程）写入和丢弃的行的去重键。每次只解析
+    新增或变化的文件，并把新行追加到输出文件。已处理过的文件内容变化或被删除
+    时，只撤回它写入的行再重新读取；曾因与这些行重复而被丢弃的行所在的文件
+    （按线程合并时为线程）也一起重新计算
+    
     输入格式: threadId,messageId,label,skipped,subject,from,snippet
     输出格式: subject,body,label
+    
+    Args:
+        export_dir: 导出CSV所在目录
+        output_file: 训练数据输出文件
+        full: 忽略清单，重新处理所有文件
+        workers: 并行读取的进程数 (默认: CPU核心数)
+        chunk_size: 每块读取的行数
+        near_dup_threshold: 近似去重的相似度阈值 (None表示不做近似去重)
+        dataset_dir: 同时写入的列式数据集目录 (None表示只写CSV，需要pyarrow)
+        by_thread: 按线程合并的方式 'latest'/'combined' (None表示每封邮件一行)
+    
+    Returns:
+        本次新增的训练数据行数，失败时返回None
     """
     
     print(f"🔍 从 {export_dir} 目录查找训练数据...")
     
     # 查找所有CSV文件
-    csv_files = glob.glob(os.path.join(export_dir, '*.csv'))
+    csv_files = sorted(glob.glob(os.path.join(export_dir, '*.csv')))
     
     if not csv_files:
         print(f"❌ 在 {export_dir} 目录中没有找到CSV文件")
@@ -28,86 +515,209 @@ def merge_gmail_exports(export_dir='backend/export', output_file='emails_real.cs
         print(f"   node scripts/export-gmail-training-data.js --query \"in:inbox\" --maxResults 500")
         return None
     
-    print(f"📁 找到 {len(csv_files)} 个CSV文件:")
-    for f in csv_files:
-        print(f"   - {os.path.basename(f)}")
+    print(f"📁 找到 {len(csv_files)} 个CSV文件")
     
-    # 读取并合并所有CSV文件
-    all_data = []
-    total_rows = 0
+    manifest_file = manifest_path_for(output_file)
+    manifest = load_manifest(manifest_file)
+    if full or not os.path.exists(output_file) or manifest.get('version') != MANIFEST_VERSION:
+        manifest = empty_manifest(by_thread)
+    if dataset_dir and manifest['files'] and not (os.path.isdir(dataset_dir) and manifest.get('dataset')):
+        # 数据集要包含所有行：不存在，或之前有运行没有写入数据集时，重新处理所有文件
+        reason = '不存在' if not os.path.isdir(dataset_dir) else '缺少之前未加 --parquet 时写入的行'
+        print(f"   - {dataset_dir} {reason}，重新处理所有文件")
+        manifest = empty_manifest(by_thread)
+    if manifest.get('by_thread') != by_thread:
+        # 输出的每一行是邮件还是线程变了，所有行都要重新计算
+        if manifest['files']:
+            print(f"   - 按线程合并方式改变 ({by_thread or '关闭'})，重新处理所有文件")
+        manifest = empty_manifest(by_thread)
     
-    for csv_file in csv_files:
-        try:
-            df = pd.read_csv(csv_file)
-            print(f"\n📊 读取 {os.path.basename(csv_file)}: {len(df)} 行")
+    files = manifest['files']
+    # 去重记录的单元: 每封邮件一行时是导出文件，按线程合并时是线程
+    units = manifest['threads'] if by_thread else files
+    fingerprints = dict(find_changed_exports(csv_files, manifest))
+    modified = [csv_file for csv_file in fingerprints if csv_file in files]
+    removed = [csv_file for csv_file in files if csv_file not in csv_files]
+    for csv_file in modified:
+        reason = '上次读取失败' if files[csv_file]['sha256'] is None else '内容有变化'
+        print(f"   - {os.path.basename(csv_file)} {reason}，撤回它之前写入的行")
+    for csv_file in removed:
+        print(f"   - {os.path.basename(csv_file)} 已被删除，撤回它之前写入的行")
+    print(f"   - 已处理且未变化: {len(csv_files) - len(fingerprints)} 个")
+    print(f"   - 新增或变化: {len(fingerprints)} 个")
+    for csv_file in fingerprints:
+        print(f"     · {os.path.basename(csv_file)}")
+    
+    labelled = 0
+    
+    def read_files(csv_files, handle):
+        """逐块读取csv_files，把每块的行交给 handle(文件, 行)；读取失败的文件清空指纹，下次作为变化的文件重新处理"""
+        nonlocal labelled
+        for csv_file, chunks in read_exports_parallel(csv_files, workers, chunk_size):
+            total_rows = 0
+            file_rows = 0
+            label_counts = {}
+            try:
+                for rows, chunk_rows, chunk_labels in chunks:
+                    total_rows += chunk_rows
+                    file_rows += len(rows)
+                    for label, count in chunk_labels.items():
+                        label_counts[label] = label_counts.get(label, 0) + count
+                    handle(csv_file, rows)
+            except Exception as e:
+                # 已写入的块记录在清单中，下次撤回后重新读取该文件
+                print(f"⚠️  读取 {csv_file} 失败: {e}")
+                files[csv_file].update(size=None, mtime=None, sha256=None)
+                continue
             
+            print(f"\n📊 读取 {os.path.basename(csv_file)}: {total_rows} 行")
             # 显示标签分布
-            if 'label' in df.columns:
-                label_counts = df['label'].value_counts()
-                for label, count in label_counts.items():
-                    if label:  # 忽略空标签
-                        print(f"   - {label}: {count}")
+            for label, count in label_counts.items():
+                if label:  # 忽略空标签
+                    print(f"   - {label}: {count}")
+            labelled += file_rows
+            files[csv_file]['rows'] = file_rows
+    
+    # 撤回变化和删除的文件写入的行，以及依赖这些行的文件（或线程）写入的行
+    if by_thread:
+        # 一个线程的邮件可能分布在多个文件里：变化的文件先全部读入，受影响的线程
+        # 是它们之前和现在包含的线程，再从未变化的文件中补齐这些线程的邮件
+        affected = {thread for csv_file in modified + removed for thread in files[csv_file].get('threads', ())}
+        thread_rows = []
+        
+        def collect(csv_file, rows):
+            rows = rows.assign(_thread=thread_ids(rows, csv_file))
+            files[csv_file]['threads'].extend(rows['_thread'].unique())
+            thread_rows.append(rows)
+        
+        for csv_file in removed:
+            del files[csv_file]
+        for csv_file, fingerprint in fingerprints.items():
+            files[csv_file] = {**fingerprint, 'threads': []}
+        read_files(list(fingerprints), collect)
+        for csv_file in fingerprints:
+            files[csv_file]['threads'] = sorted(set(files[csv_file]['threads']))
+            affected.update(files[csv_file]['threads'])
+        retracted = dependent_units(units, affected)
+        
+        rereads = [csv_file for csv_file in csv_files
+                   if csv_file not in fingerprints and not retracted.isdisjoint(files[csv_file].get('threads', ()))]
+        if rereads:
+            print(f"\n🧵 重新计算 {len(retracted)} 个受影响的线程，从 {len(rereads)} 个未变化的文件中补齐邮件")
+            
+            def collect_affected(csv_file, rows):
+                rows = rows.assign(_thread=thread_ids(rows, csv_file))
+                thread_rows.append(rows[rows['_thread'].isin(retracted)])
             
-            all_data.append(df)
-            total_rows += len(df)
-        except Exception as e:
-            print(f"⚠️  读取 {csv_file} 失败: {e}")
+            read_files(rereads, collect_affected)
+    else:
+        retracted = dependent_units(units, modified + removed)
+        # 受影响但未变化的文件按原来的指纹重新读取
+        rereads = {csv_file: {field: files[csv_file][field] for field in ('size', 'mtime', 'sha256')}
+                   for csv_file in csv_files if csv_file in retracted and csv_file not in fingerprints}
+        for csv_file in rereads:
+            print(f"   - {os.path.basename(csv_file)} 有行与被撤回的行重复，重新读取")
     
-    if not all_data:
-        print("❌ 没有成功读取任何数据")
-        return None
+    retracted_keys = {key for name in retracted for key in units.get(name, {}).get('kept', ())}
+    if retracted_keys:
+        print(f"\n↩️  撤回 {len(retracted_keys)} 行")
+        for label, count in retract_rows(output_file, retracted_keys, dataset_dir).items():
+            manifest['label_counts'][label] = manifest['label_counts'].get(label, 0) - count
+            if not manifest['label_counts'][label]:
+                del manifest['label_counts'][label]
+    for name in retracted:
+        units.pop(name, None)
+    # 已写入或已因近似重复丢弃的行（精确去重时与它们比较）
+    seen = {key for entry in units.values() for field in ('kept', 'dropped') for key in entry.get(field, ())}
     
-    # 合并所有数据
-    print(f"\n🔄 合并数据...")
-    combined_df = pd.concat(all_data, ignore_index=True)
-    print(f"✓ 总共 {len(combined_df)} 行数据")
+    # 追加到输出文件（首次运行或所有行都被撤回时新建）
+    append = bool(seen) and os.path.exists(output_file)
+    writer = TrainingDataWriter(output_file, append, dataset_dir)
+    # 近似去重：同一标签下只保留每组相似邮件的第一封（也与之前写入的数据比较）
+    near_dups = (NearDuplicateFilter(output_file, near_dup_threshold, append, retracted_keys)
+                 if near_dup_threshold else None)
+    exact_dups = 0
     
-    # 过滤数据：只保留有标签的邮件
-    print(f"\n🔍 过滤数据...")
-    print(f"   原始数据: {len(combined_df)} 行")
+    def record(name, field, key):
+        units.setdefault(name, {}).setdefault(field, []).append(key)
     
-    # 移除没有标签的行
-    combined_df = combined_df[combined_df['label'].notna() & (combined_df['label'] != '')]
-    print(f"   有标签的数据: {len(combined_df)} 行")
+    def add_rows(rows, owners):
+        """精确去重（基于subject和body，包括与之前已写入的数据重复的）、近似去重，然后写入并记录到各行所属的单元"""
+        nonlocal exact_dups
+        keep = []
+        keys = []
+        for subject, body, owner in zip(rows['subject'], rows['body'], owners):
+            key = dedup_key(subject, body)
+            keep.append(key not in seen)
+            if keep[-1]:
+                seen.add(key)
+                keys.append(key)
+            else:
+                record(owner, 'depends', key)
+        exact_dups += len(keep) - len(keys)
+        keep = np.array(keep, dtype=bool)
+        rows = rows[keep]
+        owners = [owner for owner, kept in zip(owners, keep) if kept]
+        
+        representatives = near_dups.filter(rows, keys) if near_dups is not None and len(rows) else [None] * len(rows)
+        for key, owner, representative in zip(keys, owners, representatives):
+            if representative is None:
+                record(owner, 'kept', key)
+            else:
+                record(owner, 'dropped', key)
+                record(owner, 'depends', representative)
+        writer.write(rows[np.array([representative is None for representative in representatives], dtype=bool)])
     
-    # 移除被跳过的邮件
-    if 'skipped' in combined_df.columns:
-        before_skip = len(combined_df)
-        combined_df = combined_df[combined_df['skipped'].isna() | (combined_df['skipped'] == '')]
-        print(f"   移除跳过的邮件: {len(combined_df)} 行 (跳过了 {before_skip - len(combined_df)} 行)")
+    # 按线程合并时，先收齐受影响线程的邮件再合并；否则只读取新增或变化的文件
+    # 以及受影响的文件（并行、分块），每块处理完即写出，不在内存中累积
+    if by_thread:
+        print(f"\n🔄 读取有标签的数据: {labelled} 行")
+        emails = pd.concat(thread_rows, ignore_index=True) if thread_rows else pd.DataFrame(columns=TRAINING_COLUMNS)
+        threads = collapse_threads(emails, by_thread)
+        print(f"🧵 按线程合并 ({by_thread}): {len(emails)} 封邮件 -> {len(threads)} 个线程")
+        del emails, thread_rows
+        if len(threads):
+            add_rows(threads, threads['_thread'].tolist())
+    else:
+        # 变化和删除的文件已随撤回从清单中移除
+        reads = [csv_file for csv_file in csv_files if csv_file in fingerprints or csv_file in rereads]
+        for csv_file in reads:
+            files[csv_file] = dict(fingerprints.get(csv_file) or rereads[csv_file])
+        read_files(reads, lambda csv_file, rows: add_rows(rows, [csv_file] * len(rows)))
+        print(f"\n🔄 读取有标签的数据: {labelled} 行")
     
-    if len(combined_df) == 0:
+    print(f"   移除重复邮件: 去重 {exact_dups} 行")
+    if near_dups is not None:
+        near_dups.report()
+        near_dups.save()
+    part_file = writer.close()
+    if part_file:
+        print(f"📦 列式数据集分片已写入: {part_file}")
+    if writer.rows or retracted_keys or not append:
+        # 没有写入或撤回数据集的行会让它与CSV不一致，下次 --parquet 时重建
+        manifest['dataset'] = bool(dataset_dir)
+    
+    for label, count in writer.label_counts.items():
+        manifest['label_counts'][label] = manifest['label_counts'].get(label, 0) + count
+    save_manifest(manifest, manifest_file)
+    
+    total = sum(manifest['label_counts'].values())
+    if total == 0:
         print("❌ 过滤后没有可用的训练数据")
         print("💡 提示: 请确保你的Gmail邮件已经被分类标记")
         return None
     
-    # 转换为训练格式
-    print(f"\n🔄 转换数据格式...")
-    training_df = pd.DataFrame({
-        'subject': combined_df['subject'].fillna(''),
-        'body': combined_df['snippet'].fillna(''),  # 使用snippet作为body
-        'label': combined_df['label']
-    })
-    
-    # 移除重复的邮件（基于subject和body）
-    before_dedup = len(training_df)
-    training_df = training_df.drop_duplicates(subset=['subject', 'body'], keep='first')
-    print(f"   移除重复邮件: {len(training_df)} 行 (去重 {before_dedup - len(training_df)} 行)")
-    
     # 显示最终标签分布
     print(f"\n📊 最终训练数据标签分布:")
-    label_counts = training_df['label'].value_counts()
-    for label, count in label_counts.items():
-        percentage = (count / len(training_df)) * 100
+    for label, count in sorted(manifest['label_counts'].items(), key=lambda item: -item[1]):
+        percentage = (count / total) * 100
         print(f"   - {label}: {count} ({percentage:.1f}%)")
     
-    # 保存为CSV
-    training_df.to_csv(output_file, index=False, encoding='utf-8')
-    print(f"\n✅ 训练数据已保存到: {output_file}")
-    print(f"📝 总共 {len(training_df)} 条有标签的邮件")
-    print(f"🏷️  包含 {len(label_counts)} 个不同的标签")
+    print(f"\n✅ 训练数据已保存到: {output_file} (本次新增 {writer.rows} 条)")
+    print(f"📝 总共 {total} 条有标签的邮件")
+    print(f"🏷️  包含 {len(manifest['label_counts'])} 个不同的标签")
     
-    return training_df
+    return writer.rows
 
 def compare_with_mock_data():
     """
@@ -125,38 +735,66 @@ def compare_with_mock_data():
         print(f"   - 标签数: {len(mock_df['label'].unique())} 个")
         print(f"   - 标签: {', '.join(mock_df['label'].unique())}")
     
-    # 读取真实数据
+    # 读取真实数据（分块统计，不把整个文件读入内存）
     if os.path.exists('emails_real.csv'):
-        real_df = pd.read_csv('emails_real.csv')
+        total = 0
+        labels = {}
+        empty_subjects = empty_bodies = 0
+        subject_chars = body_chars = 0
+        for real_df in pd.read_csv('emails_real.csv', dtype=str, keep_default_na=False, chunksize=CHUNK_SIZE):
+            total += len(real_df)
+            labels.update(dict.fromkeys(real_df['label'].unique()))
+            empty_subjects += int((real_df['subject'].str.strip() == '').sum())
+            empty_bodies += int((real_df['body'].str.strip() == '').sum())
+            subject_chars += int(real_df['subject'].str.len().sum())
+            body_chars += int(real_df['body'].str.len().sum())
+        
         print(f"\n📁 真实数据 (emails_real.csv):")
-        print(f"   - 总数: {len(real_df)} 条")
-        print(f"   - 标签数: {len(real_df['label'].unique())} 个")
-        print(f"   - 标签: {', '.join(real_df['label'].unique())}")
+        print(f"   - 总数: {total} 条")
+        print(f"   - 标签数: {len(labels)} 个")
+        print(f"   - 标签: {', '.join(labels)}")
         
         # 检查数据质量
         print(f"\n📊 数据质量检查:")
-        # 转换为字符串类型以避免类型错误
-        real_df['subject'] = real_df['subject'].astype(str)
-        real_df['body'] = real_df['body'].astype(str)
-        
-        empty_subjects = len(real_df[real_df['subject'].str.strip() == ''])
-        empty_bodies = len(real_df[real_df['body'].str.strip() == ''])
         print(f"   - 空主题: {empty_subjects} 条")
         print(f"   - 空内容: {empty_bodies} 条")
         
         # 显示平均长度
-        avg_subject_len = real_df['subject'].str.len().mean()
-        avg_body_len = real_df['body'].str.len().mean()
-        print(f"   - 平均主题长度: {avg_subject_len:.1f} 字符")
-        print(f"   - 平均内容长度: {avg_body_len:.1f} 字符")
+        print(f"   - 平均主题长度: {subject_chars / max(total, 1):.1f} 字符")
+        print(f"   - 平均内容长度: {body_chars / max(total, 1):.1f} 字符")
 
 if __name__ == '__main__':
     print("="*60)
     print("🚀 准备真实Gmail训练数据")
     print("="*60)
     
+    parser = argparse.ArgumentParser(description='准备真实Gmail训练数据')
+    parser.add_argument('--export-dir', default='backend/export', help='Gmail导出CSV目录 (默认: backend/export)')
+    parser.add_argument('--output', default='emails_real.csv', help='训练数据输出文件 (默认: emails_real.csv)')
+    parser.add_argument('--full', action='store_true', help='忽略清单，重新处理所有导出文件')
+    parser.add_argument('--workers', type=int, default=None, help='并行读取的进程数 (默认: CPU核心数)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help=f'每块读取的行数 (默认: {CHUNK_SIZE})')
+    parser.add_argument('--near-dup-threshold', type=float, default=NEAR_DUP_THRESHOLD,
+                        help=f'近似去重的相似度阈值 (默认: {NEAR_DUP_THRESHOLD})')
+    parser.add_argument('--no-near-dup', action='store_true', help='只做精确去重，不做近似去重')
+    parser.add_argument('--by-thread', choices=THREAD_MODES, default=None,
+                        help='按threadId每个线程生成一行: latest=只用最新一封, combined=拼接线程内所有邮件；标签取最新一封的')
+    parser.add_argument('--parquet', action='store_true',
+                        help='同时写入列式数据集 (如 emails_real.parquet/)，训练时可直接读取，需要pyarrow')
+    args = parser.parse_args()
+    
+    dataset_dir = dataset_path_for(args.output) if args.parquet else None
+    if dataset_dir:
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            parser.error('--parquet 需要pyarrow: pip install pyarrow')
+    
     # 合并和转换数据
-    result = merge_gmail_exports()
+    result = merge_gmail_exports(args.export_dir, args.output, full=args.full,
+                                 workers=args.workers, chunk_size=args.chunk_size,
+                                 near_dup_threshold=None if args.no_near_dup else args.near_dup_threshold,
+                                 dataset_dir=dataset_dir, by_thread=args.by_thread)
     
     if result is not None:
         # 显示对比
@@ -167,6 +805,8 @@ if __name__ == '__main__':
         print("="*60)
         print("\n下一步:")
         print("1. 使用真实数据训练: python train_model.py --data emails_real.csv")
+        if dataset_dir:
+            print(f"   或使用列式数据集: python train_model.py --data {dataset_dir}")
         print("2. 使用mock数据训练: python train_model.py --data emails.csv")
         print("3. 使用默认数据训练: python train_model.py")
     else:
@@ -15,7 +15,7 @@ email1 = {
 print(f"主题: {email1['subject']}")
 print(f"正文: {email1['body']}")
 
-r1 = requests.post('http://localhost:5000/predict', json=email1)
+r1 = requests.post('http://localhost:5001/predict', json=email1)
 result1 = r1.json()
 print(f"\n✅ 预测: {result1['label']}")
 print(f"📊 置信度: {result1['confidence']:.2%}\n")
@@ -30,7 +30,7 @@ email2 = {
 print(f"主题: {email2['subject']}")
 print(f"正文: {email2['body']}")
 
-r2 = requests.post('http://localhost:5000/predict', json=email2)
+r2 = requests.post('http://localhost:5001/predict', json=email2)
 result2 = r2.json()
 print(f"\n✅ 预测: {result2['label']}")
 print(f"📊 置信度: {result2['confidence']:.2%}\n")
@@ -45,7 +45,7 @@ email3 = {
 print(f"主题: {email3['subject']}")
 print(f"正文: {email3['body']}")
 
-r3 = requests.post('http://localhost:5000/predict', json=email3)
+r3 = requests.post('http://localhost:5001/predict', json=email3)
 result3 = r3.json()
 print(f"\n✅ 预测: {result3['label']}")
 print(f"📊 置信度: {result3['confidence']:.2%}\n")
@@ -53,7 +53,7 @@ print(f"📊 置信度: {result3['confidence']:.2%}\n")
 # 获取所有分类
 print("【所有支持的分类】")
 print("-" * 60)
-r_cat = requests.get('http://localhost:5000/categories')
+r_cat = requests.get('http://localhost:5001/categories')
 categories = r_cat.json()['categories']
 for i, cat in enumerate(categories, 1):
     print(f"{i}. {cat}")
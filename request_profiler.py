@@ -0,0 +1,122 @@
+"""
+On-demand cProfile profiling of individual API requests.
+
+A request is profiled when it asks for it (X-Profile header, admin token
+required) or when it is picked by random sampling. The profile covers the
+whole request on its handler thread, including sklearn/scipy internals,
+and is written to a bounded ring of files on disk:
+
+    profiles/<id>.prof   raw pstats dump (load with pstats or snakeviz)
+    profiles/<id>.json   request metadata + top functions by cumulative time
+
+Only one request per process is profiled at a time; the interpreter allows
+a single active profiler, so overlapping candidates are simply skipped.
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import random
+import threading
+import time
+
+
+class RequestProfiler:
+    """
+    Args:
+        directory: Where profiles are written
+        max_profiles: Ring size; the oldest profiles are deleted beyond it
+        sample_rate: Fraction of eligible requests profiled without being asked (0 disables)
+        top_n: Functions kept in each JSON summary
+    """
+
+    def __init__(self, directory='profiles', max_profiles=50, sample_rate=0.0, top_n=30):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self.sample_rate = sample_rate
+        self.top_n = top_n
+        self._active = threading.Lock()
+        self.profiled = 0
+        self.skipped = 0
+
+    def should_sample(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self):
+        """Begin profiling the calling thread; returns None if another request is being profiled"""
+        if not self._active.acquire(blocking=False):
+            self.skipped += 1
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Some other profiler (e.g. a debugger) owns the hook
+            self._active.release()
+            self.skipped += 1
+            return None
+        return profile
+
+    def stop(self, profile, metadata):
+        """Stop profile, write it to the ring and return its id"""
+        try:
+            profile.disable()
+        finally:
+            self._active.release()
+
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10 ** 9:09d}-{os.getpid()}"
+        summary = {'id': profile_id, **metadata, 'top_functions': self.summarize(profile)}
+
+        profile.dump_stats(os.path.join(self.directory, f"{profile_id}.prof"))
+        tmp_path = os.path.join(self.directory, f"{profile_id}.json.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.directory, f"{profile_id}.json"))
+
+        self.profiled += 1
+        self._prune()
+        return profile_id
+
+    def summarize(self, profile):
+        """Top functions by cumulative time as JSON-friendly dicts"""
+        stats = pstats.Stats(profile)
+        rows = []
+        for (filename, line, function), (_, calls, total, cumulative, _) in stats.stats.items():
+            rows.append({
+                'function': f"{filename}:{line}({function})" if line else function,
+                'calls': calls,
+                'total_s': round(total, 6),
+                'cumulative_s': round(cumulative, 6)
+            })
+        rows.sort(key=lambda row: row['cumulative_s'], reverse=True)
+        return rows[:self.top_n]
+
+    def _prune(self):
+        for profile_id in self.list()[self.max_profiles:]:
+            for ext in ('.json', '.prof'):
+                try:
+                    os.remove(os.path.join(self.directory, profile_id + ext))
+                except FileNotFoundError:
+                    pass
+
+    def list(self):
+        """Stored profile ids, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted((name[:-5] for name in os.listdir(self.directory) if name.endswith('.json')), reverse=True)
+
+    def path(self, profile_id, ext):
+        """Path of a stored profile file, or None for unknown ids"""
+        if profile_id not in self.list():
+            return None
+        return os.path.join(self.directory, profile_id + ext)
+
+    def stats(self):
+        return {
+            'sample_rate': self.sample_rate,
+            'profiled': self.profiled,
+            'skipped': self.skipped,
+            'stored': len(self.list())
+        }
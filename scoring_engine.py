@@ -0,0 +1,243 @@
+"""
+Pure-NumPy scoring engine for TF-IDF + linear classifiers.
+
+sklearn's transform/predict_proba pair is dominated by per-call overhead
+(parameter validation, check_array, sparse matrix construction) when the
+API scores one or a few emails. For a fitted TfidfVectorizer and a linear
+model, inference is just:
+
+    tokens -> vocabulary columns -> tf * idf -> row norm -> X @ coef.T + b -> sigmoid/softmax
+
+``ScoringEngine`` does exactly that with one vectorized vocabulary lookup
+and a few NumPy operations, computing the class scores once per text. It
+keeps sklearn's summation order (sorted columns, sequential row sums), so
+its probabilities match sklearn's to the last bit or within a few ulps, and
+``check_parity`` verifies that before an engine is used.
+
+The engine copies nothing it is built from: terms are looked up in the
+vectorizer's own vocabulary (sklearn's dict, or the artifact's sorted
+memory-mapped term array via searchsorted), and idf and coef are used in
+place. Over an artifact, every worker therefore shares the mapped pages
+instead of holding a private vocabulary and weight matrix.
+
+It mirrors the ``transform``/``predict_proba``/``classes_`` interface, so it
+can stand in for the vectorizer/model pair anywhere in the API.
+
+Usage (parity report against the pickled model):
+    python scoring_engine.py --data emails_real.csv
+"""
+
+from collections import namedtuple
+
+from model_artifact import ArtifactClassifier, ArtifactVectorizer, _proba_kind
+
+# Largest absolute probability difference from sklearn accepted by check_parity
+PARITY_TOLERANCE = 1e-9
+
+PARITY_TEXTS = [
+    "Interview Invitation We would like to schedule an interview with you",
+    "Thank you for applying Unfortunately we have decided to move forward with other candidates",
+    "Job Offer We are pleased to offer you the position",
+    "",
+]
+
+# Rows of a TF-IDF matrix in CSR layout (sorted columns per row)
+SparseRows = namedtuple('SparseRows', ['indptr', 'indices', 'data', 'n_rows'])
+
+
+def _dict_lookup(vocabulary):
+    """lookup() over a term -> column dict (a fitted TfidfVectorizer's vocabulary_)"""
+    import numpy as np
+
+    def lookup(terms):
+        return np.fromiter((vocabulary.get(term, -1) for term in terms), dtype=np.int64, count=len(terms))
+    return lookup
+
+
+class ScoringEngine:
+    """
+    Args:
+        analyze_many: Callable turning a list of texts into their token/n-gram lists
+        lookup: Callable mapping a list of terms to their feature columns (-1 if unknown)
+        idf: (n_features,) inverse document frequencies
+        coef: (n_classes or 1, n_weighted) weights; features from n_weighted on only count towards the norm
+        intercept: (n_classes or 1,) biases
+        classes: Class labels
+        proba: 'binary', 'ovr' or 'softmax'
+        norm, binary, sublinear_tf: TfidfVectorizer settings
+    """
+
+    def __init__(self, analyze_many, lookup, idf, coef, intercept, classes, proba,
+                 norm='l2', binary=False, sublinear_tf=False):
+        import numpy as np
+
+        self.analyze_many = analyze_many
+        self.lookup = lookup
+        # Used in place (memory-mapped arrays stay shared); float32 weights stay float32
+        self.idf = np.asarray(idf, dtype=np.float64)
+        self.coef = np.asarray(coef)
+        self.n_weighted = self.coef.shape[1]
+        self.intercept = np.asarray(intercept, dtype=np.float64)
+        self.classes_ = np.array([str(c) for c in classes], dtype=object)
+        self.proba = proba
+        self.norm = norm
+        self.binary = binary
+        self.sublinear_tf = sublinear_tf
+
+    @classmethod
+    def from_pair(cls, model, vectorizer):
+        """
+        Build an engine from a fitted vectorizer/model pair (sklearn or artifact)
+
+        Raises:
+            ValueError: If the pair is not a word-level TF-IDF + linear model
+        """
+        if not hasattr(model, 'coef_') or not hasattr(model, 'intercept_'):
+            raise ValueError(f"{type(model).__name__} is not a linear model")
+        if len(model.classes_) > 2 and model.coef_.shape[0] != len(model.classes_):
+            raise ValueError("coef_ rows do not match classes_")
+
+        if isinstance(vectorizer, ArtifactVectorizer):
+            lookup = vectorizer.lookup
+            analyze_many = vectorizer.analyze_many
+        else:
+            if not hasattr(vectorizer, 'vocabulary_') or not hasattr(vectorizer, 'idf_'):
+                raise ValueError("Only a fitted TfidfVectorizer is supported")
+            if vectorizer.analyzer != 'word':
+                raise ValueError("Only the word analyzer is supported")
+            if not vectorizer.use_idf:
+                raise ValueError("use_idf=False is not supported")
+            lookup = _dict_lookup(vectorizer.vocabulary_)
+            # sklearn's own analyzer (preprocess, tokenize, stop words, n-grams) keeps tokens identical
+            analyze = vectorizer.build_analyzer()
+            analyze_many = lambda texts: [analyze(text) for text in texts]
+
+        if vectorizer.norm not in ('l1', 'l2', None):
+            raise ValueError(f"Unsupported norm: {vectorizer.norm}")
+
+        proba = model.proba if isinstance(model, ArtifactClassifier) else _proba_kind(model)
+        return cls(
+            analyze_many, lookup, vectorizer.idf_, model.coef_, model.intercept_, model.classes_, proba,
+            norm=vectorizer.norm, binary=vectorizer.binary, sublinear_tf=vectorizer.sublinear_tf
+        )
+
+    def transform(self, texts):
+        """TF-IDF rows for texts, equal to TfidfVectorizer.transform (restricted to the weighted features)"""
+        import numpy as np
+
+        terms = []
+        lengths = []
+        for tokens in self.analyze_many(texts):
+            terms.extend(tokens)
+            lengths.append(len(tokens))
+
+        # Count each (row, column) once; unique keys come out sorted by row, then column
+        n_features = len(self.idf)
+        columns = self.lookup(terms)
+        known = columns >= 0
+        row_of_term = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+        keys, counts = np.unique(row_of_term[known] * n_features + columns[known], return_counts=True)
+        indices = keys % n_features
+        indptr = np.concatenate(([0], np.cumsum(np.bincount(keys // n_features, minlength=len(texts)))))
+        data = counts.astype(np.float64)
+        if self.binary:
+            data[:] = 1.0
+        elif self.sublinear_tf:
+            np.log(data, data)
+            data += 1.0
+        data *= self.idf[indices]
+
+        if self.norm and len(data):
+            row_ids = np.repeat(np.arange(len(texts)), np.diff(indptr))
+            norms = np.bincount(row_ids, weights=data * data if self.norm == 'l2' else np.abs(data), minlength=len(texts))
+            if self.norm == 'l2':
+                np.sqrt(norms, norms)
+            data /= norms[row_ids]
+
+        if self.n_weighted < len(self.idf):
+            # Pruned features were needed for the norm only
+            row_ids = np.repeat(np.arange(len(texts)), np.diff(indptr))
+            keep = indices < self.n_weighted
+            indptr = np.concatenate(([0], np.cumsum(np.bincount(row_ids[keep], minlength=len(texts)))))
+            indices, data = indices[keep], data[keep]
+        return SparseRows(indptr, indices, data, len(texts))
+
+    def decision_function(self, rows):
+        """Class scores (n_rows, n_classes or 1), one sparse-dense product"""
+        import numpy as np
+
+        scores = np.zeros((rows.n_rows, self.coef.shape[0]))
+        starts = rows.indptr[:-1]
+        nonempty = starts < rows.indptr[1:]
+        if nonempty.any():
+            contributions = self.coef[:, rows.indices] * rows.data
+            scores[nonempty] = np.add.reduceat(contributions, starts[nonempty], axis=1).T
+        scores += self.intercept
+        return scores
+
+    def predict_proba(self, rows):
+        import numpy as np
+
+        scores = self.decision_function(rows)
+        if self.proba == 'binary':
+            positive = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+        if self.proba == 'ovr':
+            proba = 1.0 / (1.0 + np.exp(-scores))
+        else:
+            proba = np.exp(scores - scores.max(axis=1, keepdims=True))
+        return proba / proba.sum(axis=1, keepdims=True)
+
+    def predict(self, rows):
+        return self.classes_[self.predict_proba(rows).argmax(axis=1)]
+
+
+def parity_report(engine, model, vectorizer, texts):
+    """Compare engine probabilities with the reference pair on texts"""
+    import numpy as np
+
+    expected = model.predict_proba(vectorizer.transform(texts))
+    actual = engine.predict_proba(engine.transform(texts))
+    return {
+        'texts': len(texts),
+        'max_abs_diff': float(np.abs(expected - actual).max()) if len(texts) else 0.0,
+        'identical': bool(np.array_equal(expected, actual)),
+        'labels_match': bool((expected.argmax(axis=1) == actual.argmax(axis=1)).all()),
+    }
+
+
+def check_parity(engine, model, vectorizer, texts=PARITY_TEXTS, tolerance=PARITY_TOLERANCE):
+    """Raise ValueError unless engine reproduces the reference predictions on texts"""
+    report = parity_report(engine, model, vectorizer, texts)
+    if not report['labels_match'] or report['max_abs_diff'] > tolerance:
+        raise ValueError(f"Scoring engine differs from the reference model: {report}")
+    return report
+
+
+if __name__ == '__main__':
+    import argparse
+    import pickle
+
+    import pandas as pd
+
+    from prepare_training_data import combine_text
+
+    parser = argparse.ArgumentParser(description='对比NumPy推理引擎与sklearn的预测结果')
+    parser.add_argument('--model', default='model.pkl', help='模型文件 (默认: model.pkl)')
+    parser.add_argument('--vectorizer', default='vectorizer.pkl', help='向量化器文件 (默认: vectorizer.pkl)')
+    parser.add_argument('--data', default='emails.csv', help='用于对比的训练数据CSV (默认: emails.csv)')
+    args = parser.parse_args()
+
+    with open(args.model, 'rb') as f:
+        model = pickle.load(f)
+    with open(args.vectorizer, 'rb') as f:
+        vectorizer = pickle.load(f)
+
+    texts = combine_text(pd.read_csv(args.data, dtype=str, keep_default_na=False)).tolist() + PARITY_TEXTS
+    engine = ScoringEngine.from_pair(model, vectorizer)
+    report = parity_report(engine, model, vectorizer, texts)
+    print(f"📊 {report['texts']} texts: max |Δp| = {report['max_abs_diff']:.3e}, "
+          f"bit-identical: {report['identical']}, labels match: {report['labels_match']}")
+    ok = report['labels_match'] and report['max_abs_diff'] <= PARITY_TOLERANCE
+    print("✅ Parity OK" if ok else "❌ Parity FAILED")
+    raise SystemExit(0 if ok else 1)
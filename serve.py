@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Production entry point for the email classification API.
+
+Runs app.py under a pre-forking gunicorn server. The model is loaded once
+in the master process before any worker is forked, so workers share its
+memory pages copy-on-write instead of each unpickling their own copy.
+
+Environment:
+    PORT              Port to bind (default 5001)
+    WEB_CONCURRENCY   Worker processes (default: CPU count)
+    GUNICORN_THREADS  Threads per worker (default 4)
+    GRACEFUL_TIMEOUT  Seconds workers get to finish in-flight requests on shutdown (default 30)
+    WORKER_TIMEOUT    Seconds before a silent worker is killed and replaced (default 60)
+
+Usage:
+    python serve.py
+"""
+
+import gc
+import os
+import sys
+
+import app as api
+
+
+def _worker_options():
+    return {
+        'bind': f"0.0.0.0:{os.environ.get('PORT', '5001')}",
+        'workers': int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1)),
+        'threads': int(os.environ.get('GUNICORN_THREADS', '4')),
+        'worker_class': 'gthread',
+        'graceful_timeout': int(os.environ.get('GRACEFUL_TIMEOUT', '30')),
+        'timeout': int(os.environ.get('WORKER_TIMEOUT', '60')),
+        'preload_app': True,
+        'post_fork': post_fork,
+        'post_worker_init': post_worker_init,
+        'worker_exit': worker_exit,
+    }
+
+
+def post_fork(server, worker):
+    """Threads do not survive fork(), so per-worker background services start here"""
+    api.model_manager.start_watcher(api.MODEL_WATCH_INTERVAL)
+    api.start_job_workers()
+
+
+def post_worker_init(worker):
+    """Per-worker readiness: make sure this worker can actually score before it takes traffic"""
+    if api.model_manager.active is None:
+        # The master could not load a model; let each worker retry on its own
+        # in the background so it still starts answering /health right away
+        worker.log.warning(f"Worker {worker.pid} starting without a model, loading in the background")
+        api.start_background_load()
+        return
+
+    loaded = api.model_manager.active
+    api.model_manager.validate(loaded)
+    worker.log.info(f"Worker {worker.pid} ready with model {loaded.version}")
+
+
+def worker_exit(server, worker):
+    worker.log.info(f"Worker {worker.pid} exited")
+
+
+def main():
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        print("❌ gunicorn is not installed (it is not available on Windows).")
+        print("   Use the development server instead: python app.py")
+        sys.exit(1)
+
+    class JobTrackServer(BaseApplication):
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    # Load and warm up once in the master so every forked worker inherits the
+    # same pages (and the ready state) instead of loading its own copy
+    api.warm_start()
+    # Move everything loaded so far out of the GC's reach, so collections in
+    # the workers do not touch (and copy) the shared model pages
+    gc.freeze()
+
+    options = _worker_options()
+    print(f"🚀 Serving on {options['bind']} with {options['workers']} workers x {options['threads']} threads")
+    JobTrackServer(api.app, options).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Shadow scoring of a candidate model next to the active one.
+
+Request handlers hand the texts they just scored, and the primary results,
+to ``ShadowScorer.submit``. That call only enqueues; a background thread
+scores the same texts with the candidate and records:
+
+    agreement   share of texts where the candidate predicts the primary's label
+    confusion   primary label -> candidate label counts
+    latency     per-request milliseconds of the primary (as served, cache
+                hits included) and of the candidate (uncached, one batch)
+
+The queue is bounded and never blocks: when the candidate falls behind,
+requests are dropped from the comparison (and counted) instead of slowing
+clients down. Like the metrics, statistics are per process.
+"""
+
+import queue
+import random
+import threading
+import time
+from collections import Counter, deque
+
+# Recent per-request latencies kept for percentiles
+LATENCY_WINDOW = 2048
+
+
+def _percentiles(samples):
+    if not samples:
+        return {'count': 0, 'mean': None, 'p50': None, 'p95': None}
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'mean': round(sum(ordered) / len(ordered), 4),
+        'p50': round(ordered[int(0.50 * (len(ordered) - 1))], 4),
+        'p95': round(ordered[int(0.95 * (len(ordered) - 1))], 4)
+    }
+
+
+class ShadowScorer:
+    """
+    Args:
+        candidate: LoadedModel being evaluated
+        vectorizer, model: Pair to score the candidate with (its NumPy engine or sklearn objects)
+        name: Registry entry the candidate was loaded from
+        sample_rate: Fraction of requests shadowed
+        max_queue: Requests waiting for the candidate before new ones are dropped
+    """
+
+    def __init__(self, candidate, vectorizer, model, name=None, sample_rate=1.0, max_queue=1000):
+        self.candidate = candidate
+        self.vectorizer = vectorizer
+        self.model = model
+        self.name = name
+        self.sample_rate = sample_rate
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopped = False
+        self.started_at = time.time()
+        self.submitted = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_error = None
+        self.texts = 0
+        self.agreed = 0
+        self.confusion = Counter()
+        self.primary_ms = deque(maxlen=LATENCY_WINDOW)
+        self.candidate_ms = deque(maxlen=LATENCY_WINDOW)
+
+    def start(self):
+        """Start the background worker (idempotent)"""
+        with self._lock:
+            if not self._stopped and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name='shadow-scorer', daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop scoring; queued requests are discarded"""
+        with self._lock:
+            self._stopped = True
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def submit(self, texts, primary_results, primary_seconds):
+        """Queue texts scored by the primary for comparison; never blocks"""
+        if self._stopped or not texts or (self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+            return
+        self.start()
+        labels = [result['label'] for result in primary_results]
+        try:
+            self._queue.put_nowait((list(texts), labels, primary_seconds))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return
+        with self._lock:
+            self.submitted += 1
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None or self._stopped:
+                return
+            texts, primary_labels, primary_seconds = item
+
+            start = time.perf_counter()
+            try:
+                probabilities = self.model.predict_proba(self.vectorizer.transform(texts))
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                    self.last_error = f"{type(e).__name__}: {e}"
+                continue
+            candidate_seconds = time.perf_counter() - start
+
+            classes = [str(c) for c in self.model.classes_]
+            candidate_labels = [classes[i] for i in probabilities.argmax(axis=1)]
+            with self._lock:
+                self.texts += len(texts)
+                for primary, candidate in zip(primary_labels, candidate_labels):
+                    self.agreed += primary == candidate
+                    self.confusion[(primary, candidate)] += 1
+                self.primary_ms.append(primary_seconds * 1000)
+                self.candidate_ms.append(candidate_seconds * 1000)
+
+    def stats(self):
+        with self._lock:
+            confusion = {}
+            for (primary, candidate), count in sorted(self.confusion.items()):
+                confusion.setdefault(primary, {})[candidate] = count
+            return {
+                'name': self.name,
+                'version': self.candidate.version,
+                'source': self.candidate.source,
+                'started_at': self.started_at,
+                'sample_rate': self.sample_rate,
+                'submitted': self.submitted,
+                'dropped': self.dropped,
+                'queued': self._queue.qsize(),
+                'errors': self.errors,
+                'last_error': self.last_error,
+                'texts': self.texts,
+                'agreed': self.agreed,
+                'agreement': self.agreed / self.texts if self.texts else None,
+                'confusion': confusion,
+                'latency_ms': {
+                    'primary': _percentiles(self.primary_ms),
+                    'candidate': _percentiles(self.candidate_ms)
+                }
+            }
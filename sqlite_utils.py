@@ -0,0 +1,51 @@
+"""
+SQLite helpers shared by the job queue and the classification store.
+
+Both stores are used from several threads (and possibly several processes),
+so neither keeps a connection around: every operation opens its own
+connection in autocommit mode and wraps its statements in an explicit
+transaction. The database runs in WAL mode, so readers never block the
+writer; WAL is persistent, so it is switched on once when the schema is
+created.
+"""
+
+import sqlite3
+from contextlib import contextmanager
+
+
+def init_database(path, schema):
+    """Create the tables in schema (idempotent) and switch the file to WAL mode"""
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(schema)
+    finally:
+        conn.close()
+
+
+@contextmanager
+def transaction(path, immediate=False, row_factory=None):
+    """
+    One connection per call: sqlite3 connections must not be shared between threads
+
+    Args:
+        path: SQLite database file
+        immediate: Take the write lock up front (BEGIN IMMEDIATE) for read-then-write transactions
+        row_factory: Optional sqlite3 row factory, e.g. sqlite3.Row
+
+    Commits when the block exits normally and rolls back if it raises.
+    """
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    if row_factory is not None:
+        conn.row_factory = row_factory
+    try:
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+    finally:
+        conn.close()
@@ -2,7 +2,7 @@ import requests
 import json
 
 # API 基础 URL
-BASE_URL = "http://localhost:5000"
+BASE_URL = "http://localhost:5001"
 
 def test_health():
     """测试健康检查"""
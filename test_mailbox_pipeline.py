@@ -0,0 +1,57 @@
+"""
+邮箱分页管道的回归测试
+
+CSV导出中的空行会被解析为 None 并和其它记录一样写入解析缓存。第二次
+请求同一页时命中缓存，必须跳过这些空记录而不是报错，且返回的结果和
+第一次完全相同、不再重新解析。
+
+运行: python -m pytest test_mailbox_pipeline.py
+"""
+
+import os
+import tempfile
+
+from mailbox_pipeline import MailboxPipeline
+from status_rules import DEFAULT_CONFIG, StatusRuleEngine
+
+# 第一条记录后有一个空行，最后还有一个
+SAMPLE_CSV = (
+    "messageId,threadId,subject,from,snippet\n"
+    "18c1a2b3c4d5e6f7,t1,Interview Invitation - Data Analyst,Acme Recruiting <jobs@acme.com>,"
+    "We would like to schedule an interview with you\n"
+    "\n"
+    "18c1a2b3c4d5e6f8,t2,Application received,Globex <noreply@globex.com>,"
+    "Thank you for applying to the Backend Engineer position\n"
+    "18c1a2b3c4d5e6f9,t3,Job Offer,Initech HR <hr@initech.com>,We are pleased to offer you the position\n"
+    "\n"
+)
+
+def make_pipeline(tmp_dir):
+    with open(os.path.join(tmp_dir, 'inbox.csv'), 'w', encoding='utf-8') as f:
+        f.write(SAMPLE_CSV)
+    return MailboxPipeline(tmp_dir, StatusRuleEngine.from_config(DEFAULT_CONFIG))
+
+def test_same_page_twice():
+    """含空行的CSV，同一页请求两次（第二次命中缓存）结果相同"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pipeline = make_pipeline(tmp_dir)
+        first, first_cursor = pipeline.page(limit=2)
+        parsed = pipeline.parsed
+        second, second_cursor = pipeline.page(limit=2)
+        assert [m['id'] for m in first] == ['18c1a2b3c4d5e6f7', '18c1a2b3c4d5e6f8']
+        assert first == second and first_cursor == second_cursor, "两次请求结果不一致"
+        assert pipeline.parsed == parsed, "第二次请求不应重新解析"
+
+def test_walk_whole_mailbox():
+    """按游标翻完整个邮箱两遍，空行都被跳过"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pipeline = make_pipeline(tmp_dir)
+        for _ in range(2):
+            ids, cursor = [], None
+            while True:
+                messages, cursor = pipeline.page(cursor, limit=1)
+                ids.extend(m['id'] for m in messages)
+                if cursor is None:
+                    break
+            assert ids == ['18c1a2b3c4d5e6f7', '18c1a2b3c4d5e6f8', '18c1a2b3c4d5e6f9']
+        assert pipeline.parsed == 3, f"每条邮件只应解析一次，实际 {pipeline.parsed} 次"
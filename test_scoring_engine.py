@@ -0,0 +1,70 @@
+"""
+NumPy推理引擎与sklearn的一致性测试
+
+在固定样本（emails.csv + 几条边界文本）上比较 ScoringEngine 与
+sklearn 的 predict_proba，要求最大概率差 |Δp| 不超过 PARITY_TOLERANCE，
+且每条文本的预测标签一致。分别测试 pickle 模型和导出的内存映射 artifact。
+
+运行: python -m pytest test_scoring_engine.py
+"""
+
+import pickle
+import tempfile
+
+import pandas as pd
+
+from model_artifact import export_artifact, load_artifact
+from prepare_training_data import combine_text
+from scoring_engine import PARITY_TEXTS, PARITY_TOLERANCE, ScoringEngine, parity_report
+
+MODEL_PATH = 'model.pkl'
+VECTORIZER_PATH = 'vectorizer.pkl'
+SAMPLE_FILE = 'emails.csv'
+
+# 固定样本: 训练数据 + 空文本、全是未知词、重复词等边界情况
+EDGE_TEXTS = [
+    "",
+    "zzzz qqqq xxxx",
+    "interview interview interview interview",
+    "Offer!!! 🎉 Congratulations — we're thrilled",
+]
+
+def load_pair():
+    with open(MODEL_PATH, 'rb') as f:
+        model = pickle.load(f)
+    with open(VECTORIZER_PATH, 'rb') as f:
+        vectorizer = pickle.load(f)
+    return model, vectorizer
+
+def sample_texts():
+    df = pd.read_csv(SAMPLE_FILE, dtype=str, keep_default_na=False)
+    return combine_text(df).tolist() + PARITY_TEXTS + EDGE_TEXTS
+
+def assert_parity(name, engine, model, vectorizer, texts):
+    report = parity_report(engine, model, vectorizer, texts)
+    assert report['labels_match'], f"{name}: 预测标签与sklearn不一致"
+    assert report['max_abs_diff'] <= PARITY_TOLERANCE, \
+        f"{name}: max |Δp| {report['max_abs_diff']:.3e} 超过容差 {PARITY_TOLERANCE:.0e}"
+
+def test_pickle_parity():
+    """pickle模型上的引擎与sklearn一致"""
+    model, vectorizer = load_pair()
+    engine = ScoringEngine.from_pair(model, vectorizer)
+    assert_parity("pickle", engine, model, vectorizer, sample_texts())
+
+def test_artifact_parity():
+    """artifact（内存映射词表，searchsorted查词）上的引擎与sklearn一致"""
+    model, vectorizer = load_pair()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        artifact_dir = f"{tmp_dir}/model_artifact"
+        export_artifact(model, vectorizer, artifact_dir)
+        artifact_model, artifact_vectorizer, _ = load_artifact(artifact_dir)
+        engine = ScoringEngine.from_pair(artifact_model, artifact_vectorizer)
+        assert_parity("artifact", engine, model, vectorizer, sample_texts())
+        # 逐条打分与整批打分结果相同
+        texts = sample_texts()[:20]
+        batch = engine.predict_proba(engine.transform(texts))
+        for i, text in enumerate(texts):
+            single = engine.predict_proba(engine.transform([text]))[0]
+            assert abs(single - batch[i]).max() <= PARITY_TOLERANCE, f"第 {i} 条单独打分与整批不一致"
+        del engine, artifact_model, artifact_vectorizer
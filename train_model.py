@@ -1,18 +1,281 @@
 import pandas as pd
+import numpy as np
 import pickle
 import argparse
+import hashlib
 import os
- from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report, accuracy_score
+import time
+import tracemalloc
+from joblib import Parallel, delayed
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from sklearn.metrics import classification_report, accuracy_score, f1_score
 
-def train_email_classifier(data_file='emails.csv'):
+from model_artifact import compute_model_version, export_artifact, load_artifact
+from model_manager import backup_model_files
+from model_registry import ModelRegistry, data_fingerprint
+from prepare_training_data import combine_text, export_to_training_format
+from scoring_engine import ScoringEngine, check_parity
+
+def save_pickle(obj, path):
+    """Write a pickle atomically so a hot-reloading API never reads a partial file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(obj, f)
+    os.replace(tmp_path, path)
+
+def save_model(model, vectorizer, artifact_dir='model_artifact', coef_dtype='float64', prune_threshold=0.0,
+               registry_dir='model_backups'):
+    """
+    Back up the previous model, then write model.pkl/vectorizer.pkl and
+    (optionally) the pickle-free artifact
+    
+    Returns:
+        True if the artifact was exported
+    """
+    # Keep the previous model so the API can roll back to it (registered models already have an entry)
+    registered = os.path.exists('model.pkl') and os.path.exists('vectorizer.pkl') and \
+        ModelRegistry(registry_dir).has_version(compute_model_version('model.pkl', 'vectorizer.pkl'))
+    if not registered:
+        backup_dir = backup_model_files(['model.pkl', 'vectorizer.pkl', artifact_dir or 'model_artifact'], registry_dir)
+        if backup_dir:
+            print(f"\nBacked up previous model to {backup_dir}/")
+    
+    # Save the model and vectorizer
+    print("\nSaving model to model.pkl...")
+    save_pickle(model, 'model.pkl')
+    
+    print("Saving vectorizer to vectorizer.pkl...")
+    save_pickle(vectorizer, 'vectorizer.pkl')
+    
+    if artifact_dir:
+        print(f"Exporting memory-mappable artifact to {artifact_dir}/...")
+        try:
+            export_artifact(
+                model, vectorizer, artifact_dir,
+                source_version=compute_model_version('model.pkl', 'vectorizer.pkl'),
+                coef_dtype=coef_dtype, prune_threshold=prune_threshold
+            )
+            return True
+        except ValueError as e:
+            print(f"⚠️  Skipped artifact export: {e}")
+    return False
+
+def benchmark_inference(model, vectorizer, texts, repeats=200, batch_size=256):
+    """
+    Latency of scoring with what the API would use for this pair (the NumPy
+    engine when it is in parity, else sklearn): single texts and one batch
+    """
+    try:
+        engine = ScoringEngine.from_pair(model, vectorizer)
+        check_parity(engine, model, vectorizer)
+        vectorizer, model, scorer = engine, engine, 'numpy'
+    except ValueError:
+        scorer = 'sklearn'
+    
+    texts = list(texts) or [""]
+    model.predict_proba(vectorizer.transform(texts[:1]))
+    single_ms = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        model.predict_proba(vectorizer.transform([texts[i % len(texts)]]))
+        single_ms.append((time.perf_counter() - start) * 1000)
+    single_ms.sort()
+    
+    batch = (texts * (batch_size // len(texts) + 1))[:batch_size]
+    start = time.perf_counter()
+    model.predict_proba(vectorizer.transform(batch))
+    batch_ms = (time.perf_counter() - start) * 1000
+    return {
+        'scorer': scorer,
+        'single_p50_ms': round(single_ms[len(single_ms) // 2], 4),
+        'single_p95_ms': round(single_ms[int(0.95 * (len(single_ms) - 1))], 4),
+        'batch_size': batch_size,
+        'batch_ms': round(batch_ms, 3),
+        'batch_per_email_us': round(batch_ms * 1000 / batch_size, 2)
+    }
+
+def register_model(registry_dir, artifact_dir, metadata, model_path='model.pkl', vectorizer_path='vectorizer.pkl'):
+    """Add the model just saved to the registry and print where it went"""
+    name = ModelRegistry(registry_dir).register(model_path, vectorizer_path, artifact_dir, metadata)
+    print(f"\n🗂  Registered model as {registry_dir}/{name}/ "
+          f"(shadow-score it with SHADOW_MODEL={name} or POST /admin/shadow)")
+    return name
+
+def _traced_heap(load):
+    """(result of load(), bytes it keeps allocated on the Python heap)"""
+    tracemalloc.start()
+    try:
+        result = load()
+        allocated, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, allocated
+
+def compact_model_report(model, vectorizer, artifact_dir, X_test, y_test):
+    """
+    Compare what a worker holds for the pickled pair with the artifact it
+    actually serves (mapped arrays + NumPy engine), and the accuracy of both
+    """
+    # Both sides include the engine the API builds on top of the pair it loads
+    def load_pickles():
+        with open('model.pkl', 'rb') as f_model, open('vectorizer.pkl', 'rb') as f_vectorizer:
+            full_model, full_vectorizer = pickle.load(f_model), pickle.load(f_vectorizer)
+        return ScoringEngine.from_pair(full_model, full_vectorizer), full_model, full_vectorizer
+    
+    def load_compact():
+        compact_model, compact_vectorizer, meta = load_artifact(artifact_dir)
+        return ScoringEngine.from_pair(compact_model, compact_vectorizer), meta, compact_model, compact_vectorizer
+    
+    _, pickle_heap = _traced_heap(load_pickles)
+    (engine, meta, _, _), compact_heap = _traced_heap(load_compact)
+    pickle_disk = os.path.getsize('model.pkl') + os.path.getsize('vectorizer.pkl')
+    mapped = sum(
+        os.path.getsize(os.path.join(artifact_dir, name))
+        for name in os.listdir(artifact_dir) if name.endswith('.npy')
+    )
+    
+    full_pred = model.predict(vectorizer.transform(X_test))
+    compact_pred = engine.predict(engine.transform(list(X_test)))
+    full_accuracy = accuracy_score(y_test, full_pred)
+    compact_accuracy = accuracy_score(y_test, compact_pred.astype(str))
+    agreement = float(np.mean(full_pred.astype(str) == compact_pred.astype(str)))
+    
+    print(f"\n📦 Compact model report ({artifact_dir}/):")
+    print(f"   pickled model + vectorizer: {pickle_disk / 1024:,.0f} KB on disk, {pickle_heap / 1024:,.0f} KB heap per worker")
+    print(f"   compact artifact: {mapped / 1024:,.0f} KB memory-mapped (shared by all workers), "
+          f"{compact_heap / 1024:,.0f} KB heap per worker ({compact_heap / max(pickle_heap, 1) - 1:+.0%})")
+    print(f"   weights: {meta['coef_dtype']}, {meta['n_features']}/{meta['n_features'] + meta['n_pruned']} features kept"
+          f" (prune threshold {meta['prune_threshold']})")
+    print(f"   accuracy: full {full_accuracy:.4f} -> compact {compact_accuracy:.4f} "
+          f"(Δ {compact_accuracy - full_accuracy:+.4f}), predictions agree on {agreement:.1%} of test emails")
+    return {
+        'pickle_disk_bytes': pickle_disk,
+        'pickle_heap_bytes': pickle_heap,
+        'artifact_mapped_bytes': mapped,
+        'artifact_heap_bytes': compact_heap,
+        'full_accuracy': full_accuracy,
+        'compact_accuracy': compact_accuracy,
+        'agreement': agreement
+    }
+
+# Default settings used when no search is run
+VECTORIZER_PARAMS = {'max_features': 1000, 'ngram_range': (1, 2), 'min_df': 2}
+CLASSIFIER_C = 1.0
+
+# Grid evaluated by --search
+SEARCH_VECTORIZER_GRID = [
+    {'max_features': max_features, 'ngram_range': ngram_range, 'min_df': min_df}
+    for max_features in (1000, 5000, None)
+    for ngram_range in ((1, 1), (1, 2))
+    for min_df in (1, 2)
+]
+SEARCH_C_GRID = [0.1, 1.0, 10.0, 100.0]
+
+def _evaluate_fold(vectorizer_params, C_grid, X_fit, y_fit, X_val, y_val):
+    """
+    Fit one vectorizer on one fold and reuse its matrices for every C value
+    
+    Returns:
+        (vectorize_seconds, [(C, fit_seconds, macro_f1), ...])
+    """
+    start = time.perf_counter()
+    vectorizer = TfidfVectorizer(stop_words='english', **vectorizer_params)
+    X_fit_vec = vectorizer.fit_transform(X_fit)
+    X_val_vec = vectorizer.transform(X_val)
+    vectorize_seconds = time.perf_counter() - start
+    
+    scores = []
+    for C in C_grid:
+        start = time.perf_counter()
+        model = LogisticRegression(C=C, max_iter=1000, random_state=42, class_weight='balanced')
+        model.fit(X_fit_vec, y_fit)
+        score = f1_score(y_val, model.predict(X_val_vec), average='macro')
+        scores.append((C, time.perf_counter() - start, score))
+    return vectorize_seconds, scores
+
+def search_hyperparameters(X, y, n_splits=5, n_jobs=-1):
+    """
+    Grid-search vectorizer and classifier settings with stratified CV
+    
+    (vectorizer config, fold) pairs run in parallel across cores; each
+    vectorizer is fit once per fold and shared by all C values.
+    
+    Returns:
+        (best vectorizer params, best C)
+    """
+    # Every fold needs at least one example of each label
+    n_splits = max(2, min(n_splits, y.value_counts().min()))
+    folds = list(StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=42).split(X, y))
+    
+    print(f"Searching {len(SEARCH_VECTORIZER_GRID)} vectorizer x {len(SEARCH_C_GRID)} C settings "
+          f"with {n_splits}-fold stratified CV...")
+    start = time.perf_counter()
+    tasks = [(v, f) for v in range(len(SEARCH_VECTORIZER_GRID)) for f in range(len(folds))]
+    outputs = Parallel(n_jobs=n_jobs)(
+        delayed(_evaluate_fold)(
+            SEARCH_VECTORIZER_GRID[v], SEARCH_C_GRID,
+            X.iloc[folds[f][0]], y.iloc[folds[f][0]], X.iloc[folds[f][1]], y.iloc[folds[f][1]]
+        )
+        for v, f in tasks
+    )
+    print(f"Search finished in {time.perf_counter() - start:.1f}s wall time\n")
+    
+    # Per configuration: total seconds spent (its share of vectorizing + fitting) and fold scores
+    results = {}
+    for (v, _), (vectorize_seconds, scores) in zip(tasks, outputs):
+        for C, fit_seconds, score in scores:
+            entry = results.setdefault((v, C), {'seconds': 0.0, 'scores': []})
+            entry['seconds'] += vectorize_seconds / len(SEARCH_C_GRID) + fit_seconds
+            entry['scores'].append(score)
+    
+    ranked = sorted(results.items(), key=lambda item: -np.mean(item[1]['scores']))
+    print(f"{'max_features':>12} {'ngram':>7} {'min_df':>6} {'C':>7} {'macro F1':>10} {'std':>7} {'seconds':>8}")
+    for (v, C), entry in ranked:
+        params = SEARCH_VECTORIZER_GRID[v]
+        print(f"{str(params['max_features']):>12} {str(params['ngram_range']):>7} {params['min_df']:>6} {C:>7g} "
+              f"{np.mean(entry['scores']):>10.4f} {np.std(entry['scores']):>7.4f} {entry['seconds']:>8.2f}")
+    
+    (best_v, best_C), best = ranked[0]
+    print(f"\nBest: {SEARCH_VECTORIZER_GRID[best_v]}, C={best_C} (macro F1 {np.mean(best['scores']):.4f})\n")
+    return SEARCH_VECTORIZER_GRID[best_v], best_C
+
+def is_dataset(data_file):
+    """Columnar dataset written by prepare_training_data.py --parquet (a directory or a single file)"""
+    return data_file.rstrip('/\\').endswith('.parquet')
+
+def load_training_data(data_file):
+    """
+    Load the model input text and labels
+    
+    Columnar datasets are read column-pruned (only text and label) and
+    already carry the combined text; CSVs are parsed and combined here.
+    """
+    if is_dataset(data_file):
+        df = pd.read_parquet(data_file, columns=['text', 'label'])
+        # Categorical on disk; plain strings keep the model's classes_ unchanged
+        df['label'] = df['label'].astype(str)
+        return df
+    
+    df = pd.read_csv(data_file)
+    # Combine subject and body into a single text field
+    df['text'] = combine_text(df)
+    return df
+
+def train_email_classifier(data_file='emails.csv', artifact_dir='model_artifact', search=False, n_jobs=-1,
+                           coef_dtype='float64', prune_threshold=0.0, registry_dir='model_backups'):
     """
     Train an email classification model using TfidfVectorizer and LogisticRegression
     
     Args:
-        data_file: Path to the CSV file containing training data
+        data_file: Path to the CSV file or columnar (.parquet) dataset containing training data
+        artifact_dir: Directory for the pickle-free model artifact (None to skip)
+        search: Pick vectorizer/classifier settings by cross-validated grid search first
+        n_jobs: Parallel workers for the search (-1 = all cores)
+        coef_dtype: Weight dtype of the exported artifact ('float32' halves it)
+        prune_threshold: Drop artifact weights of features with max |coef| below this (0 keeps all)
+        registry_dir: Model registry the trained model is registered in (None to skip)
     """
     print(f"Loading data from {data_file}...")
     
@@ -26,14 +289,11 @@ def train_email_classifier(data_file='emails.csv'):
         return False
     
     # Load the dataset
-    df = pd.read_csv(data_file)
+    df = load_training_data(data_file)
     
     print(f"Loaded {len(df)} emails")
     print(f"Label distribution:\n{df['label'].value_counts()}\n")
     
-    # Combine subject and body into a single text field
-    df['text'] = df['subject'].fillna('') + ' ' + df['body'].fillna('')
-    
     # Prepare features and labels
     X = df['text']
     y = df['label']
@@ -43,27 +303,29 @@ def train_email_classifier(data_file='emails.csv'):
         X, y, test_size=0.2, random_state=42, stratify=y
     )
     
-    print("Vectorizing text with TfidfVectorizer (max 1000 features)...")
-    # Create TfidfVectorizer with max 1000 features
-    vectorizer = TfidfVectorizer(
-        max_features=1000,
-        stop_words='english',
-        ngram_range=(1, 2),  # Use unigrams and bigrams
-        min_df=2  # Ignore terms that appear in less than 2 documents
-    )
+    vectorizer_params, C = VECTORIZER_PARAMS, CLASSIFIER_C
+    if search:
+        vectorizer_params, C = search_hyperparameters(X_train, y_train, n_jobs=n_jobs)
+    
+    print(f"Vectorizing text with TfidfVectorizer (max {vectorizer_params['max_features']} features)...")
+    # Defaults: max 1000 features, unigrams and bigrams, ignore terms in fewer than 2 documents
+    vectorizer = TfidfVectorizer(stop_words='english', **vectorizer_params)
     
     # Fit and transform training data
+    train_start = time.perf_counter()
     X_train_vec = vectorizer.fit_transform(X_train)
     X_test_vec = vectorizer.transform(X_test)
     
     print("Training LogisticRegression model...")
     # Train Logistic Regression model
     model = LogisticRegression(
+        C=C,
         max_iter=1000,
         random_state=42,
         class_weight='balanced'  # Handle imbalanced classes
     )
     model.fit(X_train_vec, y_train)
+    train_seconds = time.perf_counter() - train_start
     
     # Evaluate the model
     y_pred = model.predict(X_test_vec)
@@ -73,20 +335,188 @@ def train_email_classifier(data_file='emails.csv'):
     print("\nClassification Report:")
     print(classification_report(y_test, y_pred))
     
-    # Save the model and vectorizer
-    print("\nSaving model to model.pkl...")
-    with open('model.pkl', 'wb') as f:
-        pickle.dump(model, f)
+    # The API scores with the NumPy engine; it must reproduce sklearn on the held-out emails
+    try:
+        report = check_parity(ScoringEngine.from_pair(model, vectorizer), model, vectorizer, list(X_test))
+        print(f"NumPy scoring engine parity on {report['texts']} test emails: max |Δp| = {report['max_abs_diff']:.1e}")
+    except ValueError as e:
+        print(f"⚠️  The API will score this model with sklearn: {e}")
     
-    print("Saving vectorizer to vectorizer.pkl...")
-    with open('vectorizer.pkl', 'wb') as f:
-        pickle.dump(vectorizer, f)
+    exported = save_model(model, vectorizer, artifact_dir, coef_dtype, prune_threshold, registry_dir or 'model_backups')
+    if exported:
+        compact_model_report(model, vectorizer, artifact_dir, X_test, y_test)
+    
+    if registry_dir:
+        register_model(registry_dir, artifact_dir if exported else None, {
+            'trainer': 'tfidf_logreg',
+            'data_file': data_file,
+            'data_sha256': data_fingerprint(data_file),
+            'n_samples': len(df),
+            'label_counts': {str(label): int(n) for label, n in y.value_counts().items()},
+            'classes': [str(c) for c in model.classes_],
+            'params': {'vectorizer': {k: list(v) if isinstance(v, tuple) else v for k, v in vectorizer_params.items()},
+                       'C': C, 'search': search},
+            'artifact': {'coef_dtype': coef_dtype, 'prune_threshold': prune_threshold} if exported else None,
+            'accuracy': accuracy,
+            'macro_f1': f1_score(y_test, y_pred, average='macro'),
+            'test_samples': len(y_test),
+            'train_seconds': round(train_seconds, 3),
+            'inference': benchmark_inference(model, vectorizer, X_test)
+        })
     
     print("\n✓ Training complete! Model and vectorizer saved successfully.")
     print(f"✓ Model can predict {len(model.classes_)} classes: {list(model.classes_)}")
     
     return True
 
+def _row_hashes(df):
+    """64-bit content hash per labeled row, used to skip rows already learned"""
+    keys = df['subject'].astype(str) + '\x1f' + df['body'].astype(str) + '\x1f' + df['label'].astype(str)
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(k.encode('utf-8'), digest_size=8).digest(), 'little') for k in keys],
+        dtype=np.uint64
+    )
+
+def load_labeled_rows(data_file):
+    """Read a training CSV (subject,body,label), a columnar dataset or a raw Gmail export CSV"""
+    if is_dataset(data_file):
+        df = pd.read_parquet(data_file, columns=['subject', 'body', 'label']).astype(str)
+        return df[df['label'] != ''].reset_index(drop=True)
+    
+    df = pd.read_csv(data_file, dtype=str, keep_default_na=False)
+    if 'body' not in df.columns and 'snippet' in df.columns:
+        df = export_to_training_format(df)
+    df = df[df['label'] != '']
+    return df[['subject', 'body', 'label']].reset_index(drop=True)
+
+def _serves_online_model():
+    """True if the served model.pkl/vectorizer.pkl are missing or a hashing + SGD pair (safe to replace)"""
+    if not (os.path.exists('model.pkl') and os.path.exists('vectorizer.pkl')):
+        return True
+    with open('model.pkl', 'rb') as f:
+        model = pickle.load(f)
+    with open('vectorizer.pkl', 'rb') as f:
+        vectorizer = pickle.load(f)
+    return isinstance(model, SGDClassifier) and isinstance(vectorizer, HashingVectorizer)
+
+def train_incremental(data_files, state_dir='online_model', epochs=5, registry_dir='model_backups', serve=False):
+    """
+    Update an online model with only the labeled rows it has not seen yet
+    
+    Uses a stateless HashingVectorizer, so nothing is refit, and an
+    SGDClassifier (logistic loss) updated with partial_fit. Training time
+    scales with the number of new rows, not the size of the history.
+    
+    The online model lives in state_dir and never silently replaces the
+    served model.pkl/vectorizer.pkl: it is only served with serve=True, and
+    then only if the served model is itself the online hashing + SGD
+    model (a full TF-IDF model is not overwritten by one trained on deltas).
+    
+    Args:
+        data_files: Training CSVs and/or raw export CSVs (e.g. one new month)
+        state_dir: Directory holding the online model and the hashes of rows already learned
+        epochs: Passes of partial_fit over the new rows
+        registry_dir: Model registry the updated model is registered in (None to skip)
+        serve: Also write the updated model to model.pkl/vectorizer.pkl
+    """
+    model_path = os.path.join(state_dir, 'model.pkl')
+    vectorizer_path = os.path.join(state_dir, 'vectorizer.pkl')
+    seen_path = os.path.join(state_dir, 'seen_rows.npy')
+    
+    if serve and not _serves_online_model():
+        print("❌ The served model.pkl is not an incremental (hashing + SGD) model; refusing to replace it")
+        print("   Run without --serve to update only the online model, or do a full retrain")
+        return False
+    
+    frames = []
+    for data_file in data_files:
+        if not os.path.exists(data_file):
+            print(f"❌ Error: File '{data_file}' not found!")
+            return False
+        frames.append(load_labeled_rows(data_file))
+    df = pd.concat(frames, ignore_index=True)
+    
+    hashes = _row_hashes(df)
+    seen = np.load(seen_path) if os.path.exists(seen_path) else np.zeros(0, dtype=np.uint64)
+    _, first = np.unique(hashes, return_index=True)
+    is_new = np.zeros(len(df), dtype=bool)
+    is_new[first] = True
+    is_new &= ~np.isin(hashes, seen)
+    delta = df[is_new]
+    
+    print(f"Loaded {len(df)} labeled rows, {len(delta)} not seen before")
+    if len(delta) == 0:
+        print("✓ Model is already up to date")
+        return True
+    
+    vectorizer = HashingVectorizer(
+        n_features=2 ** 18,
+        stop_words='english',
+        ngram_range=(1, 2),
+        alternate_sign=False,
+        norm='l2'
+    )
+    X_delta = vectorizer.transform(delta['subject'] + ' ' + delta['body'])
+    y_delta = delta['label'].to_numpy()
+    
+    accuracy = None
+    if os.path.exists(model_path):
+        with open(model_path, 'rb') as f:
+            model = pickle.load(f)
+        unknown = set(y_delta) - set(model.classes_)
+        if unknown:
+            print(f"❌ New labels {sorted(unknown)} cannot be added incrementally; run a full retrain")
+            return False
+        # Score the new rows before learning from them (progressive validation)
+        accuracy = accuracy_score(y_delta, model.predict(X_delta))
+        print(f"Accuracy of current model on new rows: {accuracy:.4f}")
+    else:
+        if len(set(y_delta)) < 2:
+            print("❌ The first incremental run needs rows from at least two labels")
+            return False
+        model = SGDClassifier(loss='log_loss', alpha=1e-5, random_state=42)
+    
+    print(f"Updating SGDClassifier with partial_fit ({epochs} epochs over {len(delta)} rows)...")
+    classes = model.classes_ if hasattr(model, 'classes_') else np.unique(y_delta)
+    rng = np.random.default_rng(42)
+    train_start = time.perf_counter()
+    for _ in range(epochs):
+        order = rng.permutation(len(delta))
+        model.partial_fit(X_delta[order], y_delta[order], classes=classes)
+    train_seconds = time.perf_counter() - train_start
+    
+    os.makedirs(state_dir, exist_ok=True)
+    save_pickle(model, model_path)
+    save_pickle(vectorizer, vectorizer_path)
+    np.save(seen_path, np.union1d(seen, hashes[is_new]))
+    print(f"\nSaved online model to {state_dir}/")
+    
+    if serve:
+        # Hashing features have no vocabulary to export, so only the pickles are served
+        save_model(model, vectorizer, artifact_dir=None, registry_dir=registry_dir or 'model_backups')
+        model_path, vectorizer_path = 'model.pkl', 'vectorizer.pkl'
+    else:
+        print("ℹ️  The served model.pkl is unchanged (use --serve, or shadow-score the registry entry first)")
+    
+    if registry_dir:
+        register_model(registry_dir, None, {
+            'trainer': 'hashing_sgd_incremental',
+            'data_files': list(data_files),
+            'data_sha256': {data_file: data_fingerprint(data_file) for data_file in data_files},
+            'n_samples': len(seen) + len(delta),
+            'new_samples': len(delta),
+            'classes': [str(c) for c in model.classes_],
+            'params': {'epochs': epochs},
+            # Progressive validation: the previous model scored on the rows it then learned
+            'previous_accuracy_on_new_rows': accuracy,
+            'train_seconds': round(train_seconds, 3),
+            'inference': benchmark_inference(model, vectorizer, delta['subject'] + ' ' + delta['body'])
+        }, model_path, vectorizer_path)
+    
+    print(f"\n✓ Incremental update complete! {len(seen) + len(delta)} rows learned in total.")
+    print(f"✓ Model can predict {len(model.classes_)} classes: {[str(c) for c in model.classes_]}")
+    return True
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
         description='训练邮件分类模型',
@@ -101,6 +531,18 @@ if __name__ == '__main__':
   
   # 使用自定义数据文件
   python train_model.py --data path/to/your/data.csv
+  
+  # 使用列式数据集训练（prepare_training_data.py --parquet 生成，只读取需要的列）
+  python train_model.py --data emails_real.parquet
+  
+  # 并行网格搜索超参数后训练
+  python train_model.py --data emails_real.csv --search
+  
+  # 增量训练：只学习新导出的一个月数据
+  python train_model.py --incremental --data backend/export/training-before-2024-12.csv
+  
+  # 增量训练并直接替换正在服务的增量模型（正在服务的是完整TF-IDF模型时会拒绝）
+  python train_model.py --incremental --serve --data backend/export/training-before-2024-12.csv
 
 注意: 
   - 数据文件必须包含 'subject', 'body', 'label' 三列
@@ -111,8 +553,80 @@ if __name__ == '__main__':
     parser.add_argument(
         '--data',
         type=str,
-        default='emails.csv',
-        help='训练数据CSV文件路径 (默认: emails.csv)'
+        nargs='+',
+        default=['emails.csv'],
+        help='训练数据CSV文件或列式数据集(.parquet)路径 (默认: emails.csv)；增量模式可传多个文件，也可直接传Gmail导出CSV'
+    )
+    
+    parser.add_argument(
+        '--search',
+        action='store_true',
+        help='用分层交叉验证并行搜索TfidfVectorizer和C的最佳组合，再训练并保存最佳模型'
+    )
+    
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=-1,
+        help='--search 使用的并行进程数 (默认: -1，即全部CPU核心)'
+    )
+    
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='增量训练：HashingVectorizer + SGDClassifier.partial_fit，只学习未见过的新数据'
+    )
+    
+    parser.add_argument(
+        '--serve',
+        action='store_true',
+        help='增量模式：同时用更新后的模型替换 model.pkl/vectorizer.pkl（仅当当前服务的也是增量模型时）'
+    )
+    
+    parser.add_argument(
+        '--state-dir',
+        type=str,
+        default='online_model',
+        help='增量训练状态目录 (默认: online_model)'
+    )
+    
+    parser.add_argument(
+        '--artifact-dir',
+        type=str,
+        default='model_artifact',
+        help='免pickle的模型导出目录，供API内存映射加载 (默认: model_artifact)'
+    )
+    
+    parser.add_argument(
+        '--registry-dir',
+        type=str,
+        default='model_backups',
+        help='模型注册表目录，训练好的模型连同元数据（数据哈希、准确率、训练/推理耗时）保存在这里 (默认: model_backups)'
+    )
+    
+    parser.add_argument(
+        '--no-register',
+        action='store_true',
+        help='不把本次训练的模型登记到模型注册表'
+    )
+    
+    parser.add_argument(
+        '--compact',
+        action='store_true',
+        help='导出的模型权重使用float32（内存减半），并报告与完整模型的准确率差异'
+    )
+    
+    parser.add_argument(
+        '--prune-threshold',
+        type=float,
+        default=0.0,
+        help='导出时丢弃所有类别权重绝对值都小于该值的特征 (默认: 0，不剪枝)'
+    )
+    
+    parser.add_argument(
+        '--no-artifact',
+        action='store_true',
+        help='不导出 model_artifact 目录'
     )
     
     args = parser.parse_args()
@@ -120,18 +634,35 @@ if __name__ == '__main__':
     print("="*60)
     print("🚀 开始训练邮件分类模型")
     print("="*60)
-    print(f"📁 数据文件: {args.data}")
+    print(f"📁 数据文件: {', '.join(args.data)}")
     print()
     
-    success = train_email_classifier(args.data)
+    registry_dir = None if args.no_register else args.registry_dir
+    if args.incremental:
+        success = train_incremental(args.data, args.state_dir, registry_dir=registry_dir, serve=args.serve)
+    elif len(args.data) > 1:
+        print("❌ 完整训练只支持一个数据文件，多个文件请使用 --incremental 或先运行 prepare_training_data.py")
+        success = False
+    else:
+        success = train_email_classifier(
+            args.data[0], None if args.no_artifact else args.artifact_dir,
+            search=args.search, n_jobs=args.jobs,
+            coef_dtype='float32' if args.compact else 'float64',
+            prune_threshold=args.prune_threshold, registry_dir=registry_dir
+        )
     
     if success:
         print("\n" + "="*60)
         print("✅ 训练成功！")
         print("="*60)
         print("\n模型文件:")
-        print(f"  - model.pkl (分类模型)")
-        print(f"  - vectorizer.pkl (文本向量化器)")
+        if args.incremental and not args.serve:
+            print(f"  - {args.state_dir}/model.pkl, {args.state_dir}/vectorizer.pkl (增量模型，未替换正在服务的模型)")
+        else:
+            print(f"  - model.pkl (分类模型)")
+            print(f"  - vectorizer.pkl (文本向量化器)")
+        if not args.no_artifact and not args.incremental:
+            print(f"  - {args.artifact_dir}/ (内存映射模型，无需pickle)")
         print("\n你现在可以:")
         print("  1. 启动服务测试模型: npm run dev")
         print("  2. 使用Chrome扩展自动分类邮件")